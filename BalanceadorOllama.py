@@ -0,0 +1,279 @@
+# BalanceadorOllama.py
+# Reparte las llamadas a Mistral entre varias instancias de ollama: la que tiene menos
+# solicitudes en curso, expulsión de instancias caídas y solicitudes duplicadas (hedging) opcionales.
+import collections
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
+
+import httpx
+import ollama
+
+# ollama convierte httpx.ConnectError en ConnectionError; en modo stream llega sin convertir
+ERRORES_CONEXION = (ConnectionError, httpx.ConnectError)
+
+
+class SinInstancias(ConnectionError):
+    """No queda ninguna instancia de ollama por intentar."""
+
+
+class Instancia:
+    """Un servidor ollama con un ollama.Client (pool de conexiones) por tiempo máximo."""
+
+    def __init__(self, host):
+        self.host = host
+        self.en_curso = 0
+        self.sana = True
+        self.expulsada_hasta = 0.0
+        self.fallos = 0
+        self.llamadas = 0
+        self.duplicadas = 0
+        self._clientes = {}
+        self._lock = threading.Lock()
+
+    def cliente(self, timeout):
+        with self._lock:
+            c = self._clientes.get(timeout)
+            if c is None:
+                c = self._clientes[timeout] = ollama.Client(host=self.host, timeout=timeout)
+            return c
+
+    def como_dict(self):
+        return {
+            "host": self.host or "(por defecto)",
+            "sana": self.sana,
+            "en_curso": self.en_curso,
+            "llamadas": self.llamadas,
+            "duplicadas": self.duplicadas,
+            "fallos": self.fallos,
+        }
+
+
+class Balanceador:
+    """
+    - Cada llamada va a la instancia sana con menos solicitudes en curso (empates en ronda).
+    - Un error de conexión expulsa la instancia 'expulsion' segundos y la llamada se reintenta
+      en otra; un hilo revisa cada 'intervalo_salud' segundos todas las instancias y
+      readmite las que vuelven a responder.
+    - hedge_percentil > 0: si una llamada supera ese percentil de latencia de su grupo
+      (p. ej. el tipo de prompt) se envía un duplicado a otra instancia y gana la primera
+      respuesta. La llamada perdedora termina en segundo plano y su resultado se descarta.
+      Con 'planificador' el duplicado ocupa su propio turno (sin esperar) hasta que terminan
+      las dos llamadas, también la perdedora: si no hay uno libre no se duplica, para no
+      superar la capacidad global.
+    """
+
+    def __init__(self, hosts, expulsion=30.0, intervalo_salud=10.0, timeout_salud=2.0,
+                 hedge_percentil=0, hedge_min_muestras=20, planificador=None):
+        self.instancias = [Instancia(h) for h in (hosts or [None])]
+        self.expulsion = expulsion
+        self.intervalo_salud = intervalo_salud
+        self.timeout_salud = timeout_salud
+        self.hedge_percentil = hedge_percentil
+        self.hedge_min_muestras = hedge_min_muestras
+        self.planificador = planificador
+        self._latencias = {}
+        self._ronda = itertools.count()
+        self._lock = threading.Lock()
+        self._pool = None
+        self._vigilante = None
+
+    # --- Selección ---
+    def tomar(self, excluir=()):
+        """Reserva la instancia con menos solicitudes en curso; si todas están expulsadas prueba igual."""
+        self._vigilar()
+        with self._lock:
+            ahora = time.monotonic()
+            restantes = [i for i in self.instancias if i not in excluir]
+            if not restantes:
+                raise SinInstancias("Ninguna instancia de ollama respondió")
+            candidatas = [i for i in restantes if i.sana or ahora >= i.expulsada_hasta] or restantes
+            desfase = next(self._ronda)
+            n = len(candidatas)
+            elegida = min(
+                (candidatas[(desfase + k) % n] for k in range(n)),
+                key=lambda i: i.en_curso,
+            )
+            elegida.en_curso += 1
+            elegida.llamadas += 1
+            return elegida
+
+    def soltar(self, instancia, fallo=False, grupo=None, latencia=None):
+        with self._lock:
+            instancia.en_curso -= 1
+            if fallo:
+                instancia.fallos += 1
+                instancia.sana = False
+                instancia.expulsada_hasta = time.monotonic() + self.expulsion
+                return
+            instancia.sana = True
+            if grupo is not None and latencia is not None:
+                self._latencias.setdefault(grupo, collections.deque(maxlen=200)).append(latencia)
+
+    def umbral_hedge(self, grupo):
+        """Latencia a partir de la cual se duplica la llamada (None: sin hedging todavía)."""
+        if self.hedge_percentil <= 0 or len(self.instancias) < 2:
+            return None
+        with self._lock:
+            muestras = sorted(self._latencias.get(grupo, ()))
+        if len(muestras) < self.hedge_min_muestras:
+            return None
+        return muestras[min(len(muestras) - 1, int(len(muestras) * self.hedge_percentil / 100))]
+
+    # --- Llamadas ---
+    def _llamar(self, instancia, timeout, grupo, kwargs):
+        inicio = time.perf_counter()
+        try:
+            resp = instancia.cliente(timeout).chat(**kwargs)
+        except ERRORES_CONEXION:
+            self.soltar(instancia, fallo=True)
+            raise
+        except BaseException:
+            self.soltar(instancia)
+            raise
+        self.soltar(instancia, grupo=grupo, latencia=time.perf_counter() - inicio)
+        return resp
+
+    def _con_duplicado(self, instancia, intentadas, timeout, grupo, kwargs):
+        umbral = self.umbral_hedge(grupo)
+        if umbral is None:
+            return self._llamar(instancia, timeout, grupo, kwargs)
+
+        primera = self._pool_hedge().submit(self._llamar, instancia, timeout, grupo, kwargs)
+        if wait([primera], timeout=umbral).done:
+            return primera.result()
+        if self.planificador is not None and not self.planificador.intentar_turno():
+            return primera.result()
+        try:
+            otra = self.tomar(intentadas)
+        except SinInstancias:
+            if self.planificador is not None:
+                self.planificador.liberar()
+            return primera.result()
+        intentadas.append(otra)  # si las dos fallan, chat() no vuelve a elegirla
+        otra.duplicadas += 1
+        segunda = self._pool_hedge().submit(self._llamar, otra, timeout, grupo, kwargs)
+        if self.planificador is not None:
+            self._liberar_al_terminar(primera, segunda)
+
+        error = None
+        for futuro in as_completed([primera, segunda]):
+            if futuro.exception() is None:
+                return futuro.result()
+            error = futuro.exception()
+        raise error
+
+    def _liberar_al_terminar(self, *futuros):
+        """Devuelve el turno del duplicado cuando terminaron todas las llamadas en curso."""
+        pendientes = [len(futuros)]
+        lock = threading.Lock()
+
+        def terminada(_):
+            with lock:
+                pendientes[0] -= 1
+                ultima = pendientes[0] == 0
+            if ultima:
+                self.planificador.liberar()
+
+        for futuro in futuros:
+            futuro.add_done_callback(terminada)
+
+    def chat(self, timeout, grupo=None, **kwargs):
+        """ollama.Client.chat en la mejor instancia; ante un error de conexión prueba la siguiente."""
+        intentadas = []
+        while True:
+            instancia = self.tomar(intentadas)
+            intentadas.append(instancia)
+            try:
+                return self._con_duplicado(instancia, intentadas, timeout, grupo, kwargs)
+            except ERRORES_CONEXION:
+                if len(intentadas) >= len(self.instancias):
+                    raise
+
+    def stream(self, timeout, **kwargs):
+        """
+        Fragmentos de ollama.Client.chat(stream=True). La instancia queda reservada hasta
+        agotar o cerrar el generador; si falla la conexión antes del primer fragmento se
+        reintenta en otra instancia.
+        """
+        intentadas = []
+        while True:
+            instancia = self.tomar(intentadas)
+            intentadas.append(instancia)
+            partes = None
+            recibido = False
+            fallo = False
+            try:
+                partes = instancia.cliente(timeout).chat(stream=True, **kwargs)
+                for parte in partes:
+                    recibido = True
+                    yield parte
+                return
+            except ERRORES_CONEXION:
+                fallo = True
+                if recibido or len(intentadas) >= len(self.instancias):
+                    raise
+            finally:
+                if partes is not None and hasattr(partes, "close"):
+                    partes.close()
+                self.soltar(instancia, fallo=fallo)
+
+    def precargar(self, model, keep_alive, timeout):
+        """Carga el modelo en todas las instancias; retorna cuántas respondieron."""
+        cargadas = 0
+        for instancia in self.instancias:
+            try:
+                instancia.cliente(timeout).generate(model=model, keep_alive=keep_alive)
+                cargadas += 1
+            except Exception:
+                with self._lock:
+                    instancia.sana = False
+                    instancia.expulsada_hasta = time.monotonic() + self.expulsion
+        return cargadas
+
+    # --- Salud ---
+    def revisar(self):
+        """Consulta /api/ps en cada instancia (solo las que no tienen solicitudes en curso)."""
+        for instancia in self.instancias:
+            if instancia.en_curso:
+                continue
+            try:
+                instancia.cliente(self.timeout_salud).ps()
+                ok = True
+            except Exception:
+                ok = False
+            with self._lock:
+                if ok:
+                    instancia.sana = True
+                elif instancia.sana:
+                    instancia.sana = False
+                    instancia.expulsada_hasta = time.monotonic() + self.expulsion
+
+    def _vigilar(self):
+        if self._vigilante is not None or len(self.instancias) < 2 or self.intervalo_salud <= 0:
+            return
+        with self._lock:
+            if self._vigilante is not None:
+                return
+
+            def bucle():
+                while True:
+                    time.sleep(self.intervalo_salud)
+                    self.revisar()
+
+            self._vigilante = threading.Thread(target=bucle, daemon=True, name="salud-ollama")
+            self._vigilante.start()
+
+    def _pool_hedge(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=32, thread_name_prefix="hedge-ollama")
+            return self._pool
+
+    def estadisticas(self):
+        with self._lock:
+            return {
+                "instancias": [i.como_dict() for i in self.instancias],
+                "hedge_percentil": self.hedge_percentil,
+            }
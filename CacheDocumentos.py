@@ -0,0 +1,169 @@
+# CacheDocumentos.py
+# Caché en disco de documentos ya generados (informe/cuadro): misma plantilla y mismas entradas
+# devuelven el .docx guardado sin llamar a Mistral ni volver a armarlo.
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+import Metricas
+
+# Cambiar al modificar prompts o el armado del .docx: invalida todas las entradas anteriores
+VERSION_GENERADOR = "1"
+
+# Encabezado con el id del manifiesto de un informe o entrega guardado
+ENCABEZADO_INFORME = "X-Informe-Id"
+
+
+def id_plantilla(archivo):
+    """Hash del contenido de una plantilla subida, igual al id que le daría RegistroPlantillas."""
+    h = hashlib.sha256()
+    archivo.seek(0)
+    for bloque in iter(lambda: archivo.read(1024 * 1024), b""):
+        h.update(bloque)
+    archivo.seek(0)
+    return h.hexdigest()[:32]
+
+
+def clave_documento(tipo, plantilla_id, entradas, version=VERSION_GENERADOR):
+    """
+    Clave estable (sha256) de un documento: tipo, versión del generador, plantilla (por su hash
+    de contenido, ver id_plantilla) y entradas (dict serializable a JSON: tarea y puntos, o dias_semana).
+    Se usa también como ETag de la descarga.
+    """
+    payload = json.dumps({"tipo": tipo, "version": version, "plantilla": plantilla_id, "entradas": entradas},
+                         sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class CacheDocumentos:
+    """
+    Un archivo <clave>.docx (más <clave>.json con nombre de descarga y encabezados) por documento.
+    Cuando la suma de tamaños supera max_bytes se borran los menos usados (LRU); el orden
+    de uso se recupera al arrancar desde la fecha de modificación, que se actualiza en cada acierto.
+    Las entradas con encabezado X-Informe-Id se indexan por informe para invalidarlas cuando su
+    manifiesto cambia (ver invalidar_informe).
+    """
+
+    def __init__(self, directorio, max_bytes=256 * 1024 * 1024):
+        self.directorio = Path(directorio)
+        self.directorio.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entradas = OrderedDict()  # clave -> tamaño, de menos a más usada
+        self._informes = {}  # clave -> id de informe (X-Informe-Id)
+        for ruta in sorted(self.directorio.glob("*.docx"), key=lambda r: r.stat().st_mtime):
+            self._entradas[ruta.stem] = ruta.stat().st_size
+            try:
+                encabezados = json.loads(self._ruta(ruta.stem, ".json").read_text(encoding="utf-8"))["encabezados"]
+            except (OSError, ValueError, KeyError):
+                continue
+            if encabezados.get(ENCABEZADO_INFORME):
+                self._informes[ruta.stem] = encabezados[ENCABEZADO_INFORME]
+        self.aciertos = 0
+        self.fallos = 0
+        self.expulsiones = 0
+
+    def _ruta(self, clave, extension=".docx"):
+        return self.directorio / f"{clave}{extension}"
+
+    def obtener(self, clave):
+        """(ruta del .docx, datos) si está guardado, o None."""
+        with self._lock:
+            if clave not in self._entradas:
+                self.fallos += 1
+                Metricas.registrar_cache_documento("fallo")
+                return None
+            ruta = self._ruta(clave)
+            try:
+                datos = json.loads(self._ruta(clave, ".json").read_text(encoding="utf-8"))
+                os.utime(ruta)
+            except (OSError, ValueError):
+                self._borrar(clave)
+                self.fallos += 1
+                Metricas.registrar_cache_documento("fallo")
+                return None
+            self._entradas.move_to_end(clave)
+            self.aciertos += 1
+        Metricas.registrar_cache_documento("acierto")
+        return ruta, datos
+
+    def guardar(self, clave, archivo, nombre, encabezados=None):
+        """Copia el contenido de 'archivo' (abierto en binario) y retorna la ruta guardada."""
+        archivo.seek(0)
+        contenido = archivo.read()
+        archivo.seek(0)
+        datos = {"nombre": nombre, "encabezados": encabezados or {}, "creado": time.time()}
+        with self._lock:
+            temporal = self._ruta(clave, f".{threading.get_ident()}.tmp")
+            temporal.write_bytes(contenido)
+            self._ruta(clave, ".json").write_text(json.dumps(datos, ensure_ascii=False), encoding="utf-8")
+            os.replace(temporal, self._ruta(clave))
+            self._entradas[clave] = len(contenido)
+            self._entradas.move_to_end(clave)
+            if datos["encabezados"].get(ENCABEZADO_INFORME):
+                self._informes[clave] = datos["encabezados"][ENCABEZADO_INFORME]
+            en_uso = sum(self._entradas.values())
+            while en_uso > self.max_bytes and len(self._entradas) > 1:
+                vieja = next(iter(self._entradas))
+                en_uso -= self._entradas[vieja]
+                self._borrar(vieja)
+                self.expulsiones += 1
+        return self._ruta(clave)
+
+    def _borrar(self, clave):
+        self._entradas.pop(clave, None)
+        self._informes.pop(clave, None)
+        for extension in (".docx", ".json"):
+            try:
+                self._ruta(clave, extension).unlink()
+            except FileNotFoundError:
+                pass
+
+    def invalidar(self, clave=None):
+        """Borra una entrada (o todas si clave es None); retorna cuántas se borraron."""
+        with self._lock:
+            claves = list(self._entradas) if clave is None else [clave] if clave in self._entradas else []
+            for c in claves:
+                self._borrar(c)
+            return len(claves)
+
+    def invalidar_informe(self, informe_id):
+        """
+        Borra las entradas que llevan ese X-Informe-Id: tras agregar o regenerar secciones su
+        copia guardada ya no coincide con el manifiesto. Retorna cuántas se borraron.
+        """
+        with self._lock:
+            claves = [c for c, i in self._informes.items() if i == informe_id]
+            for c in claves:
+                self._borrar(c)
+            return len(claves)
+
+    def estadisticas(self):
+        with self._lock:
+            consultas = self.aciertos + self.fallos
+            return {
+                "entradas": len(self._entradas),
+                "bytes": sum(self._entradas.values()),
+                "max_bytes": self.max_bytes,
+                "aciertos": self.aciertos,
+                "fallos": self.fallos,
+                "tasa_aciertos": round(self.aciertos / consultas, 4) if consultas else 0.0,
+                "expulsiones": self.expulsiones,
+                "version": VERSION_GENERADOR,
+            }
+
+
+def _cache_desde_entorno():
+    if os.environ.get("DOCUMENTOS_CACHE", "1") == "0":
+        return None
+    return CacheDocumentos(
+        os.environ.get("DOCUMENTOS_CACHE_DIR", str(Path(__file__).parent / ".cache" / "documentos")),
+        max_bytes=int(os.environ.get("DOCUMENTOS_CACHE_MB", "256")) * 1024 * 1024,
+    )
+
+
+cache = _cache_desde_entorno()
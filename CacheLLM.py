@@ -0,0 +1,122 @@
+# CacheLLM.py
+# Caché persistente (SQLite) de respuestas de Mistral, compartida por informe y cuadro.
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+
+def clave_cache(model, messages, options=None, formato=None):
+    """Clave estable para (modelo, prompt, opciones)."""
+    payload = json.dumps(
+        {"model": model, "messages": messages, "options": options or {}, "format": formato},
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class CacheRespuestas:
+    """
+    Caché clave -> texto de respuesta en un archivo SQLite.
+      - max_entradas: tope de filas; al superarlo se expulsan las menos usadas (LRU)
+      - ttl: segundos de validez de una entrada (None o 0 = sin caducidad)
+    Lleva contadores de aciertos/fallos y del tiempo de modelo ahorrado.
+    """
+
+    def __init__(self, ruta, max_entradas=5000, ttl=None):
+        self.ruta = str(ruta)
+        self.max_entradas = max_entradas
+        self.ttl = ttl or None
+        self._lock = threading.Lock()
+        if self.ruta != ":memory:":
+            Path(self.ruta).parent.mkdir(parents=True, exist_ok=True)
+        self._con = sqlite3.connect(self.ruta, check_same_thread=False)
+        self._con.execute(
+            "CREATE TABLE IF NOT EXISTS respuestas ("
+            " clave TEXT PRIMARY KEY,"
+            " respuesta TEXT NOT NULL,"
+            " duracion REAL NOT NULL DEFAULT 0,"
+            " creado REAL NOT NULL,"
+            " usado REAL NOT NULL)"
+        )
+        self._con.execute("CREATE INDEX IF NOT EXISTS idx_usado ON respuestas(usado)")
+        self._con.commit()
+        self.aciertos = 0
+        self.fallos = 0
+        self.expulsiones = 0
+        self.segundos_ahorrados = 0.0
+
+    def obtener(self, clave):
+        ahora = time.time()
+        with self._lock:
+            fila = self._con.execute(
+                "SELECT respuesta, duracion, creado FROM respuestas WHERE clave = ?", (clave,)
+            ).fetchone()
+            if fila is not None and self.ttl and ahora - fila[2] > self.ttl:
+                self._con.execute("DELETE FROM respuestas WHERE clave = ?", (clave,))
+                self._con.commit()
+                fila = None
+            if fila is None:
+                self.fallos += 1
+                return None
+            self._con.execute("UPDATE respuestas SET usado = ? WHERE clave = ?", (ahora, clave))
+            self._con.commit()
+            self.aciertos += 1
+            self.segundos_ahorrados += fila[1]
+            return fila[0]
+
+    def guardar(self, clave, respuesta, duracion=0.0):
+        ahora = time.time()
+        with self._lock:
+            self._con.execute(
+                "INSERT OR REPLACE INTO respuestas (clave, respuesta, duracion, creado, usado)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (clave, respuesta, float(duracion), ahora, ahora),
+            )
+            total = self._con.execute("SELECT COUNT(*) FROM respuestas").fetchone()[0]
+            sobrantes = total - self.max_entradas
+            if sobrantes > 0:
+                self._con.execute(
+                    "DELETE FROM respuestas WHERE clave IN"
+                    " (SELECT clave FROM respuestas ORDER BY usado ASC LIMIT ?)",
+                    (sobrantes,),
+                )
+                self.expulsiones += sobrantes
+            self._con.commit()
+
+    def limpiar(self):
+        with self._lock:
+            self._con.execute("DELETE FROM respuestas")
+            self._con.commit()
+
+    def estadisticas(self):
+        with self._lock:
+            entradas = self._con.execute("SELECT COUNT(*) FROM respuestas").fetchone()[0]
+        consultas = self.aciertos + self.fallos
+        return {
+            "entradas": entradas,
+            "max_entradas": self.max_entradas,
+            "ttl": self.ttl,
+            "aciertos": self.aciertos,
+            "fallos": self.fallos,
+            "tasa_aciertos": round(self.aciertos / consultas, 4) if consultas else 0.0,
+            "expulsiones": self.expulsiones,
+            "segundos_ahorrados": round(self.segundos_ahorrados, 3),
+        }
+
+
+def _cache_desde_entorno():
+    if os.environ.get("MISTRAL_CACHE", "1") == "0":
+        return None
+    return CacheRespuestas(
+        os.environ.get("MISTRAL_CACHE_PATH", str(Path(__file__).parent / ".cache" / "mistral.sqlite3")),
+        max_entradas=int(os.environ.get("MISTRAL_CACHE_MAX", "5000")),
+        ttl=float(os.environ.get("MISTRAL_CACHE_TTL", "0")) or None,
+    )
+
+
+cache = _cache_desde_entorno()
@@ -0,0 +1,293 @@
+# ClienteMistral.py
+# Punto único de llamada a Mistral (ollama) para ModeloInforme y ModeloCuadro.
+import logging
+import os
+import threading
+import time
+
+import httpx
+
+import CacheLLM
+import Metricas
+from BalanceadorOllama import Balanceador
+from PlanificadorLLM import ALTA, NORMAL, Planificador
+
+log = logging.getLogger("generador.mistral")
+
+# Servidores y modelo. OLLAMA_HOSTS admite varias instancias separadas por comas;
+# sin ninguna se usa OLLAMA_HOST o el valor por defecto de ollama (http://127.0.0.1:11434)
+HOSTS = [h.strip() for h in os.environ.get("OLLAMA_HOSTS", os.environ.get("OLLAMA_HOST", "")).split(",") if h.strip()]
+MODELO = os.environ.get("MISTRAL_MODELO", "mistral")
+# Tiempo que ollama mantiene el modelo cargado tras cada llamada ("30m", "-1" = siempre)
+KEEP_ALIVE = os.environ.get("MISTRAL_KEEP_ALIVE", "30m")
+TIMEOUT = float(os.environ.get("MISTRAL_TIMEOUT", "120"))
+
+# Opciones de generación, tiempo máximo (segundos) y prioridad en el planificador por tipo de prompt.
+# num_predict corta respuestas desbocadas; el llamador puede sobrescribir opciones puntuales.
+PERFILES = {
+    "general": {"options": {}, "timeout": TIMEOUT, "prioridad": NORMAL},
+    "intro": {"options": {"num_predict": 400, "temperature": 0.7}, "timeout": 90, "prioridad": NORMAL},
+    "punto": {"options": {"num_predict": 1024, "temperature": 0.7}, "timeout": TIMEOUT, "prioridad": NORMAL},
+    "descripcion": {"options": {"num_predict": 60, "temperature": 0.3, "stop": ["\n\n"]}, "timeout": 30,
+                    "prioridad": ALTA},
+    "descripciones_dia": {"options": {"num_predict": 512, "temperature": 0.3}, "timeout": 60, "prioridad": ALTA},
+}
+
+
+class TiempoAgotado(TimeoutError):
+    """Mistral no respondió dentro del tiempo del perfil; el llamador aplica su fallback."""
+
+
+# Instancias de ollama compartidas por todos los hilos (cada una reutiliza sus conexiones).
+# MISTRAL_HEDGE_PERCENTIL > 0 duplica en otra instancia las llamadas más lentas que ese percentil.
+balanceador = Balanceador(
+    HOSTS,
+    expulsion=float(os.environ.get("OLLAMA_EXPULSION_SEG", "30")),
+    intervalo_salud=float(os.environ.get("OLLAMA_SALUD_SEG", "10")),
+    hedge_percentil=float(os.environ.get("MISTRAL_HEDGE_PERCENTIL", "0")),
+)
+
+
+def _perfil(tipo, options):
+    perfil = PERFILES.get(tipo) or PERFILES["general"]
+    opciones = dict(perfil["options"])
+    opciones.update(options or {})
+    return opciones, perfil["timeout"]
+
+
+def precargar():
+    """
+    Carga el modelo en memoria de cada instancia de ollama (petición vacía con keep_alive)
+    para que la primera solicitud no pague la carga. Retorna True si alguna respondió.
+    """
+    cargadas = balanceador.precargar(MODELO, KEEP_ALIVE, TIMEOUT)
+    if cargadas < len(balanceador.instancias):
+        log.warning("%s precargado en %d de %d instancias", MODELO, cargadas, len(balanceador.instancias))
+    return cargadas > 0
+
+# Turnos de llamada compartidos por todo el proceso (ver PlanificadorLLM).
+# MISTRAL_CAPACIDAD: llamadas simultáneas (por defecto 4 por instancia de ollama);
+# MISTRAL_COLA_MAX: llamadas en espera desde las que se rechazan solicitudes nuevas (0 = nunca)
+planificador = Planificador(
+    int(os.environ.get("MISTRAL_CAPACIDAD", "0")) or 4 * len(balanceador.instancias),
+    max_cola=int(os.environ.get("MISTRAL_COLA_MAX", "64")),
+)
+# Los duplicados (hedging) también ocupan un turno
+balanceador.planificador = planificador
+
+
+def limitar_concurrencia(n):
+    """Limita a n las llamadas a ollama en curso (None o 0 quita el límite)."""
+    planificador.ajustar(n)
+
+
+def _turno(tipo):
+    return planificador.turno((PERFILES.get(tipo) or PERFILES["general"])["prioridad"])
+
+
+def _texto_respuesta(resp):
+    try:
+        return resp["message"]["content"] or ""
+    except Exception:
+        m = getattr(resp, "message", None)
+        return getattr(m, "content", "") or ""
+
+
+# --- Llamadas idénticas en curso compartidas (singleflight) ---
+COALESCER = os.environ.get("MISTRAL_COALESCER", "1") == "1"
+
+
+class _Vuelo:
+    """Una llamada a Mistral en curso; quienes piden lo mismo esperan su resultado."""
+
+    def __init__(self):
+        self.hecho = threading.Event()
+        self.resultado = None
+        self.error = None
+
+
+_en_vuelo = {}
+_en_vuelo_lock = threading.Lock()
+
+
+def _compartida(clave, tipo, funcion):
+    """
+    Ejecuta funcion() una sola vez por clave mientras esté en curso: las llamadas
+    idénticas que lleguen entretanto reciben el mismo texto, o la misma excepción
+    (y con ella aplican su propio fallback).
+    """
+    with _en_vuelo_lock:
+        vuelo = _en_vuelo.get(clave)
+        lider = vuelo is None
+        if lider:
+            vuelo = _en_vuelo[clave] = _Vuelo()
+    if not lider:
+        Metricas.registrar_coalescida(tipo)
+        vuelo.hecho.wait()
+        if vuelo.error is not None:
+            raise vuelo.error
+        return vuelo.resultado
+    try:
+        vuelo.resultado = funcion()
+        return vuelo.resultado
+    except BaseException as e:
+        vuelo.error = e
+        raise
+    finally:
+        with _en_vuelo_lock:
+            del _en_vuelo[clave]
+        vuelo.hecho.set()
+
+
+def _tokens_respuesta(resp):
+    """(tokens generados, segundos generando) que informa ollama, o (None, None)."""
+    try:
+        cuenta, duracion = resp["eval_count"], resp["eval_duration"]
+    except Exception:
+        cuenta, duracion = getattr(resp, "eval_count", None), getattr(resp, "eval_duration", None)
+    return cuenta, (duracion / 1e9 if duracion else None)
+
+
+def chat(prompt, model=None, format=None, options=None, forzar=False, tipo="general"):
+    """
+    Envía 'prompt' (texto de usuario) a Mistral pasando por la caché persistente.
+      - tipo elige el perfil de PERFILES (tope de tokens, temperatura, stop y tiempo máximo)
+      - forzar=True ignora la entrada guardada y la reemplaza con la nueva respuesta
+    Retorna un dict con la forma de ollama.chat: {'message': {'content': texto}}
+    Lanza TiempoAgotado si Mistral no responde a tiempo.
+    Si ya hay en curso una llamada idéntica (modelo, prompt, opciones y formato)
+    se espera su resultado en lugar de repetirla (MISTRAL_COALESCER=0 lo desactiva).
+    """
+    model = model or MODELO
+    options, timeout = _perfil(tipo, options)
+    messages = [{"role": "user", "content": prompt}]
+    cache = CacheLLM.cache
+    clave = CacheLLM.clave_cache(model, messages, options, format) if cache or COALESCER else None
+
+    if cache and not forzar:
+        guardado = cache.obtener(clave)
+        if guardado is not None:
+            Metricas.registrar_llamada(tipo, "cache")
+            return {"message": {"content": guardado}}
+
+    def llamar():
+        return _llamar(model, messages, format, options, timeout, tipo, cache, clave)
+
+    texto = _compartida(clave, tipo, llamar) if COALESCER else llamar()
+    return {"message": {"content": texto}}
+
+
+def _llamar(model, messages, format, options, timeout, tipo, cache, clave):
+    """Llamada real a Mistral (por el balanceador); guarda el texto en la caché y lo retorna."""
+    inicio = time.perf_counter()
+    kwargs = {}
+    if format is not None:
+        kwargs["format"] = format
+    if options:
+        kwargs["options"] = options
+    with _turno(tipo):
+        llamada = time.perf_counter()
+        try:
+            resp = balanceador.chat(timeout, grupo=tipo, model=model, messages=messages, keep_alive=KEEP_ALIVE,
+                                    **kwargs)
+        except httpx.TimeoutException as e:
+            Metricas.registrar_llamada(tipo, "tiempo_agotado", time.perf_counter() - llamada)
+            raise TiempoAgotado(f"Mistral no respondió en {timeout} s") from e
+        except Exception:
+            Metricas.registrar_llamada(tipo, "error", time.perf_counter() - llamada)
+            raise
+    Metricas.registrar_llamada(tipo, "ok", time.perf_counter() - llamada, *_tokens_respuesta(resp))
+    texto = _texto_respuesta(resp)
+
+    if cache and texto.strip():
+        cache.guardar(clave, texto, time.perf_counter() - inicio)
+    return texto
+
+
+class FlujoMistral:
+    """
+    Respuesta de Mistral en modo stream=True, iterable fragmento a fragmento.
+    El llamador puede cortar la iteración en cualquier momento y luego llamar
+    cerrar(texto_valido) para liberar la conexión y, si el texto sirvió, guardarlo en caché.
+    """
+
+    def __init__(self, prompt, model=None, format=None, options=None, forzar=False, tipo="general"):
+        model = model or MODELO
+        options, self.timeout = _perfil(tipo, options)
+        self.tipo = tipo
+        self.messages = [{"role": "user", "content": prompt}]
+        self.model = model
+        self.format = format
+        self.options = options
+        self.desde_cache = False
+        self._stream = None
+        self._inicio = time.perf_counter()
+        self._llamada = None
+        self._tokens = (None, None)
+        self._registrada = False
+        self._cache = CacheLLM.cache
+        self._clave = CacheLLM.clave_cache(model, self.messages, options, format) if self._cache else None
+        self._guardado = self._cache.obtener(self._clave) if self._cache and not forzar else None
+
+    def __iter__(self):
+        if self._guardado is not None:
+            self.desde_cache = True
+            yield self._guardado
+            return
+        kwargs = {}
+        if self.format is not None:
+            kwargs["format"] = self.format
+        if self.options:
+            kwargs["options"] = self.options
+        with _turno(self.tipo):
+            self._llamada = time.perf_counter()
+            try:
+                self._stream = balanceador.stream(
+                    self.timeout, model=self.model, messages=self.messages, keep_alive=KEEP_ALIVE, **kwargs
+                )
+                for parte in self._stream:
+                    fin = parte.get("done") if isinstance(parte, dict) else getattr(parte, "done", False)
+                    if fin:  # el último fragmento trae eval_count y eval_duration
+                        self._tokens = _tokens_respuesta(parte)
+                    yield _texto_respuesta(parte)
+            except httpx.TimeoutException as e:
+                self._registrar("tiempo_agotado")
+                raise TiempoAgotado(f"Mistral dejó de responder por más de {self.timeout} s") from e
+            except Exception:
+                self._registrar("error")
+                raise
+
+    def _registrar(self, resultado):
+        if not self._registrada:
+            self._registrada = True
+            if self.desde_cache:
+                Metricas.registrar_llamada(self.tipo, "cache")
+            elif self._llamada is not None:
+                Metricas.registrar_llamada(self.tipo, resultado, time.perf_counter() - self._llamada, *self._tokens)
+
+    def cerrar(self, texto_valido=None):
+        """Sin texto_valido la llamada cuenta como 'abortada' (el llamador descartó la respuesta)."""
+        self._registrar("ok" if texto_valido else "abortada")
+        if self._stream is not None and hasattr(self._stream, "close"):
+            try:
+                self._stream.close()
+            except Exception:
+                pass
+        if self._cache and texto_valido and not self.desde_cache:
+            self._cache.guardar(self._clave, texto_valido, time.perf_counter() - self._inicio)
+
+
+def chat_stream(prompt, model=None, format=None, options=None, forzar=False, tipo="general"):
+    return FlujoMistral(prompt, model=model, format=format, options=options, forzar=forzar, tipo=tipo)
+
+
+def estadisticas_cache():
+    return CacheLLM.cache.estadisticas() if CacheLLM.cache else {"habilitada": False}
+
+
+def estadisticas_instancias():
+    return balanceador.estadisticas()
+
+
+def estadisticas_planificador():
+    return planificador.estadisticas()
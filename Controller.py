@@ -1,14 +1,236 @@
+import json
+import logging
 import os
 import tempfile
-from pathlib import Path
-from flask import Flask, render_template, request, send_file, redirect, url_for, flash
+import threading
+from docx import Document
+from flask import Flask, Request, render_template, request, send_file, redirect, url_for, flash, jsonify, Response, g
+
+import CacheDocumentos
+import Metricas
+import ManifiestoInforme
+import PlanificadorLLM
+import VistaPrevia
+
+from ModeloInforme import (ESTRUCTURADO, generar_informe, estadisticas_secciones, regenerar_seccion_informe,
+                           agregar_puntos_informe, generar_textos_informe, renderizar_informe)
+from ModeloCuadro import generar_cuadro, generar_descripciones_semana, dia_desde_campos
+from ModeloEntrega import ANCLA_CUADRO, ANCLA_INFORME, generar_entrega
+from ModeloCuadroMensual import (leer_semanas, leer_semanas_json, generar_descripciones_semanas, generar_cuadro_semanas,
+                                 generar_cuadros_zip)
+from HorasTrabajo import resumir_semanas
+from ClienteMistral import (MODELO, estadisticas_cache, estadisticas_instancias, estadisticas_planificador,
+                           planificador, precargar)
+from Trabajos import cola, TERMINADO
+from RegistroPlantillas import registro
+from ManifiestoInforme import Manifiesto, almacen as manifiestos
+from VistaPrevia import almacen as vistas
+
+DOCX_MIME = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+ZIP_MIME = "application/zip"
+
+# Subidas y documentos generados viven en memoria; solo pasan a disco por encima de este tamaño
+UMBRAL_DISCO = int(os.environ.get("UMBRAL_DISCO_MB", "16")) * 1024 * 1024
+
+
+class SolicitudEnMemoria(Request):
+    """Las subidas van a un SpooledTemporaryFile que Werkzeug cierra (y borra) al terminar la solicitud."""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return tempfile.SpooledTemporaryFile(max_size=UMBRAL_DISCO)
 
-from ModeloInforme import generar_informe
-from ModeloCuadro import generar_cuadro, generar_descripciones_mistral
 
 app = Flask(__name__)
+app.request_class = SolicitudEnMemoria
 app.secret_key = os.environ.get("FLASK_SECRET_KEY", "devkey")  # Seguro en producción
 
+# === Medición por solicitud (Metricas): id, etapas y una línea de log al terminar ===
+if Metricas.HABILITADAS:
+    @app.before_request
+    def iniciar_medicion():
+        g.medicion = Metricas.iniciar(request.endpoint or request.path, request.headers.get("X-Request-Id"))
+        if request.method == "POST":
+            with Metricas.etapa("subida"):
+                request.form  # fuerza la lectura del formulario y los archivos subidos
+
+    @app.after_request
+    def terminar_medicion(response):
+        medicion = g.pop("medicion", None)
+        if medicion is not None:
+            response.headers["X-Request-Id"] = medicion.id
+            Metricas.terminar(medicion, response.status_code)
+        return response
+
+
+# === Usuario de la solicitud, para repartir los turnos de Mistral (PlanificadorLLM) ===
+# Por defecto la dirección del cliente. USUARIO_PROXIES: direcciones (separadas por comas) de
+# proxies de confianza; solo en solicitudes que llegan desde ellos se usa el encabezado X-Usuario.
+PROXIES_USUARIO = {h.strip() for h in os.environ.get("USUARIO_PROXIES", "").split(",") if h.strip()}
+
+
+@app.before_request
+def asignar_usuario():
+    usuario = request.remote_addr
+    if usuario in PROXIES_USUARIO:
+        usuario = request.headers.get("X-Usuario", "").strip() or usuario
+    PlanificadorLLM.asignar_usuario(usuario)
+
+
+def rechazo_saturado():
+    """Respuesta 429 con Retry-After si la cola de Mistral está llena, o None si se puede generar."""
+    try:
+        planificador.admitir()
+    except PlanificadorLLM.Saturado as e:
+        respuesta = jsonify({"error": str(e), "reintentar_en": e.reintentar_en})
+        respuesta.status_code = 429
+        respuesta.headers["Retry-After"] = str(e.reintentar_en)
+        return respuesta
+    return None
+
+
+# Carga el modelo en ollama al arrancar, sin bloquear el inicio de la app
+if os.environ.get("MISTRAL_PRECARGAR", "1") == "1":
+    threading.Thread(target=precargar, daemon=True).start()
+
+
+def buffer_salida():
+    """Destino del documento generado: en memoria salvo que supere UMBRAL_DISCO."""
+    return tempfile.SpooledTemporaryFile(max_size=UMBRAL_DISCO)
+
+
+def enviar_buffer(buffer, nombre, mimetype=DOCX_MIME, etag=None):
+    """send_file cierra el buffer al terminar de enviar la respuesta."""
+    buffer.seek(0)
+    respuesta = send_file(buffer, as_attachment=True, download_name=nombre, mimetype=mimetype)
+    if etag:
+        respuesta.set_etag(etag)
+    return respuesta
+
+
+# === Caché de documentos completos (CacheDocumentos) ===
+def clave_solicitud(tipo, campo_archivo, entradas):
+    """
+    Clave del documento pedido: plantilla registrada o subida (por su hash de contenido) y entradas,
+    más lo que cambia la salida sin estar en el formulario (modelo y modo JSON).
+    None si la caché está deshabilitada o no hay plantilla.
+    """
+    if CacheDocumentos.cache is None:
+        return None
+    plantilla_id = request.form.get("plantilla_id", "").strip()
+    if not plantilla_id:
+        file = request.files.get(campo_archivo)
+        if not file or file.filename == "":
+            return None
+        plantilla_id = CacheDocumentos.id_plantilla(file.stream)
+    return CacheDocumentos.clave_documento(tipo, plantilla_id, dict(entradas, modelo=MODELO, json=ESTRUCTURADO))
+
+
+def copiar_informe_guardado(ruta, informe_id):
+    """
+    Copia de un informe guardado con su propio manifiesto (mismo contenido y marcadores, otro id),
+    para que agregar o regenerar en una descarga no cambie las demás. (buffer, id nuevo), o None
+    si el manifiesto original ya venció o el archivo fue expulsado.
+    """
+    original = manifiestos.obtener(informe_id)
+    if original is None:
+        return None
+    try:
+        with Metricas.etapa("parseo_docx"):
+            doc = Document(str(ruta))
+    except FileNotFoundError:
+        return None
+    manifiesto = original.copia()
+    ManifiestoInforme.identificar(doc, manifiesto.id)
+    salida = buffer_salida()
+    with Metricas.etapa("guardado"):
+        doc.save(salida)
+    manifiestos.guardar(manifiesto)
+    return salida, manifiesto.id
+
+
+def enviar_guardado(clave):
+    """Respuesta con el documento guardado (304 si If-None-Match coincide), o None si no está."""
+    encontrado = CacheDocumentos.cache.obtener(clave) if clave else None
+    if encontrado is None:
+        return None
+    ruta, datos = encontrado
+    encabezados = dict(datos["encabezados"])
+    informe_id = encabezados.pop(CacheDocumentos.ENCABEZADO_INFORME, None)
+    condicional = request.method in ("GET", "HEAD") and request.if_none_match.contains(clave)  # 304
+    if informe_id and not condicional:
+        copia = copiar_informe_guardado(ruta, informe_id)
+        if copia is None:
+            CacheDocumentos.cache.invalidar(clave)
+            return None
+        salida, encabezados[CacheDocumentos.ENCABEZADO_INFORME] = copia
+        respuesta = enviar_buffer(salida, datos["nombre"], etag=clave)
+    else:
+        try:
+            respuesta = send_file(ruta, as_attachment=True, download_name=datos["nombre"], mimetype=DOCX_MIME,
+                                  etag=clave, conditional=True)
+        except FileNotFoundError:  # expulsado entre obtener y enviar
+            return None
+    respuesta.headers.update(encabezados)
+    respuesta.headers["Content-Location"] = url_for("documento_descargar_view", clave=clave)
+    return respuesta
+
+
+def enviar_documento(salida, nombre, clave, encabezados=None):
+    """
+    Guarda el documento generado en la caché (si hay clave) y lo envía con su ETag;
+    Content-Location apunta a la descarga condicional (GET con If-None-Match).
+    """
+    respuesta = enviar_buffer(salida, nombre, etag=clave)
+    respuesta.headers.update(encabezados or {})
+    if clave:
+        CacheDocumentos.cache.guardar(clave, salida, nombre, encabezados)
+        respuesta.headers["Content-Location"] = url_for("documento_descargar_view", clave=clave)
+    return respuesta
+
+
+# === Lectura de formularios ===
+def leer_puntos(form):
+    puntos_texto = form.get("puntos", "").strip()
+    return [p.strip() for p in puntos_texto.splitlines() if p.strip()]
+
+
+def leer_dias_semana(form):
+    """Arma la lista dias_semana desde el formulario (tareas aún sin descripción)."""
+    return [
+        dia_desde_campos(
+            form.get(f"dia_{i}"),
+            fecha=form.get(f"fecha_{i}"),
+            laborable=form.get(f"laborable_{i}"),
+            hora_inicio=form.get(f"hora_inicio_{i}"),
+            hora_fin=form.get(f"hora_fin_{i}"),
+            tema=form.get(f"tema_{i}"),
+            tareas=form.get(f"tareas_{i}", ""),
+        )
+        for i in range(1, 7)
+    ]
+
+
+def resolver_base(campo_archivo, *anclas):
+    """
+    Documento base de la solicitud, ya parseado: la plantilla registrada 'plantilla_id'
+    (clonada) o el archivo subido en 'campo_archivo', leído desde memoria.
+    Retorna (Document, posicion_ancla, ...) con una posición por ancla. Lanza ValueError si no hay base.
+    """
+    plantilla_id = request.form.get("plantilla_id", "").strip()
+    if plantilla_id:
+        plantilla = registro.obtener(plantilla_id)
+        if plantilla is None:
+            raise ValueError(f"La plantilla {plantilla_id} no está registrada")
+        with Metricas.etapa("clonar_plantilla"):
+            return (plantilla.clonar(), *(plantilla.posicion(ancla) for ancla in anclas))
+
+    file = request.files.get(campo_archivo)
+    if not file or file.filename == "":
+        raise ValueError("Debes subir un archivo base o indicar una plantilla registrada")
+    file.stream.seek(0)
+    with Metricas.etapa("parseo_docx"):
+        return (Document(file.stream), *(None for _ in anclas))
+
 
 # === Página principal ===
 @app.route("/")
@@ -20,31 +242,40 @@ def index():
 @app.route("/generar_informe", methods=["POST"])
 def generar_informe_view():
     try:
-        file = request.files.get("archivo_base")
-        if not file or file.filename == "":
-            flash("Debes subir un archivo base para el informe")
-            return redirect(url_for("index"))
-
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".docx") as temp_base:
-            file.save(temp_base.name)
-
         tarea = request.form.get("tarea", "Tarea no especificada")
-        puntos_texto = request.form.get("puntos", "").strip()
-        puntos = [p.strip() for p in puntos_texto.splitlines() if p.strip()]
+        puntos = leer_puntos(request.form)
 
         if not puntos:
             flash("Debes ingresar al menos un punto")
-            os.unlink(temp_base.name)
             return redirect(url_for("index"))
 
-        # Archivo de salida temporal
-        salida = tempfile.mktemp(suffix=".docx")
+        forzar = request.form.get("forzar") == "si"
+        clave = clave_solicitud("informe", "archivo_base", {"tarea": tarea, "puntos": puntos})
+        guardado = None if forzar else enviar_guardado(clave)
+        if guardado is not None:
+            return guardado
+        rechazo = rechazo_saturado()
+        if rechazo is not None:
+            return rechazo
+
         ancla = "[[INICIO_INFORME]]"
+        try:
+            base, posicion = resolver_base("archivo_base", ancla)
+        except ValueError as e:
+            flash(str(e))
+            return redirect(url_for("index"))
 
-        path_final = generar_informe(temp_base.name, salida, puntos, tarea, ancla=ancla)
-        os.unlink(temp_base.name)
+        manifiesto = Manifiesto(tarea, ancla, plantilla_id=request.form.get("plantilla_id", "").strip() or None)
+        salida = buffer_salida()
+        try:
+            generar_informe(base, salida, puntos, tarea, ancla=ancla, forzar=forzar, posicion_ancla=posicion,
+                            manifiesto=manifiesto)
+        except Exception:
+            salida.close()
+            raise
+        manifiestos.guardar(manifiesto)
 
-        return send_file(path_final, as_attachment=True)
+        return enviar_documento(salida, "informe.docx", clave, {"X-Informe-Id": manifiesto.id})
 
     except Exception as e:
         flash(f"Error al generar informe: {e}")
@@ -55,76 +286,568 @@ def generar_informe_view():
 @app.route("/generar_cuadro", methods=["POST"])
 def generar_cuadro_view():
     try:
-        file = request.files.get("archivo_base_cuadro")
-        if not file or file.filename == "":
-            flash("Debes subir un archivo base para el cuadro")
-            return redirect(url_for("index"))
+        dias_semana = leer_dias_semana(request.form)
+        forzar = request.form.get("forzar") == "si"
+        clave = clave_solicitud("cuadro", "archivo_base_cuadro", {"dias_semana": dias_semana})
+        guardado = None if forzar else enviar_guardado(clave)
+        if guardado is not None:
+            return guardado
+        rechazo = rechazo_saturado()
+        if rechazo is not None:
+            return rechazo
 
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".docx") as temp_base:
-            file.save(temp_base.name)
-
-        dias_semana = []
-        for i in range(1, 7):
-            dia = request.form.get(f"dia_{i}")
-            fecha = request.form.get(f"fecha_{i}")
-            laborable = request.form.get(f"laborable_{i}")
-            hora_inicio = request.form.get(f"hora_inicio_{i}")
-            hora_fin = request.form.get(f"hora_fin_{i}")
-            tema = request.form.get(f"tema_{i}")
-            tareas_texto = request.form.get(f"tareas_{i}", "")
-
-            # Día vacío → no laborable
-            if not fecha and not tema and not tareas_texto.strip():
-                dias_semana.append({
-                    "dia": dia,
-                    "fecha": "",
-                    "laborable": False,
-                    "razon_no_lab": "Día sin actividades",
-                    "temas": [],
-                    "horas": "",
-                })
-                continue
-
-            if laborable == "si":
-                horas = f"{hora_inicio}–{hora_fin}" if hora_inicio and hora_fin else ""
-                tareas = [t.strip() for t in tareas_texto.splitlines() if t.strip()]
-
-                try:
-                    tareas_con_desc = generar_descripciones_mistral(tema or "Sin tema", tareas) if tareas else []
-                except Exception:
-                    tareas_con_desc = [{"nombre": t, "descripcion": "Realicé una tarea sin descripción"} for t in tareas]
-
-                temas = [{"tema": tema or "Sin tema", "tareas": tareas_con_desc}] if tareas_con_desc else []
-
-                dias_semana.append({
-                    "dia": dia,
-                    "fecha": fecha or "",
-                    "laborable": True,
-                    "temas": temas,
-                    "horas": horas,
-                })
-            else:
-                dias_semana.append({
-                    "dia": dia,
-                    "fecha": fecha or "",
-                    "laborable": False,
-                    "razon_no_lab": "Día no laborable",
-                    "temas": [],
-                    "horas": "",
-                })
-
-        salida = tempfile.mktemp(suffix=".docx")
         ancla = "[[AQUI_TABLA]]"
+        try:
+            base, posicion = resolver_base("archivo_base_cuadro", ancla)
+        except ValueError as e:
+            flash(str(e))
+            return redirect(url_for("index"))
 
-        path_final = generar_cuadro(temp_base.name, salida, dias_semana, ancla=ancla)
-        os.unlink(temp_base.name)
+        generar_descripciones_semana(dias_semana, forzar=forzar)
 
-        return send_file(path_final, as_attachment=True)
+        salida = buffer_salida()
+        try:
+            generar_cuadro(base, salida, dias_semana, ancla=ancla, posicion_ancla=posicion)
+        except Exception:
+            salida.close()
+            raise
+
+        return enviar_documento(salida, "cuadro.docx", clave)
 
     except Exception as e:
         flash(f"Error al generar cuadro: {e}")
         return redirect(url_for("index"))
 
 
+# === Generar informe y cuadro en la misma plantilla ===
+@app.route("/generar_entrega", methods=["POST"])
+def generar_entrega_view():
+    """Una plantilla con [[INICIO_INFORME]] y [[AQUI_TABLA]]: campos del informe y de los días en el mismo formulario."""
+    try:
+        tarea = request.form.get("tarea", "Tarea no especificada")
+        puntos = leer_puntos(request.form)
+        if not puntos:
+            flash("Debes ingresar al menos un punto")
+            return redirect(url_for("index"))
+        dias_semana = leer_dias_semana(request.form)
+
+        forzar = request.form.get("forzar") == "si"
+        clave = clave_solicitud("entrega", "archivo_base",
+                                {"tarea": tarea, "puntos": puntos, "dias_semana": dias_semana})
+        guardado = None if forzar else enviar_guardado(clave)
+        if guardado is not None:
+            return guardado
+        rechazo = rechazo_saturado()
+        if rechazo is not None:
+            return rechazo
+
+        try:
+            base, pos_informe, pos_cuadro = resolver_base("archivo_base", ANCLA_INFORME, ANCLA_CUADRO)
+        except ValueError as e:
+            flash(str(e))
+            return redirect(url_for("index"))
+
+        manifiesto = Manifiesto(tarea, ANCLA_INFORME, plantilla_id=request.form.get("plantilla_id", "").strip() or None)
+        salida = buffer_salida()
+        try:
+            generar_entrega(base, salida, puntos, tarea, dias_semana, posicion_informe=pos_informe,
+                            posicion_cuadro=pos_cuadro, forzar=forzar, manifiesto=manifiesto)
+        except Exception:
+            salida.close()
+            raise
+        manifiestos.guardar(manifiesto)
+
+        return enviar_documento(salida, "entrega.docx", clave, {"X-Informe-Id": manifiesto.id})
+
+    except Exception as e:
+        flash(f"Error al generar la entrega: {e}")
+        return redirect(url_for("index"))
+
+
+# === Generar Cuadro de varias semanas ===
+@app.route("/generar_cuadro_lote", methods=["POST"])
+def generar_cuadro_lote_view():
+    try:
+        archivo_semanas = request.files.get("semanas")
+        if not archivo_semanas or archivo_semanas.filename == "":
+            flash("Debes subir el archivo de semanas (.json o .csv)")
+            return redirect(url_for("index"))
+        try:
+            semanas = leer_semanas(archivo_semanas.filename, archivo_semanas.read())
+        except Exception as e:
+            flash(f"Archivo de semanas inválido: {e}")
+            return redirect(url_for("index"))
+        if not semanas:
+            flash("El archivo de semanas no tiene ninguna semana")
+            return redirect(url_for("index"))
+        rechazo = rechazo_saturado()
+        if rechazo is not None:
+            return rechazo
+
+        ancla = "[[AQUI_TABLA]]"
+        try:
+            base, posicion = resolver_base("archivo_base_lote", ancla)
+        except ValueError as e:
+            flash(str(e))
+            return redirect(url_for("index"))
+
+        generar_descripciones_semanas(semanas, forzar=request.form.get("forzar") == "si")
+
+        salida = buffer_salida()
+        try:
+            if request.form.get("salida") == "zip":
+                generar_cuadros_zip(base, salida, semanas, ancla=ancla, posicion_ancla=posicion)
+                return enviar_buffer(salida, "cuadros.zip", ZIP_MIME)
+            generar_cuadro_semanas(base, salida, semanas, ancla=ancla, posicion_ancla=posicion)
+            return enviar_buffer(salida, "cuadro.docx")
+        except Exception:
+            salida.close()
+            raise
+
+    except Exception as e:
+        flash(f"Error al generar cuadro de varias semanas: {e}")
+        return redirect(url_for("index"))
+
+
+@app.route("/cuadro/resumen", methods=["POST"])
+def cuadro_resumen_view():
+    """
+    Totales de horas por semana, mes y semestre (sin llamar a Mistral ni armar el .docx).
+    Semanas en el archivo 'semanas' (.json o .csv, como /generar_cuadro_lote) o en el cuerpo JSON.
+    """
+    archivo_semanas = request.files.get("semanas")
+    try:
+        if archivo_semanas and archivo_semanas.filename:
+            semanas = leer_semanas(archivo_semanas.filename, archivo_semanas.read())
+        elif request.is_json:
+            semanas = leer_semanas_json(request.get_data(as_text=True))
+        else:
+            return jsonify({"error": "Debes subir el archivo de semanas (.json o .csv) o enviarlas como JSON"}), 400
+    except Exception as e:
+        return jsonify({"error": f"Semanas inválidas: {e}"}), 400
+    with Metricas.etapa("resumen_horas"):
+        return jsonify(resumir_semanas(semanas))
+
+
+# === Vista previa: mismo contenido generado, sin cargar ni guardar ningún .docx (ver VistaPrevia) ===
+def quiere_json():
+    return (request.values.get("formato") == "json"
+            or request.accept_mimetypes.best_match(["text/html", "application/json"]) == "application/json")
+
+
+def responder_vista(vista):
+    """HTML (o JSON con formato=json / Accept: application/json) del contenido y la URL para descargarlo."""
+    datos = dict(vista.como_dict(), descarga_url=url_for("vista_previa_descargar_view", vista_id=vista.id))
+    if quiere_json():
+        return jsonify(datos)
+    return render_template("vista_previa.html", vista=datos)
+
+
+@app.route("/vista_previa/informe", methods=["POST"])
+def vista_previa_informe_view():
+    tarea = request.form.get("tarea", "Tarea no especificada")
+    puntos = leer_puntos(request.form)
+    if not puntos:
+        return jsonify({"error": "Debes ingresar al menos un punto"}), 400
+    rechazo = rechazo_saturado()
+    if rechazo is not None:
+        return rechazo
+
+    intro, contenidos = generar_textos_informe(puntos, forzar=request.form.get("forzar") == "si")
+    vista = VistaPrevia.VistaPrevia(VistaPrevia.INFORME,
+                                    {"tarea": tarea, "puntos": puntos, "intro": intro, "contenidos": contenidos})
+    return responder_vista(vistas.guardar(vista))
+
+
+@app.route("/vista_previa/cuadro", methods=["POST"])
+def vista_previa_cuadro_view():
+    """Días del formulario (una semana) o el archivo 'semanas' (.json o .csv, como /generar_cuadro_lote)."""
+    archivo_semanas = request.files.get("semanas")
+    lote = bool(archivo_semanas and archivo_semanas.filename)
+    if lote:
+        try:
+            semanas = leer_semanas(archivo_semanas.filename, archivo_semanas.read())
+        except Exception as e:
+            return jsonify({"error": f"Archivo de semanas inválido: {e}"}), 400
+        if not semanas:
+            return jsonify({"error": "El archivo de semanas no tiene ninguna semana"}), 400
+    else:
+        semanas = [{"titulo": "Semana 1", "dias": leer_dias_semana(request.form)}]
+    rechazo = rechazo_saturado()
+    if rechazo is not None:
+        return rechazo
+
+    generar_descripciones_semanas(semanas, forzar=request.form.get("forzar") == "si")
+    vista = VistaPrevia.VistaPrevia(VistaPrevia.CUADRO,
+                                    {"semanas": semanas, "lote": lote, "resumen": resumir_semanas(semanas)})
+    return responder_vista(vistas.guardar(vista))
+
+
+@app.route("/vista_previa/<vista_id>")
+def vista_previa_view(vista_id):
+    vista = vistas.obtener(vista_id)
+    if vista is None:
+        return jsonify({"error": "Vista previa no encontrada o vencida"}), 404
+    return responder_vista(vista)
+
+
+@app.route("/vista_previa/<vista_id>/descargar", methods=["POST"])
+def vista_previa_descargar_view(vista_id):
+    """
+    Arma el .docx con el contenido ya generado (no llama a Mistral) sobre el archivo subido en
+    'archivo_base' o la plantilla 'plantilla_id'. Un cuadro de varias semanas admite salida=zip.
+    """
+    vista = vistas.obtener(vista_id)
+    if vista is None:
+        return jsonify({"error": "Vista previa no encontrada o vencida"}), 404
+    contenido = vista.contenido
+    ancla = "[[INICIO_INFORME]]" if vista.tipo == VistaPrevia.INFORME else "[[AQUI_TABLA]]"
+    try:
+        base, posicion = resolver_base("archivo_base", ancla)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    salida = buffer_salida()
+    try:
+        if vista.tipo == VistaPrevia.INFORME:
+            manifiesto = Manifiesto(contenido["tarea"], ancla, informe_id=vista.id,
+                                    plantilla_id=request.form.get("plantilla_id", "").strip() or None)
+            renderizar_informe(base, salida, contenido["puntos"], contenido["tarea"], contenido["intro"],
+                               contenido["contenidos"], ancla=ancla, posicion_ancla=posicion, manifiesto=manifiesto)
+            manifiestos.guardar(manifiesto)
+            respuesta = enviar_buffer(salida, "informe.docx")
+            respuesta.headers["X-Informe-Id"] = manifiesto.id
+            return respuesta
+        semanas = contenido["semanas"]
+        if not contenido["lote"]:
+            generar_cuadro(base, salida, semanas[0]["dias"], ancla=ancla, posicion_ancla=posicion)
+            return enviar_buffer(salida, "cuadro.docx")
+        if request.form.get("salida") == "zip":
+            generar_cuadros_zip(base, salida, semanas, ancla=ancla, posicion_ancla=posicion)
+            return enviar_buffer(salida, "cuadros.zip", ZIP_MIME)
+        generar_cuadro_semanas(base, salida, semanas, ancla=ancla, posicion_ancla=posicion)
+        return enviar_buffer(salida, "cuadro.docx")
+    except Exception:
+        salida.close()
+        raise
+
+
+# === Trabajos en segundo plano ===
+def _respuesta_trabajo(trabajo):
+    datos = trabajo.como_dict()
+    datos["estado_url"] = url_for("trabajo_estado_view", trabajo_id=trabajo.id)
+    datos["descarga_url"] = url_for("trabajo_descargar_view", trabajo_id=trabajo.id)
+    datos["eventos_url"] = url_for("trabajo_eventos_view", trabajo_id=trabajo.id)
+    return datos
+
+
+@app.route("/trabajos/informe", methods=["POST"])
+def trabajo_informe_view():
+    tarea = request.form.get("tarea", "Tarea no especificada")
+    puntos = leer_puntos(request.form)
+    if not puntos:
+        return jsonify({"error": "Debes ingresar al menos un punto"}), 400
+    rechazo = rechazo_saturado()
+    if rechazo is not None:
+        return rechazo
+    forzar = request.form.get("forzar") == "si"
+    ancla = "[[INICIO_INFORME]]"
+
+    try:
+        base, posicion = resolver_base("archivo_base", ancla)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    trabajo = cola.crear("informe")
+    manifiesto = Manifiesto(tarea, ancla, plantilla_id=request.form.get("plantilla_id", "").strip() or None)
+
+    def ejecutar(t):
+        generar_informe(base, t.salida, puntos, tarea, ancla=ancla, forzar=forzar, posicion_ancla=posicion,
+                        progreso=lambda hechos, total: t.actualizar(hechos, total + 1, f"Sección {hechos}/{total}"),
+                        al_avanzar=lambda i, ev: t.publicar(dict(ev, punto=i + 1, titulo=puntos[i])),
+                        manifiesto=manifiesto)
+        manifiestos.guardar(manifiesto)
+        t.resultado["informe_id"] = manifiesto.id
+
+    cola.enviar(trabajo, ejecutar)
+    return jsonify(_respuesta_trabajo(trabajo)), 202
+
+
+@app.route("/trabajos/cuadro", methods=["POST"])
+def trabajo_cuadro_view():
+    dias_semana = leer_dias_semana(request.form)
+    forzar = request.form.get("forzar") == "si"
+    ancla = "[[AQUI_TABLA]]"
+
+    try:
+        base, posicion = resolver_base("archivo_base_cuadro", ancla)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    rechazo = rechazo_saturado()
+    if rechazo is not None:
+        return rechazo
+    trabajo = cola.crear("cuadro")
+
+    def ejecutar(t):
+        generar_descripciones_semana(dias_semana, forzar=forzar,
+                                     progreso=lambda hechos, total: t.actualizar(hechos, total + 1, f"Día {hechos}/{total}"))
+        generar_cuadro(base, t.salida, dias_semana, ancla=ancla, posicion_ancla=posicion)
+
+    cola.enviar(trabajo, ejecutar)
+    return jsonify(_respuesta_trabajo(trabajo)), 202
+
+
+@app.route("/trabajos/entrega", methods=["POST"])
+def trabajo_entrega_view():
+    tarea = request.form.get("tarea", "Tarea no especificada")
+    puntos = leer_puntos(request.form)
+    if not puntos:
+        return jsonify({"error": "Debes ingresar al menos un punto"}), 400
+    rechazo = rechazo_saturado()
+    if rechazo is not None:
+        return rechazo
+    dias_semana = leer_dias_semana(request.form)
+    forzar = request.form.get("forzar") == "si"
+
+    try:
+        base, pos_informe, pos_cuadro = resolver_base("archivo_base", ANCLA_INFORME, ANCLA_CUADRO)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    trabajo = cola.crear("entrega")
+    manifiesto = Manifiesto(tarea, ANCLA_INFORME, plantilla_id=request.form.get("plantilla_id", "").strip() or None)
+
+    def ejecutar(t):
+        generar_entrega(base, t.salida, puntos, tarea, dias_semana, posicion_informe=pos_informe,
+                        posicion_cuadro=pos_cuadro, forzar=forzar, manifiesto=manifiesto,
+                        progreso=lambda hechos, total: t.actualizar(hechos, total + 1, f"Llamada {hechos}/{total}"))
+        manifiestos.guardar(manifiesto)
+        t.resultado["informe_id"] = manifiesto.id
+
+    cola.enviar(trabajo, ejecutar)
+    return jsonify(_respuesta_trabajo(trabajo)), 202
+
+
+@app.route("/trabajos/<trabajo_id>")
+def trabajo_estado_view(trabajo_id):
+    trabajo = cola.obtener(trabajo_id)
+    if trabajo is None:
+        return jsonify({"error": "Trabajo no encontrado o expirado"}), 404
+    return jsonify(_respuesta_trabajo(trabajo))
+
+
+@app.route("/trabajos/<trabajo_id>/descargar")
+def trabajo_descargar_view(trabajo_id):
+    trabajo = cola.obtener(trabajo_id)
+    if trabajo is None:
+        return jsonify({"error": "Trabajo no encontrado o expirado"}), 404
+    if trabajo.estado != TERMINADO:
+        return jsonify(_respuesta_trabajo(trabajo)), 409
+    return enviar_buffer(trabajo.copia_salida(), f"{trabajo.tipo}.docx")
+
+
+@app.route("/trabajos/<trabajo_id>/eventos")
+def trabajo_eventos_view(trabajo_id):
+    """
+    Server-Sent Events: progreso y secciones del informe a medida que se generan. Los eventos
+    de sección traen 'punto' numerado desde 1, como 'seccion' en /informe/regenerar.
+    """
+    trabajo = cola.obtener(trabajo_id)
+    if trabajo is None:
+        return jsonify({"error": "Trabajo no encontrado o expirado"}), 404
+
+    def flujo():
+        enviados = 0
+        while True:
+            nuevos = trabajo.esperar_eventos(enviados)
+            for evento in nuevos:
+                yield f"data: {json.dumps(evento, ensure_ascii=False)}\n\n"
+                if evento.get("tipo") == "fin":
+                    return
+            enviados += len(nuevos)
+            if not nuevos:
+                yield ": keep-alive\n\n"
+
+    return Response(flujo(), mimetype="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+# === Regeneración incremental de un informe ya generado (ver ManifiestoInforme) ===
+def leer_informe_subido():
+    """
+    (Document, Manifiesto) del informe subido en 'documento'; el id sale del campo
+    'informe_id' o de las propiedades del .docx. Lanza LookupError con el mensaje y código HTTP.
+    """
+    file = request.files.get("documento")
+    if not file or file.filename == "":
+        raise LookupError("Debes subir el informe generado (.docx) en 'documento'", 400)
+    file.stream.seek(0)
+    try:
+        with Metricas.etapa("parseo_docx"):
+            doc = Document(file.stream)
+    except Exception as e:
+        raise LookupError(f"No es un .docx válido: {e}", 400)
+    informe_id = request.form.get("informe_id", "").strip() or ManifiestoInforme.identificador(doc)
+    manifiesto = manifiestos.obtener(informe_id)
+    if manifiesto is None:
+        raise LookupError("No hay manifiesto para este informe (¿se generó aquí?)", 404)
+    return doc, manifiesto
+
+
+def responder_informe(modificar, llama_mistral=True):
+    """Carga el informe subido, aplica modificar(doc, salida, manifiesto), guarda el manifiesto y envía el .docx."""
+    rechazo = rechazo_saturado() if llama_mistral else None
+    if rechazo is not None:
+        return rechazo
+    try:
+        doc, manifiesto = leer_informe_subido()
+    except LookupError as e:
+        mensaje, codigo = e.args
+        return jsonify({"error": mensaje}), codigo
+    salida = buffer_salida()
+    try:
+        modificar(doc, salida, manifiesto)
+    except (IndexError, ValueError) as e:
+        salida.close()
+        return jsonify({"error": str(e)}), 400
+    except ManifiestoInforme.SeccionNoEncontrada as e:
+        salida.close()
+        return jsonify({"error": e.args[0]}), 409
+    except Exception:
+        salida.close()
+        raise
+    manifiestos.guardar(manifiesto)
+    if CacheDocumentos.cache is not None:
+        CacheDocumentos.cache.invalidar_informe(manifiesto.id)
+    respuesta = enviar_buffer(salida, "informe.docx")
+    respuesta.headers["X-Informe-Id"] = manifiesto.id
+    return respuesta
+
+
+@app.route("/informe/regenerar", methods=["POST"])
+def informe_regenerar_view():
+    """
+    seccion: 'intro' o el número del punto. Opcional: 'titulo' (nuevo tema del punto) o
+    'descripcion' / 'ejemplo' / 'explicacion' para reemplazar el texto sin llamar a Mistral.
+    """
+    seccion = request.form.get("seccion", "").strip().lower()
+    titulo = request.form.get("titulo", "").strip() or None
+    dados = {c: request.form[c].strip() for c in ("descripcion", "ejemplo", "explicacion")
+             if request.form.get(c, "").strip()}
+
+    def modificar(doc, salida, manifiesto):
+        if seccion == "intro":
+            return regenerar_seccion_informe(doc, salida, manifiesto, "intro")
+        if not seccion.isdigit():
+            raise ValueError("'seccion' debe ser 'intro' o el número del punto")
+        partes = {**manifiesto.punto(int(seccion))["partes"], **dados} if dados else None
+        return regenerar_seccion_informe(doc, salida, manifiesto, int(seccion), titulo=titulo, partes=partes)
+
+    return responder_informe(modificar, llama_mistral=not dados or seccion == "intro")
+
+
+@app.route("/informe/agregar", methods=["POST"])
+def informe_agregar_view():
+    puntos = leer_puntos(request.form)
+    if not puntos:
+        return jsonify({"error": "Debes ingresar al menos un punto"}), 400
+    forzar = request.form.get("forzar") == "si"
+    return responder_informe(lambda doc, salida, manifiesto:
+                             agregar_puntos_informe(doc, salida, manifiesto, puntos, forzar=forzar))
+
+
+@app.route("/informe/<informe_id>/manifiesto")
+def informe_manifiesto_view(informe_id):
+    manifiesto = manifiestos.obtener(informe_id)
+    if manifiesto is None:
+        return jsonify({"error": "Manifiesto no encontrado"}), 404
+    return jsonify(manifiesto.como_dict())
+
+
+# === Registro de plantillas ===
+@app.route("/plantillas", methods=["GET"])
+def plantillas_listar_view():
+    return jsonify(registro.listar())
+
+
+@app.route("/plantillas", methods=["POST"])
+def plantillas_subir_view():
+    file = request.files.get("archivo")
+    if not file or file.filename == "":
+        return jsonify({"error": "Debes subir un archivo .docx"}), 400
+    try:
+        plantilla = registro.registrar(file.read(), nombre=file.filename)
+    except Exception as e:
+        return jsonify({"error": f"No es un .docx válido: {e}"}), 400
+    return jsonify(plantilla.como_dict()), 201
+
+
+@app.route("/plantillas/<plantilla_id>", methods=["DELETE"])
+def plantillas_eliminar_view(plantilla_id):
+    if not registro.eliminar(plantilla_id):
+        return jsonify({"error": "Plantilla no encontrada"}), 404
+    return "", 204
+
+
+# === Caché de documentos completos: estado e invalidación ===
+@app.route("/documentos/cache", methods=["GET"])
+def documentos_cache_view():
+    if CacheDocumentos.cache is None:
+        return jsonify({"habilitada": False})
+    return jsonify(dict(CacheDocumentos.cache.estadisticas(), habilitada=True))
+
+
+@app.route("/documentos/<clave>")
+def documento_descargar_view(clave):
+    """Vuelve a descargar un documento guardado; responde 304 si If-None-Match trae su ETag."""
+    respuesta = enviar_guardado(clave) if CacheDocumentos.cache is not None else None
+    if respuesta is None:
+        return jsonify({"error": "Documento no encontrado en la caché"}), 404
+    return respuesta
+
+
+@app.route("/documentos/cache", methods=["DELETE"])
+@app.route("/documentos/cache/<clave>", methods=["DELETE"])
+def documentos_cache_invalidar_view(clave=None):
+    """Sin clave vacía la caché; la clave es el ETag recibido con el documento."""
+    if CacheDocumentos.cache is None:
+        return jsonify({"borradas": 0})
+    borradas = CacheDocumentos.cache.invalidar(clave.strip('"') if clave else None)
+    if clave and not borradas:
+        return jsonify({"error": "Documento no encontrado en la caché"}), 404
+    return jsonify({"borradas": borradas})
+
+
+# === Estadísticas de la caché de Mistral ===
+@app.route("/cache/estadisticas")
+def cache_estadisticas_view():
+    return jsonify(estadisticas_cache())
+
+
+# === Reintentos y tokens por camino de generación de los puntos (etiquetas o JSON) ===
+@app.route("/informe/estadisticas")
+def informe_estadisticas_view():
+    return jsonify(estadisticas_secciones())
+
+
+# === Estado de las instancias de ollama (balanceo y expulsiones) ===
+@app.route("/ollama/instancias")
+def ollama_instancias_view():
+    return jsonify(estadisticas_instancias())
+
+
+# === Turnos de Mistral: en curso, en cola y rechazos ===
+@app.route("/mistral/planificador")
+def mistral_planificador_view():
+    return jsonify(estadisticas_planificador())
+
+
+# === Métricas en formato Prometheus ===
+@app.route("/metrics")
+def metrics_view():
+    if not Metricas.HABILITADAS:
+        return jsonify({"error": "Métricas deshabilitadas (METRICAS=0)"}), 404
+    return Response(Metricas.exponer(), mimetype="text/plain; version=0.0.4")
+
+
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
+    logging.getLogger("httpx").setLevel(logging.WARNING)
     app.run(debug=True)
@@ -0,0 +1,71 @@
+# EstilosDocx.py
+# Estilos de párrafo con nombre para el informe y el cuadro. Se registran una vez por documento
+# y cada párrafo generado solo lleva su w:pStyle, en lugar de repetir fuente, tamaño y negrita en cada run.
+import os
+from xml.sax.saxutils import quoteattr
+
+from docx.enum.style import WD_STYLE_TYPE
+from docx.oxml import parse_xml
+from docx.oxml.ns import nsdecls, qn
+
+# DOCX_ESTILOS=0 vuelve al formato directo por run (mismo aspecto, XML más grande)
+HABILITADOS = os.environ.get("DOCX_ESTILOS", "1") == "1"
+
+
+class Estilo:
+    """Estilo de párrafo: alineación en pPr y fuente (opcional), negrita y tamaño en rPr."""
+
+    def __init__(self, style_id, nombre, tam, bold, alineacion="left", fuente=None):
+        self.id = style_id
+        self.nombre = nombre
+        self.tam = tam
+        self.bold = bold
+        self.alineacion = alineacion
+        self.fuente = fuente
+
+    def xml(self, base_id=None):
+        fuente = f"<w:rFonts w:ascii={quoteattr(self.fuente)} w:hAnsi={quoteattr(self.fuente)}/>" if self.fuente else ""
+        negrita = "<w:b/>" if self.bold else '<w:b w:val="0"/>'
+        return (
+            f'<w:style {nsdecls("w")} w:type="paragraph" w:customStyle="1" w:styleId="{self.id}">'
+            f"<w:name w:val={quoteattr(self.nombre)}/>"
+            + (f"<w:basedOn w:val={quoteattr(base_id)}/>" if base_id else "")
+            + "<w:qFormat/>"
+            f'<w:pPr><w:jc w:val="{self.alineacion}"/></w:pPr>'
+            f'<w:rPr>{fuente}{negrita}<w:sz w:val="{int(self.tam * 2)}"/></w:rPr>'
+            "</w:style>"
+        )
+
+
+# Mismo formato que el que se aplicaba run por run (ModeloInforme con Arial, el cuadro con la fuente de la plantilla)
+ESTILOS = [
+    Estilo("InfTitulo", "Informe título", 18, True, fuente="Arial"),
+    Estilo("InfEtiqueta", "Informe etiqueta", 11, True, fuente="Arial"),
+    Estilo("InfCuerpo", "Informe cuerpo", 11, False, fuente="Arial"),
+    Estilo("CuaEncabezado", "Cuadro encabezado", 9, True, "center"),
+    Estilo("CuaTexto", "Cuadro texto", 9, False, "center"),
+    Estilo("CuaTotal", "Cuadro total", 9, True, "left"),
+    Estilo("CuaTarea", "Cuadro tarea", 7, True, "center"),
+    Estilo("CuaDescripcion", "Cuadro descripción", 7, False, "center"),
+    Estilo("CuaNota", "Cuadro nota", 7, False, "left"),
+]
+_POR_FORMATO = {(e.fuente, e.tam, e.bold, e.alineacion): e for e in ESTILOS}
+
+
+def estilo_para(tam, bold, alineacion="left", fuente=None):
+    """styleId del estilo con ese formato, o None si no hay uno (el llamador usa formato directo)."""
+    estilo = _POR_FORMATO.get((fuente, tam, bool(bold), alineacion))
+    return estilo.id if estilo else None
+
+
+def registrar(doc):
+    """Agrega a styles.xml los estilos que aún no tenga (basados en el estilo de párrafo por defecto)."""
+    estilos = doc.styles.element
+    existentes = {s.get(qn("w:styleId")) for s in estilos.iterchildren(qn("w:style"))}
+    faltan = [e for e in ESTILOS if e.id not in existentes]
+    if faltan:
+        normal = doc.styles.default(WD_STYLE_TYPE.PARAGRAPH)
+        base_id = normal.style_id if normal is not None else None
+        for estilo in faltan:
+            estilos.append(parse_xml(estilo.xml(base_id)))
+    return doc
@@ -0,0 +1,134 @@
+# FragmentoDocx.py
+# Construye muchos párrafos w:p directamente en lxml y los inserta de una sola vez tras un elemento.
+import copy
+
+from docx.oxml import OxmlElement
+from docx.oxml.ns import qn
+from lxml import etree
+
+import EstilosDocx
+
+_XML_SPACE = "{http://www.w3.org/XML/1998/namespace}space"
+
+
+def _parrafo_modelo(fuente, tam, bold, alineacion):
+    """w:p con pPr/rPr completos y un run vacío; se deep-copia por cada párrafo nuevo."""
+    p = OxmlElement("w:p")
+    pPr = etree.SubElement(p, qn("w:pPr"))
+    etree.SubElement(pPr, qn("w:jc")).set(qn("w:val"), alineacion)
+    r = etree.SubElement(p, qn("w:r"))
+    rPr = etree.SubElement(r, qn("w:rPr"))
+    rFonts = etree.SubElement(rPr, qn("w:rFonts"))
+    rFonts.set(qn("w:ascii"), fuente)
+    rFonts.set(qn("w:hAnsi"), fuente)
+    b = etree.SubElement(rPr, qn("w:b"))
+    if not bold:
+        b.set(qn("w:val"), "0")
+    etree.SubElement(rPr, qn("w:sz")).set(qn("w:val"), str(int(tam * 2)))
+    return p
+
+
+def _parrafo_con_estilo(style_id):
+    """w:p que solo referencia su estilo (EstilosDocx) y un run vacío sin rPr."""
+    p = OxmlElement("w:p")
+    pPr = etree.SubElement(p, qn("w:pPr"))
+    etree.SubElement(pPr, qn("w:pStyle")).set(qn("w:val"), style_id)
+    etree.SubElement(p, qn("w:r"))
+    return p
+
+
+def _agregar_texto(r, txt):
+    """Igual que Run.text de python-docx: '\\n' o '\\r' -> w:br y '\\t' -> w:tab."""
+    trozo = []
+
+    def volcar():
+        if trozo:
+            texto = "".join(trozo)
+            t = etree.SubElement(r, qn("w:t"))
+            t.text = texto
+            if texto != texto.strip():
+                t.set(_XML_SPACE, "preserve")
+            trozo.clear()
+
+    for ch in txt:
+        if ch in "\r\n":
+            volcar()
+            etree.SubElement(r, qn("w:br"))
+        elif ch == "\t":
+            volcar()
+            etree.SubElement(r, qn("w:tab"))
+        else:
+            trozo.append(ch)
+    volcar()
+
+
+class FragmentoDocx:
+    """
+    Lista de párrafos pendientes de insertar. Cada combinación de
+    (fuente, tamaño, negrita, alineación) se arma una sola vez y se reutiliza con deepcopy.
+    Con doc (y EstilosDocx.HABILITADOS) los estilos se registran en ese documento y cada
+    párrafo con un formato de EstilosDocx.ESTILOS solo referencia su estilo.
+    """
+
+    def __init__(self, fuente="Arial", doc=None):
+        self.fuente = fuente
+        self.elementos = []
+        self._modelos = {}
+        self.estilos = doc is not None and EstilosDocx.HABILITADOS
+        if self.estilos:
+            EstilosDocx.registrar(doc)
+
+    def agregar_parrafo(self, txt, bold=False, tam=11, alineacion="left"):
+        clave = (tam, bool(bold), alineacion)
+        modelo = self._modelos.get(clave)
+        if modelo is None:
+            style_id = EstilosDocx.estilo_para(tam, bold, alineacion, self.fuente) if self.estilos else None
+            modelo = self._modelos[clave] = (_parrafo_con_estilo(style_id) if style_id
+                                             else _parrafo_modelo(self.fuente, tam, bool(bold), alineacion))
+        p = copy.deepcopy(modelo)
+        if txt:
+            _agregar_texto(p[-1], txt)
+        self.elementos.append(p)
+        return p
+
+    def agregar_elemento(self, elemento):
+        """Agrega un elemento ya armado (p. ej. un w:tbl) en el orden actual del fragmento."""
+        self.elementos.append(elemento)
+        return elemento
+
+    def marcar(self, nombre, marcador_id, desde=0):
+        """
+        Rodea los párrafos agregados desde el índice 'desde' con un marcador (w:bookmarkStart
+        en el primero, w:bookmarkEnd al final del último) para ubicarlos después en el documento.
+        """
+        primero, ultimo = self.elementos[desde], self.elementos[-1]
+        inicio = OxmlElement("w:bookmarkStart")
+        inicio.set(qn("w:id"), str(marcador_id))
+        inicio.set(qn("w:name"), nombre)
+        pPr = primero.find(qn("w:pPr"))
+        if pPr is not None:
+            pPr.addnext(inicio)
+        else:
+            primero.insert(0, inicio)
+        fin = OxmlElement("w:bookmarkEnd")
+        fin.set(qn("w:id"), str(marcador_id))
+        ultimo.append(fin)
+
+    def insertar_despues(self, elemento):
+        """Inserta todos los párrafos tras 'elemento' en una sola operación y retorna el último."""
+        if not self.elementos:
+            return elemento
+        padre = elemento.getparent()
+        i = padre.index(elemento) + 1
+        padre[i:i] = self.elementos
+        return self.elementos[-1]
+
+    def insertar_al_final(self, body):
+        """Agrega los elementos al final del cuerpo, antes del w:sectPr final si existe."""
+        sectPr = body.find(qn("w:sectPr"))
+        for elemento in self.elementos:
+            if sectPr is not None:
+                sectPr.addprevious(elemento)
+            else:
+                body.append(elemento)
+        return self.elementos[-1] if self.elementos else None
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Generación por lotes sin el servidor web: lee un manifiesto y produce un .docx por fila.
+
+    python GeneradorLotes.py manifiesto.jsonl --salida resultados/ --procesos 4 --concurrencia 4
+
+Manifiesto JSONL (una fila por línea) o CSV con las mismas columnas:
+  {"id": "ana", "tipo": "informe", "plantilla": "base.docx", "tarea": "...", "puntos": ["...", "..."]}
+  {"id": "ana-sem1", "tipo": "cuadro", "plantilla": "base.docx", "dias": [{"dia": "Lunes", ...}]}
+  {"id": "ana-mes", "tipo": "cuadro", "plantilla": "base.docx", "semanas": [{"titulo": ..., "dias": [...]}]}
+En CSV, 'puntos' va separado por '|' y 'dias'/'semanas' como texto JSON.
+El id da nombre al archivo de salida (<id>.docx): solo letras, dígitos, '.', '_' y '-',
+y no puede repetirse en el manifiesto.
+Las rutas de plantilla relativas se resuelven desde la carpeta del manifiesto.
+
+Las llamadas a Mistral se hacen en este proceso con un tope global de concurrencia;
+el armado y guardado de cada .docx se reparte en un pool de procesos. Es reanudable:
+las filas ya terminadas (registradas en estado.jsonl y con su archivo presente) se saltan.
+Al final se escribe resumen.json con tiempos y errores por fila.
+"""
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+import ClienteMistral
+from ModeloCuadro import dia_desde_campos, generar_cuadro, generar_descripciones_semana
+from ModeloCuadroMensual import generar_cuadro_semanas, leer_semanas_json
+from ModeloInforme import generar_textos_informe, renderizar_informe
+
+
+# --- Manifiesto ---
+ID_FILA = re.compile(r"[A-Za-z0-9._-]+")
+
+
+def leer_manifiesto(ruta):
+    """Filas del manifiesto; ValueError si un id no es un nombre de archivo válido o se repite."""
+    ruta = Path(ruta)
+    texto = ruta.read_text(encoding="utf-8-sig")
+    if ruta.suffix.lower() == ".csv":
+        filas = []
+        for reg in csv.DictReader(texto.splitlines()):
+            reg = {k.strip(): (v or "").strip() for k, v in reg.items() if k}
+            if reg.get("puntos"):
+                reg["puntos"] = reg["puntos"].split("|")
+            for campo in ("dias", "semanas"):
+                if reg.get(campo):
+                    reg[campo] = json.loads(reg[campo])
+            filas.append(reg)
+    else:
+        filas = [json.loads(linea) for linea in texto.splitlines() if linea.strip()]
+
+    vistos = set()
+    for n, fila in enumerate(filas, start=1):
+        fila["id"] = str(fila["id"]).strip() if fila.get("id") not in (None, "") else f"fila{n:04d}"
+        if not ID_FILA.fullmatch(fila["id"]) or not fila["id"].strip("."):
+            raise ValueError(f"fila {n}: id inválido {fila['id']!r} (solo letras, dígitos, '.', '_' y '-')")
+        if fila["id"] in vistos:
+            raise ValueError(f"fila {n}: id repetido {fila['id']!r}")
+        vistos.add(fila["id"])
+        fila["tipo"] = (fila.get("tipo") or "informe").lower()
+        plantilla = Path(fila.get("plantilla", ""))
+        if not plantilla.is_absolute():
+            plantilla = ruta.parent / plantilla
+        fila["plantilla"] = str(plantilla)
+    return filas
+
+
+def _dias(registros):
+    return [
+        dia_desde_campos(
+            r.get("dia", ""), fecha=r.get("fecha", ""), laborable=r.get("laborable", "si"),
+            hora_inicio=r.get("hora_inicio", ""), hora_fin=r.get("hora_fin", ""),
+            tema=r.get("tema", ""), tareas=r.get("tareas", ""), horas=r.get("horas") or None,
+        )
+        for r in registros
+    ]
+
+
+# --- Etapas ---
+def etapa_llm(fila, forzar=False):
+    """Genera los textos de una fila en este proceso; retorna los datos listos para renderizar."""
+    if not Path(fila["plantilla"]).is_file():
+        raise FileNotFoundError(f"no existe la plantilla {fila['plantilla']}")
+    if fila["tipo"] == "informe":
+        puntos = [p.strip() for p in fila.get("puntos", []) if p and p.strip()]
+        if not puntos:
+            raise ValueError("la fila no tiene puntos")
+        intro, contenidos = generar_textos_informe(puntos, forzar=forzar)
+        return {"puntos": puntos, "tarea": fila.get("tarea") or "Tarea no especificada",
+                "intro": intro, "contenidos": contenidos}
+    if fila["tipo"] == "cuadro":
+        if fila.get("semanas"):
+            semanas = leer_semanas_json(json.dumps(fila["semanas"]))
+            todos = [d for s in semanas for d in s["dias"]]
+            generar_descripciones_semana(todos, forzar=forzar)
+            return {"semanas": semanas}
+        dias = _dias(fila.get("dias", []))
+        generar_descripciones_semana(dias, forzar=forzar)
+        return {"dias": dias}
+    raise ValueError(f"tipo desconocido: {fila['tipo']}")
+
+
+def etapa_docx(tipo, plantilla, salida, datos):
+    """Se ejecuta en el pool de procesos: arma y guarda el .docx (sin llamadas a Mistral)."""
+    inicio = time.perf_counter()
+    temporal = f"{salida}.parcial"
+    if tipo == "informe":
+        renderizar_informe(plantilla, temporal, datos["puntos"], datos["tarea"], datos["intro"], datos["contenidos"])
+    elif "semanas" in datos:
+        generar_cuadro_semanas(plantilla, temporal, datos["semanas"])
+    else:
+        generar_cuadro(plantilla, temporal, datos["dias"])
+    os.replace(temporal, salida)  # el archivo final solo aparece completo
+    return time.perf_counter() - inicio
+
+
+# --- Estado (reanudación) ---
+def leer_terminados(directorio):
+    ruta = directorio / "estado.jsonl"
+    terminados = set()
+    if ruta.exists():
+        for linea in ruta.read_text(encoding="utf-8").splitlines():
+            try:
+                reg = json.loads(linea)
+            except ValueError:
+                continue
+            if reg.get("estado") == "ok" and (directorio / reg.get("archivo", "")).exists():
+                terminados.add(reg["id"])
+    return terminados
+
+
+def registrar(directorio, reg):
+    with open(directorio / "estado.jsonl", "a", encoding="utf-8") as f:
+        f.write(json.dumps(reg, ensure_ascii=False) + "\n")
+
+
+# --- Ejecución ---
+def ejecutar_lote(manifiesto, directorio, procesos=None, filas_en_paralelo=2, concurrencia=None, forzar=False):
+    directorio = Path(directorio)
+    directorio.mkdir(parents=True, exist_ok=True)
+    if concurrencia:
+        ClienteMistral.limitar_concurrencia(concurrencia)
+
+    filas = leer_manifiesto(manifiesto)
+    terminados = leer_terminados(directorio)
+    pendientes = [f for f in filas if f["id"] not in terminados]
+    resultados = [{"id": f["id"], "tipo": f["tipo"], "estado": "saltada"} for f in filas if f["id"] in terminados]
+    inicio_total = time.perf_counter()
+
+    def llm(fila):
+        inicio = time.perf_counter()
+        return etapa_llm(fila, forzar=forzar), time.perf_counter() - inicio
+
+    with ThreadPoolExecutor(max_workers=max(1, filas_en_paralelo)) as hilos, \
+            ProcessPoolExecutor(max_workers=procesos, mp_context=multiprocessing.get_context("spawn")) as proc:
+        f_llm = {hilos.submit(llm, fila): fila for fila in pendientes}
+        f_docx = {}
+        for futuro in as_completed(f_llm):
+            fila = f_llm[futuro]
+            archivo = f"{fila['id']}.docx"
+            try:
+                datos, t_llm = futuro.result()
+            except Exception as e:
+                resultados.append({"id": fila["id"], "tipo": fila["tipo"], "estado": "error",
+                                   "etapa": "llm", "error": str(e)})
+                continue
+            envio = proc.submit(etapa_docx, fila["tipo"], fila["plantilla"], str(directorio / archivo), datos)
+            f_docx[envio] = (fila, archivo, t_llm)
+
+        for futuro in as_completed(f_docx):
+            fila, archivo, t_llm = f_docx[futuro]
+            reg = {"id": fila["id"], "tipo": fila["tipo"], "archivo": archivo, "segundos_llm": round(t_llm, 3)}
+            try:
+                reg["segundos_docx"] = round(futuro.result(), 3)
+                reg["estado"] = "ok"
+                registrar(directorio, reg)
+            except Exception as e:
+                reg.update(estado="error", etapa="docx", error=str(e))
+            resultados.append(reg)
+
+    resumen = {
+        "manifiesto": str(manifiesto),
+        "filas": len(filas),
+        "ok": sum(r["estado"] == "ok" for r in resultados),
+        "errores": sum(r["estado"] == "error" for r in resultados),
+        "saltadas": sum(r["estado"] == "saltada" for r in resultados),
+        "segundos_total": round(time.perf_counter() - inicio_total, 3),
+        "cache": ClienteMistral.estadisticas_cache(),
+        "filas_detalle": resultados,
+    }
+    (directorio / "resumen.json").write_text(json.dumps(resumen, ensure_ascii=False, indent=2), encoding="utf-8")
+    return resumen
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("manifiesto", help="archivo .jsonl o .csv")
+    parser.add_argument("--salida", default="resultados", help="carpeta de salida (default: resultados)")
+    parser.add_argument("--procesos", type=int, default=None, help="procesos para armar los .docx")
+    parser.add_argument("--filas", type=int, default=2, help="filas generando textos a la vez")
+    parser.add_argument("--concurrencia", type=int, default=int(os.environ.get("MISTRAL_CONCURRENCIA", "4")),
+                        help="tope global de llamadas simultáneas a Mistral")
+    parser.add_argument("--forzar", action="store_true", help="regenerar sin usar la caché de respuestas")
+    args = parser.parse_args(argv)
+
+    try:
+        resumen = ejecutar_lote(args.manifiesto, args.salida, procesos=args.procesos, filas_en_paralelo=args.filas,
+                                concurrencia=args.concurrencia, forzar=args.forzar)
+    except ValueError as e:
+        print(f"Manifiesto inválido: {e}", file=sys.stderr)
+        return 2
+    print(f"{resumen['ok']} ok, {resumen['errores']} con error, {resumen['saltadas']} saltadas "
+          f"en {resumen['segundos_total']} s (detalle en {Path(args.salida) / 'resumen.json'})")
+    for r in resumen["filas_detalle"]:
+        if r["estado"] == "error":
+            print(f"  {r['id']}: {r['etapa']}: {r['error']}", file=sys.stderr)
+    return 1 if resumen["errores"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
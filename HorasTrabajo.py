@@ -0,0 +1,224 @@
+# HorasTrabajo.py
+# Parseo de los textos de horas del cuadro ('08:00–12:00', '10:00 AM – 12:15 PM', '7H 30M', '8',
+# varios rangos por día) con expresiones precompiladas, y totales por semana, mes y semestre
+# calculados sobre columnas (array) para cuadros de miles de días.
+import re
+from array import array
+from functools import lru_cache
+
+_HORA = r"(\d{1,2}):(\d{2})(?::(\d{2}))?\s*(?:([AaPp])\.?\s*[Mm]\.?)?"
+RANGO = re.compile(rf"{_HORA}\s*[–—-]\s*{_HORA}")
+DURACION = re.compile(r"(?:(\d+)\s*H)?\s*(?:(\d+)\s*M)?", re.IGNORECASE)
+NUMERO = re.compile(r"\d+(?:\.\d+)?")  # horas como número ('8', '7.5'; en JSON también 8 o 7.5)
+SEPARADOR = re.compile(r"\s*[,;]\s*|\s+[yY]\s+")
+FECHA_ISO = re.compile(r"(\d{4})-(\d{1,2})-(\d{1,2})")
+FECHA_DMA = re.compile(r"(\d{1,2})/(\d{1,2})/(\d{4})")
+
+# Motivos de un día inválido
+SIN_HORAS = "sin_horas"
+FORMATO = "formato"
+
+
+def minutos_a_horas_minutos_str(minutos):
+    h = minutos // 60
+    m = minutos % 60
+    if m == 0:
+        return f"{h}H"
+    else:
+        return f"{h}H {m}M"
+
+
+def _segundos(hora, minuto, segundo, meridiano):
+    """Segundos desde medianoche, o None si la hora no es válida (24h, o 1-12 con AM/PM)."""
+    h, m, s = int(hora), int(minuto), int(segundo or 0)
+    if m > 59 or s > 59:
+        return None
+    if meridiano:
+        if not 1 <= h <= 12:
+            return None
+        h = h % 12 + (12 if meridiano in "Pp" else 0)
+    elif h > 23:
+        return None
+    return h * 3600 + m * 60 + s
+
+
+def _minutos_trozo(trozo):
+    rango = RANGO.fullmatch(trozo)
+    if rango:
+        inicio = _segundos(*rango.group(1, 2, 3, 4))
+        fin = _segundos(*rango.group(5, 6, 7, 8))
+        if inicio is None or fin is None:
+            return None
+        if fin < inicio:
+            fin += 24 * 3600  # cruza medianoche
+        return (fin - inicio) // 60
+    if NUMERO.fullmatch(trozo):
+        return round(float(trozo) * 60)
+    duracion = DURACION.fullmatch(trozo)
+    if duracion and trozo:
+        horas, minutos = duracion.groups()
+        return int(horas or 0) * 60 + int(minutos or 0)
+    return None
+
+
+def texto_horas(valor):
+    """Horas de un día como texto: los números (p. ej. "horas": 8 en JSON) pasan a '8'."""
+    return "" if valor is None else str(valor).strip()
+
+
+def minutos_texto(texto):
+    """
+    Minutos de un texto de horas: uno o más rangos ('08:00–12:00, 14:00–18:00'; también
+    separados por ';' o ' y '), duraciones ('7H 30M', '7H', '90M') o horas como número
+    ('8', '7.5', o 8 sin comillas en JSON). Un rango con el fin antes del inicio cruza
+    medianoche. Retorna 0 para texto vacío y None si no se entiende.
+    """
+    return _minutos_texto(texto_horas(texto))
+
+
+@lru_cache(maxsize=4096)
+def _minutos_texto(texto):
+    if not texto:
+        return 0
+    total = None
+    for trozo in SEPARADOR.split(texto):
+        if not trozo.strip():
+            continue  # separador al final ('08:00–12:00,')
+        minutos = _minutos_trozo(trozo.strip())
+        if minutos is None:
+            return None
+        total = (total or 0) + minutos
+    return total
+
+
+def minutos_de_dia(dia_info):
+    """Minutos trabajados de un día laborable (0 si no es laborable o sus horas no se entienden)."""
+    if not dia_info.get("laborable", False):
+        return 0
+    return minutos_texto(dia_info.get("horas", "")) or 0
+
+
+def mes_de_fecha(fecha):
+    """'AAAA-MM' de una fecha 'AAAA-MM-DD' o 'DD/MM/AAAA', o None."""
+    fecha = (fecha or "").strip()
+    iso = FECHA_ISO.match(fecha)
+    if iso:
+        anio, mes = int(iso.group(1)), int(iso.group(2))
+    else:
+        dma = FECHA_DMA.match(fecha)
+        if not dma:
+            return None
+        anio, mes = int(dma.group(3)), int(dma.group(2))
+    return f"{anio:04d}-{mes:02d}" if 1 <= mes <= 12 else None
+
+
+def semestre_de_mes(mes):
+    """'AAAA-S1' (enero a junio) o 'AAAA-S2'."""
+    return f"{mes[:4]}-S{1 if int(mes[5:]) <= 6 else 2}"
+
+
+class TablaHoras:
+    """
+    Todos los días de varias semanas en columnas paralelas: minutos, índice de semana e índice
+    de mes de cada día (array de enteros). Los totales por grupo salen de una pasada sobre
+    las columnas; los días laborables con horas vacías o ilegibles quedan en 'invalidos'.
+    """
+
+    SIN_FECHA = "sin_fecha"
+
+    def __init__(self):
+        self.minutos = array("q")
+        self.semana = array("l")
+        self.mes = array("l")
+        self.laborable = array("b")
+        self.semanas = []  # títulos, por índice
+        self.meses = []    # 'AAAA-MM' o SIN_FECHA, por índice
+        self._indice_mes = {}
+        self.invalidos = []
+
+    @classmethod
+    def desde_semanas(cls, semanas):
+        """semanas: [{'titulo', 'dias': [...]}] como las arma ModeloCuadroMensual.leer_semanas."""
+        tabla = cls()
+        for semana in semanas:
+            tabla.agregar_semana(semana.get("titulo") or f"Semana {len(tabla.semanas) + 1}", semana.get("dias", []))
+        return tabla
+
+    def _mes(self, fecha):
+        clave = mes_de_fecha(fecha) or self.SIN_FECHA
+        indice = self._indice_mes.get(clave)
+        if indice is None:
+            indice = self._indice_mes[clave] = len(self.meses)
+            self.meses.append(clave)
+        return indice
+
+    def agregar_semana(self, titulo, dias):
+        indice = len(self.semanas)
+        self.semanas.append(titulo)
+        for dia in dias:
+            laborable = bool(dia.get("laborable", False))
+            minutos = 0
+            if laborable:
+                texto = texto_horas(dia.get("horas"))
+                minutos = minutos_texto(texto)
+                if not texto or minutos is None:
+                    self.invalidos.append({"semana": titulo, "dia": dia.get("dia", ""), "fecha": dia.get("fecha", ""),
+                                           "horas": texto, "motivo": FORMATO if texto else SIN_HORAS})
+                    minutos = 0
+            self.minutos.append(minutos)
+            self.semana.append(indice)
+            self.mes.append(self._mes(dia.get("fecha", "")))
+            self.laborable.append(laborable)
+        return indice
+
+    def _sumar_por(self, grupo, n):
+        totales = array("q", [0]) * n
+        for g, minutos in zip(grupo, self.minutos):
+            totales[g] += minutos
+        return totales
+
+    def totales_semanas(self):
+        return self._sumar_por(self.semana, len(self.semanas))
+
+    def totales_meses(self):
+        return self._sumar_por(self.mes, len(self.meses))
+
+    def total(self):
+        return sum(self.minutos)
+
+    def resumen(self):
+        """Totales por semana, mes y semestre, más el total general y los días inválidos (dict serializable)."""
+        def horas(minutos):
+            return {"minutos": minutos, "horas": minutos_a_horas_minutos_str(minutos)}
+
+        dias = array("l", [0]) * len(self.semanas)
+        laborables = array("l", [0]) * len(self.semanas)
+        for g, laborable in zip(self.semana, self.laborable):
+            dias[g] += 1
+            laborables[g] += laborable
+
+        por_mes = self.totales_meses()
+        semestres = {}
+        for mes, minutos in zip(self.meses, por_mes):
+            clave = self.SIN_FECHA if mes == self.SIN_FECHA else semestre_de_mes(mes)
+            semestres[clave] = semestres.get(clave, 0) + minutos
+
+        return {
+            "total": horas(self.total()),
+            "dias": len(self.minutos),
+            "semanas": [{"titulo": titulo, "dias": dias[i], "laborables": laborables[i], **horas(minutos)}
+                        for i, (titulo, minutos) in enumerate(zip(self.semanas, self.totales_semanas()))],
+            "meses": sorted(({"mes": mes, **horas(minutos)} for mes, minutos in zip(self.meses, por_mes)),
+                            key=lambda m: m["mes"]),
+            "semestres": [{"semestre": clave, **horas(minutos)} for clave, minutos in sorted(semestres.items())],
+            "invalidos": self.invalidos,
+        }
+
+
+def resumir_semanas(semanas):
+    return TablaHoras.desde_semanas(semanas).resumen()
+
+
+def total_semanas(semanas):
+    """Minutos trabajados en todas las semanas (el TOTAL GENERAL del cuadro)."""
+    return TablaHoras.desde_semanas(semanas).total()
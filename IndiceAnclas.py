@@ -0,0 +1,120 @@
+# IndiceAnclas.py
+# Índice de anclas ([[...]]) en una sola pasada lxml sobre el cuerpo, encabezados y pies del documento.
+from docx.opc.constants import RELATIONSHIP_TYPE as RT
+from docx.oxml import OxmlElement
+from docx.oxml.ns import qn
+from docx.text.paragraph import Paragraph
+
+import Metricas
+
+W_P = qn("w:p")
+W_T = qn("w:t")
+W_TC = qn("w:tc")
+
+
+class PosicionAncla:
+    """
+    Párrafo (w:p) que contiene un ancla.
+      - parte: nombre de la parte del paquete ('/word/document.xml', '/word/header1.xml', ...)
+      - ruta: índices hijo a hijo desde la raíz de la parte, para ubicarlo en un clon del documento
+      - en_celda: True si el párrafo está dentro de una celda de tabla
+    """
+
+    def __init__(self, ancla, parte, elemento, ruta):
+        self.ancla = ancla
+        self.parte = parte
+        self.elemento = elemento
+        self.ruta = ruta
+        self.en_celda = elemento.getparent() is not None and elemento.getparent().tag == W_TC
+
+    def como_dict(self):
+        return {"parte": self.parte, "ruta": list(self.ruta), "en_celda": self.en_celda}
+
+
+def partes_documento(doc):
+    """(nombre, elemento raíz) del documento principal y de sus encabezados y pies de página."""
+    partes = [(str(doc.part.partname), doc.part.element)]
+    for rel in doc.part.rels.values():
+        if rel.is_external or rel.reltype not in (RT.HEADER, RT.FOOTER):
+            continue
+        partes.append((str(rel.target_part.partname), rel.target_part.element))
+    return partes
+
+
+def _ruta(elemento):
+    ruta = []
+    while elemento.getparent() is not None:
+        padre = elemento.getparent()
+        ruta.append(padre.index(elemento))
+        elemento = padre
+    return tuple(reversed(ruta))
+
+
+def _parrafo_de(t):
+    nodo = t.getparent()
+    while nodo is not None and nodo.tag != W_P:
+        nodo = nodo.getparent()
+    return nodo
+
+
+def indexar_anclas(doc, anclas):
+    """
+    Recorre una sola vez los w:t de cada parte y agrupa su texto por párrafo,
+    de modo que un ancla partida en varios runs también se encuentra.
+    Los párrafos de cuadros de texto y celdas se indexan por separado de su contenedor.
+    Retorna {ancla: [PosicionAncla, ...]} en orden de aparición (lista vacía si no está).
+    """
+    with Metricas.etapa("anclas"):
+        return _indexar(doc, anclas)
+
+
+def _indexar(doc, anclas):
+    indice = {ancla: [] for ancla in anclas}
+    for nombre, raiz in partes_documento(doc):
+        textos = {}
+        for t in raiz.iter(W_T):
+            p = _parrafo_de(t)
+            if p is not None:
+                textos.setdefault(p, []).append(t.text or "")
+        for p, trozos in textos.items():
+            texto = "".join(trozos)
+            if "[[" not in texto:
+                continue
+            for ancla in anclas:
+                if ancla in texto:
+                    indice[ancla].append(PosicionAncla(ancla, nombre, p, _ruta(p)))
+    return indice
+
+
+def primera_posicion(doc, ancla):
+    posiciones = indexar_anclas(doc, [ancla])[ancla]
+    return posiciones[0] if posiciones else None
+
+
+def resolver(doc, posicion):
+    """Elemento w:p de 'posicion' dentro de 'doc' (puede ser un clon del documento indexado)."""
+    for nombre, raiz in partes_documento(doc):
+        if nombre != posicion.parte:
+            continue
+        nodo = raiz
+        for i in posicion.ruta:
+            nodo = nodo[i]
+        return nodo
+    raise KeyError(f"La parte {posicion.parte} no existe en el documento")
+
+
+def como_parrafo(doc, elemento):
+    """Proxy Paragraph para insertar contenido a continuación del elemento."""
+    return Paragraph(elemento, doc._body)
+
+
+def insertar_despues(elemento, nuevo):
+    """
+    Inserta 'nuevo' (p. ej. un w:tbl) tras el párrafo ancla. Si el ancla es el
+    último párrafo de una celda se agrega un w:p vacío: una celda debe terminar en párrafo.
+    """
+    elemento.addnext(nuevo)
+    padre = nuevo.getparent()
+    if padre.tag == W_TC and nuevo.getnext() is None and nuevo.tag != W_P:
+        nuevo.addnext(OxmlElement("w:p"))
+    return nuevo
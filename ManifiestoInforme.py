@@ -0,0 +1,209 @@
+# ManifiestoInforme.py
+# Manifiesto (JSON) que acompaña a cada informe generado: entradas, textos de cada sección y el
+# marcador (bookmark oculto) que la delimita en el .docx, para regenerar o agregar puntos sin rehacer el resto.
+import copy
+import json
+import os
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from docx.oxml.ns import qn
+
+import IndiceAnclas
+
+W_BOOKMARK_START = qn("w:bookmarkStart")
+W_BOOKMARK_END = qn("w:bookmarkEnd")
+W_ID = qn("w:id")
+W_NAME = qn("w:name")
+
+
+class SeccionNoEncontrada(KeyError):
+    """El documento ya no tiene el marcador de la sección (se borró o no es este informe)."""
+
+
+class Manifiesto:
+    """
+    Entradas y textos de un informe.
+      - puntos: [{'titulo', 'partes': {descripcion, ejemplo, explicacion}, 'marcador'}] en orden del documento
+      - los marcadores empiezan con '_' (ocultos en Word) y llevan parte del id, para no chocar
+        si un informe generado se usa como base de otro
+    """
+
+    def __init__(self, tarea, ancla="[[INICIO_INFORME]]", informe_id=None, plantilla_id=None):
+        self.id = informe_id or uuid.uuid4().hex
+        self.tarea = tarea
+        self.ancla = ancla
+        self.plantilla_id = plantilla_id
+        self.intro = None
+        self.puntos = []
+        self.siguiente = 1
+        self.creado = time.time()
+        self.actualizado = self.creado
+        self._marcador_intro = None
+
+    @property
+    def marcador_intro(self):
+        return self._marcador_intro or f"_Inf{self.id[:8]}_intro"
+
+    def agregar_punto(self, titulo, partes):
+        punto = {"titulo": titulo, "partes": dict(partes), "marcador": f"_Inf{self.id[:8]}_p{self.siguiente}"}
+        self.siguiente += 1
+        self.puntos.append(punto)
+        return punto
+
+    def punto(self, numero):
+        """Punto 'numero' (desde 1). Lanza IndexError si no existe."""
+        if not 1 <= numero <= len(self.puntos):
+            raise IndexError(f"El informe tiene {len(self.puntos)} puntos; no existe el punto {numero}")
+        return self.puntos[numero - 1]
+
+    def copia(self):
+        """Mismo contenido y marcadores con otro id (cada descarga de un documento guardado lleva el suyo)."""
+        datos = copy.deepcopy(self.como_dict())
+        datos["id"] = uuid.uuid4().hex
+        datos["creado"] = time.time()
+        return Manifiesto.desde_dict(datos)
+
+    def como_dict(self):
+        return {
+            "id": self.id,
+            "tarea": self.tarea,
+            "ancla": self.ancla,
+            "plantilla_id": self.plantilla_id,
+            "intro": {"texto": self.intro, "marcador": self.marcador_intro},
+            "puntos": self.puntos,
+            "siguiente": self.siguiente,
+            "creado": self.creado,
+            "actualizado": self.actualizado,
+        }
+
+    @classmethod
+    def desde_dict(cls, datos):
+        manifiesto = cls(datos["tarea"], ancla=datos.get("ancla", "[[INICIO_INFORME]]"), informe_id=datos["id"],
+                         plantilla_id=datos.get("plantilla_id"))
+        manifiesto.intro = (datos.get("intro") or {}).get("texto")
+        manifiesto._marcador_intro = (datos.get("intro") or {}).get("marcador")
+        manifiesto.puntos = list(datos.get("puntos", []))
+        manifiesto.siguiente = datos.get("siguiente", len(manifiesto.puntos) + 1)
+        manifiesto.creado = datos.get("creado", manifiesto.creado)
+        manifiesto.actualizado = datos.get("actualizado", manifiesto.creado)
+        return manifiesto
+
+
+class AlmacenManifiestos:
+    """
+    Un archivo <id>.json por informe en 'directorio' (escritura atómica); los que no se
+    modifican en más de 'horas' se borran al guardar.
+    """
+
+    def __init__(self, directorio, horas=24 * 30):
+        self.directorio = Path(directorio)
+        self.directorio.mkdir(parents=True, exist_ok=True)
+        self.segundos = horas * 3600
+        self._lock = threading.Lock()
+
+    def _ruta(self, informe_id):
+        return self.directorio / f"{informe_id}.json"
+
+    def guardar(self, manifiesto):
+        manifiesto.actualizado = time.time()
+        texto = json.dumps(manifiesto.como_dict(), ensure_ascii=False, indent=1)
+        ruta = self._ruta(manifiesto.id)
+        with self._lock:
+            self._purgar()
+            temporal = ruta.with_suffix(f".{threading.get_ident()}.tmp")
+            temporal.write_text(texto, encoding="utf-8")
+            os.replace(temporal, ruta)
+        return manifiesto
+
+    def obtener(self, informe_id):
+        """Manifiesto del informe, o None si no existe o ya venció."""
+        if not informe_id or not informe_id.isalnum():
+            return None
+        ruta = self._ruta(informe_id)
+        with self._lock:
+            try:
+                if time.time() - ruta.stat().st_mtime > self.segundos:
+                    return None
+                datos = json.loads(ruta.read_text(encoding="utf-8"))
+            except FileNotFoundError:
+                return None
+        return Manifiesto.desde_dict(datos)
+
+    def _purgar(self):
+        limite = time.time() - self.segundos
+        for ruta in self.directorio.glob("*.json"):
+            try:
+                if ruta.stat().st_mtime < limite:
+                    ruta.unlink()
+            except FileNotFoundError:
+                pass
+
+
+# --- Marcadores en el documento ---
+def identificar(doc, informe_id):
+    """Guarda el id del informe en las propiedades del .docx (dc:identifier)."""
+    doc.core_properties.identifier = informe_id
+
+
+def identificador(doc):
+    return (doc.core_properties.identifier or "").strip() or None
+
+
+def siguiente_id_marcador(doc):
+    """Primer w:id libre para un marcador nuevo (deben ser únicos en todo el documento)."""
+    maximo = -1
+    for _, raiz in IndiceAnclas.partes_documento(doc):
+        for inicio in raiz.iter(W_BOOKMARK_START):
+            try:
+                maximo = max(maximo, int(inicio.get(W_ID)))
+            except (TypeError, ValueError):
+                pass
+    return maximo + 1
+
+
+def rango_seccion(doc, nombre):
+    """
+    (marcador_id, [elementos]) de la sección: los hermanos desde el párrafo con el
+    w:bookmarkStart 'nombre' hasta el que tiene su w:bookmarkEnd, ambos incluidos.
+    """
+    raiz = doc.element
+    inicio = next((m for m in raiz.iter(W_BOOKMARK_START) if m.get(W_NAME) == nombre), None)
+    if inicio is None:
+        raise SeccionNoEncontrada(f"El documento no tiene la sección '{nombre}'")
+    marcador_id = inicio.get(W_ID)
+    fin = next((m for m in raiz.iter(W_BOOKMARK_END) if m.get(W_ID) == marcador_id), None)
+    primero = inicio.getparent()
+    ultimo = fin.getparent() if fin is not None else None
+    if ultimo is None or ultimo.getparent() is not primero.getparent():
+        raise SeccionNoEncontrada(f"La sección '{nombre}' del documento está incompleta")
+    elementos = [primero]
+    while elementos[-1] is not ultimo:
+        siguiente = elementos[-1].getnext()
+        if siguiente is None:
+            raise SeccionNoEncontrada(f"La sección '{nombre}' del documento está incompleta")
+        elementos.append(siguiente)
+    return marcador_id, elementos
+
+
+def reemplazar_seccion(doc, nombre, fragmento):
+    """Cambia los párrafos de la sección por los del fragmento, conservando su marcador."""
+    marcador_id, elementos = rango_seccion(doc, nombre)
+    fragmento.marcar(nombre, marcador_id)
+    padre = elementos[0].getparent()
+    i = padre.index(elementos[0])
+    for elemento in elementos:
+        padre.remove(elemento)
+    padre[i:i] = fragmento.elementos
+
+
+def insertar_tras_seccion(doc, nombre, fragmento):
+    """Inserta el fragmento (ya marcado) a continuación de la sección 'nombre'."""
+    _, elementos = rango_seccion(doc, nombre)
+    return fragmento.insertar_despues(elementos[-1])
+
+
+almacen = AlmacenManifiestos(os.environ.get("INFORMES_DIR", str(Path(__file__).parent / ".informes")),
+                             horas=float(os.environ.get("INFORMES_HORAS", str(24 * 30))))
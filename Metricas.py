@@ -0,0 +1,312 @@
+# Metricas.py
+# Tiempos por etapa, contadores de llamadas a Mistral y exposición en formato Prometheus (/metrics).
+# Con METRICAS=0 todo queda en operaciones vacías.
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from bisect import bisect_left
+
+HABILITADAS = os.environ.get("METRICAS", "1") == "1"
+log = logging.getLogger("generador.solicitudes")
+
+
+def _configurar_log():
+    """
+    La línea JSON por solicitud va a stderr con su propio handler, para que se escriba también
+    bajo flask run o un servidor WSGI (sin basicConfig). METRICAS_LOG: nivel ('INFO' por defecto)
+    o '0' para no escribirla; con 'raiz' se deja al logging configurado por la aplicación.
+    """
+    nivel = os.environ.get("METRICAS_LOG", "INFO").strip().upper()
+    if nivel == "RAIZ" or log.handlers:
+        return
+    if nivel == "0":
+        log.disabled = True
+        return
+    if not isinstance(logging.getLevelName(nivel), int):
+        nivel = "INFO"
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s %(name)s %(message)s"))
+    log.addHandler(handler)
+    log.setLevel(nivel)
+    log.propagate = False
+
+
+_configurar_log()
+
+BUCKETS_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+BUCKETS_TOKENS_SEG = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+def _escapar(valor):
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _etiquetas(nombres, valores, extra=""):
+    pares = [f'{n}="{_escapar(v)}"' for n, v in zip(nombres, valores)]
+    if extra:
+        pares.append(extra)
+    return "{" + ",".join(pares) + "}" if pares else ""
+
+
+class Contador:
+    def __init__(self, nombre, ayuda, etiquetas=()):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = etiquetas
+        self._valores = {}
+        self._lock = threading.Lock()
+
+    def inc(self, n=1, **etiquetas):
+        clave = tuple(etiquetas.get(e, "") for e in self.etiquetas)
+        with self._lock:
+            self._valores[clave] = self._valores.get(clave, 0) + n
+
+    def exponer(self):
+        lineas = [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} counter"]
+        with self._lock:
+            for clave, valor in sorted(self._valores.items()):
+                lineas.append(f"{self.nombre}{_etiquetas(self.etiquetas, clave)} {valor}")
+        return lineas
+
+
+_INF = 'le="+Inf"'
+
+
+class Histograma:
+    def __init__(self, nombre, ayuda, etiquetas=(), buckets=BUCKETS_SEGUNDOS):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = etiquetas
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observar(self, valor, **etiquetas):
+        clave = tuple(etiquetas.get(e, "") for e in self.etiquetas)
+        i = bisect_left(self.buckets, valor)
+        with self._lock:
+            serie = self._series.get(clave)
+            if serie is None:
+                serie = self._series[clave] = [[0] * (len(self.buckets) + 1), 0.0]
+            serie[0][i] += 1
+            serie[1] += valor
+
+    def exponer(self):
+        lineas = [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} histogram"]
+        with self._lock:
+            for clave, (cuentas, suma) in sorted(self._series.items()):
+                acumulado = 0
+                for limite, n in zip(self.buckets, cuentas):
+                    acumulado += n
+                    le = f'le="{limite:g}"'
+                    lineas.append(f"{self.nombre}_bucket{_etiquetas(self.etiquetas, clave, le)} {acumulado}")
+                total = acumulado + cuentas[-1]
+                lineas.append(f"{self.nombre}_bucket{_etiquetas(self.etiquetas, clave, _INF)} {total}")
+                lineas.append(f"{self.nombre}_sum{_etiquetas(self.etiquetas, clave)} {suma:.6f}")
+                lineas.append(f"{self.nombre}_count{_etiquetas(self.etiquetas, clave)} {total}")
+        return lineas
+
+
+SOLICITUD = Histograma("generador_solicitud_segundos", "Duración de cada solicitud HTTP o trabajo", ("ruta",))
+ETAPA = Histograma("generador_etapa_segundos", "Duración de cada etapa de la generación", ("etapa",))
+LLAMADAS = Contador("mistral_llamadas_total", "Llamadas a Mistral por tipo de prompt y resultado",
+                    ("tipo", "resultado"))
+LLAMADA = Histograma("mistral_llamada_segundos", "Duración de las llamadas a Mistral (sin caché)", ("tipo",))
+TOKENS = Contador("mistral_tokens_total", "Tokens generados por Mistral", ("tipo",))
+TOKENS_SEG = Histograma("mistral_tokens_por_segundo", "Velocidad de generación de Mistral", ("tipo",),
+                        buckets=BUCKETS_TOKENS_SEG)
+REINTENTOS = Contador("generador_reintentos_total", "Reintentos por respuesta inválida o sin tiempo", ("funcion",))
+FALLBACKS = Contador("generador_fallbacks_total", "Textos de respaldo usados en lugar de la respuesta de Mistral",
+                     ("funcion",))
+COALESCIDAS = Contador("mistral_llamadas_coalescidas_total",
+                       "Llamadas que esperaron una llamada idéntica ya en curso en vez de repetirla", ("tipo",))
+DOCUMENTOS = Contador("generador_cache_documentos_total", "Consultas a la caché de documentos generados",
+                      ("resultado",))
+ESPERA_LLM = Histograma("mistral_espera_turno_segundos", "Espera en la cola del planificador antes de llamar a Mistral",
+                        ("prioridad",))
+RECHAZOS = Contador("generador_rechazos_total", "Solicitudes rechazadas (429) por cola de Mistral llena")
+METRICAS = [SOLICITUD, ETAPA, LLAMADAS, LLAMADA, TOKENS, TOKENS_SEG, REINTENTOS, FALLBACKS, COALESCIDAS, DOCUMENTOS,
+            ESPERA_LLM, RECHAZOS]
+
+
+# --- Medición por solicitud ---
+class Medicion:
+    """Acumula etapas y contadores de una solicitud (compartida con los hilos que lanza)."""
+
+    def __init__(self, ruta, solicitud_id=None):
+        self.id = solicitud_id or uuid.uuid4().hex[:12]
+        self.ruta = ruta
+        self.inicio = time.perf_counter()
+        self.etapas = {}
+        self.contadores = {}
+        self.token = None
+        self._lock = threading.Lock()
+
+    def sumar(self, destino, clave, valor):
+        with self._lock:
+            destino[clave] = destino.get(clave, 0) + valor
+
+    def como_dict(self, estado):
+        with self._lock:
+            return {
+                "solicitud_id": self.id,
+                "ruta": self.ruta,
+                "estado": estado,
+                "ms": round((time.perf_counter() - self.inicio) * 1000, 1),
+                "etapas_ms": {k: round(v * 1000, 1) for k, v in self.etapas.items()},
+                **self.contadores,
+            }
+
+
+_actual = contextvars.ContextVar("medicion", default=None)
+
+
+def iniciar(ruta, solicitud_id=None):
+    """Abre la medición de una solicitud en el contexto actual; retorna la Medicion (o None)."""
+    if not HABILITADAS:
+        return None
+    medicion = Medicion(ruta, solicitud_id)
+    medicion.token = _actual.set(medicion)
+    return medicion
+
+
+def terminar(medicion, estado):
+    """Cierra la medición: observa la duración y escribe una línea JSON en el log."""
+    if medicion is None:
+        return
+    datos = medicion.como_dict(estado)
+    SOLICITUD.observar(datos["ms"] / 1000, ruta=medicion.ruta)
+    try:
+        _actual.reset(medicion.token)
+    except ValueError:
+        _actual.set(None)  # se cerró desde otro contexto
+    log.info(json.dumps(datos, ensure_ascii=False))
+
+
+def en_contexto(funcion):
+    """
+    funcion envuelta para correr en otro hilo con el contexto de la solicitud actual
+    (su medición y el usuario del planificador de Mistral), copiado al envolverla.
+    """
+    contexto = contextvars.copy_context()
+
+    def envuelta(*args, **kwargs):
+        return contexto.copy().run(funcion, *args, **kwargs)
+    return envuelta
+
+
+def _contar(clave, n=1):
+    medicion = _actual.get()
+    if medicion is not None:
+        medicion.sumar(medicion.contadores, clave, n)
+
+
+# --- Etapas ---
+class _Etapa:
+    __slots__ = ("nombre", "inicio")
+
+    def __init__(self, nombre):
+        self.nombre = nombre
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        segundos = time.perf_counter() - self.inicio
+        ETAPA.observar(segundos, etapa=self.nombre)
+        medicion = _actual.get()
+        if medicion is not None:
+            medicion.sumar(medicion.etapas, self.nombre, segundos)
+        return False
+
+
+class _Nula:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULA = _Nula()
+
+
+def etapa(nombre):
+    """with etapa('guardado'): ...  mide el bloque (no hace nada con METRICAS=0)."""
+    return _Etapa(nombre) if HABILITADAS else _NULA
+
+
+# --- Eventos de Mistral y del generador ---
+def registrar_llamada(tipo, resultado, segundos=None, tokens=None, segundos_generando=None):
+    """resultado: 'ok', 'cache', 'tiempo_agotado', 'error' o 'abortada' (stream descartado por el llamador)."""
+    if not HABILITADAS:
+        return
+    LLAMADAS.inc(tipo=tipo, resultado=resultado)
+    _contar("llamadas_llm")
+    if resultado == "cache":
+        _contar("aciertos_cache")
+        return
+    if segundos is not None:
+        LLAMADA.observar(segundos, tipo=tipo)
+        medicion = _actual.get()
+        if medicion is not None:
+            # suma de todas las llamadas: en paralelo puede superar la duración de la solicitud
+            medicion.sumar(medicion.etapas, "llm", segundos)
+    if tokens:
+        TOKENS.inc(tokens, tipo=tipo)
+        _contar("tokens", tokens)
+        if segundos_generando:
+            TOKENS_SEG.observar(tokens / segundos_generando, tipo=tipo)
+
+
+def registrar_espera_llm(prioridad, segundos):
+    if HABILITADAS:
+        ESPERA_LLM.observar(segundos, prioridad=prioridad)
+        medicion = _actual.get()
+        if medicion is not None:
+            medicion.sumar(medicion.etapas, "espera_llm", segundos)
+
+
+def contar_rechazo():
+    if HABILITADAS:
+        RECHAZOS.inc()
+
+
+def registrar_coalescida(tipo):
+    if HABILITADAS:
+        COALESCIDAS.inc(tipo=tipo)
+        _contar("llamadas_coalescidas")
+
+
+def registrar_cache_documento(resultado):
+    """resultado: 'acierto' o 'fallo'."""
+    if HABILITADAS:
+        DOCUMENTOS.inc(resultado=resultado)
+        _contar(f"documento_{resultado}")
+
+
+def contar_reintento(funcion):
+    if HABILITADAS:
+        REINTENTOS.inc(funcion=funcion)
+        _contar("reintentos")
+
+
+def contar_fallback(funcion, n=1):
+    if HABILITADAS and n:
+        FALLBACKS.inc(n, funcion=funcion)
+        _contar("fallbacks", n)
+
+
+def exponer():
+    """Texto en formato de exposición de Prometheus (text/plain; version=0.0.4)."""
+    lineas = []
+    for metrica in METRICAS:
+        lineas.extend(metrica.exponer())
+    return "\n".join(lineas) + "\n"
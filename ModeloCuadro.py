@@ -1,119 +1,90 @@
 # ModeloCuadro.py
-from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+import json
+import os
 from docx import Document
-from docx.enum.text import WD_ALIGN_PARAGRAPH
-from docx.enum.table import WD_ALIGN_VERTICAL
-from docx.shared import Inches, Pt
-from docx.oxml import OxmlElement
-from docx.oxml.ns import qn
-import ollama  # Cliente local de Ollama
+from docx.document import Document as DocumentoDocx
+from docx.enum.style import WD_STYLE_TYPE
+from docx.shared import Emu, Inches
+from docx.oxml import parse_xml
+from docx.oxml.ns import nsdecls
+from xml.sax.saxutils import escape
+import ClienteMistral  # Cliente local de Ollama (con caché)
+import EstilosDocx
+from HorasTrabajo import minutos_a_horas_minutos_str, minutos_de_dia, minutos_texto, texto_horas
+import Metricas
+import IndiceAnclas
 
 EMU_PER_INCH = 914400
 TWIPS_PER_CM = 567
+MAX_CONCURRENCIA = int(os.environ.get("MISTRAL_CONCURRENCIA", "4"))
 
 
-# --- Funciones auxiliares ---
-def set_row_height(row, height_cm=None, rule="atLeast"):
-    tr = row._tr
-    trPr = tr.get_or_add_trPr()
-    trHeight = OxmlElement("w:trHeight")
-    if height_cm is not None:
-        trHeight.set(qn("w:val"), str(int(height_cm * TWIPS_PER_CM)))
-    trHeight.set(qn("w:hRule"), rule)
-    trPr.append(trHeight)
-
-
-def set_col_widths(tbl, widths_in):
-    # Intenta aplicar el ancho a cada celda por fila (compatible con python-docx)
-    for row in tbl.rows:
-        for j, w in enumerate(widths_in):
-            try:
-                row.cells[j].width = Inches(w)
-            except Exception:
-                # no detener ejecución si falla
-                pass
-
-
-def set_cell_margins(cell, top=100, start=100, bottom=100, end=100):
-    tc = cell._tc
-    tcPr = tc.get_or_add_tcPr()
-    cellMar = OxmlElement("w:tcMar")
-    for margin_name, value in [("top", top), ("start", start), ("bottom", bottom), ("end", end)]:
-        node = OxmlElement(f"w:{margin_name}")
-        node.set(qn("w:w"), str(value))
-        node.set(qn("w:type"), "dxa")
-        cellMar.append(node)
-    tcPr.append(cellMar)
+# --- Parseo de horas (ver HorasTrabajo) ---
+def parse_hora_rango_a_minutos(rango):
+    """
+    Minutos de uno o más rangos ('07:30 – 17:00', '10:00 AM – 12:15 PM', '08:00–12:00, 14:00–18:00').
+    Si el fin es anterior al inicio asume cruce de medianoche; 0 si no se entiende.
+    """
+    return minutos_texto(rango) or 0
 
 
-# --- Normalización y parseo de horas ---
-def _normalize_dash(text):
-    if not text:
-        return text
-    return text.replace("—", "–").replace("-", "–").replace("– ", "–").replace(" –", "–").strip()
+# --- Armado de días ---
+def es_si(valor):
+    if isinstance(valor, bool):
+        return valor
+    return str(valor or "").strip().lower() in ("si", "sí", "s", "true", "1", "x", "yes")
 
 
-def parse_hora_rango_a_minutos(rango):
+def dia_desde_campos(dia, fecha="", laborable="si", hora_inicio="", hora_fin="", tema="", tareas="", horas=None):
     """
-    Acepta rangos con guion '–' y admite formatos:
-      - '10:00 AM – 12:15 PM' (12h)
-      - '07:30 – 17:00'         (24h)
-      - también admite sin espacio '10:00AM–12:15PM'
-    Retorna minutos totales del intervalo (si end < start, asume cruce de medianoche).
+    Arma el dict de un día como lo espera generar_cuadro (tareas aún sin descripción).
+      - tareas: lista o texto con una tarea por línea
+      - horas: texto libre ('7H 30M', '08:00–12:00') o número de horas; si falta se usa hora_inicio–hora_fin
     """
-    try:
-        if not rango or "–" not in rango:
-            return 0
-        rango = _normalize_dash(rango)
-        start_raw, end_raw = rango.split("–", 1)
-        start = start_raw.strip()
-        end = end_raw.strip()
-
-        fmts = ("%I:%M %p", "%I:%M%p", "%H:%M", "%H:%M:%S")
-        h1 = h2 = None
-        for fmt in fmts:
-            try:
-                h1 = datetime.strptime(start, fmt)
-                break
-            except Exception:
-                continue
-        for fmt in fmts:
-            try:
-                h2 = datetime.strptime(end, fmt)
-                break
-            except Exception:
-                continue
-
-        # Si no se pudo parsear alguno, retorna 0
-        if h1 is None or h2 is None:
-            return 0
-
-        # Comparar tiempos solo por hora:minuto (usar fecha fija)
-        base = datetime(2000, 1, 1)
-        dt1 = base.replace(hour=h1.hour, minute=h1.minute, second=h1.second)
-        dt2 = base.replace(hour=h2.hour, minute=h2.minute, second=h2.second)
-
-        diff = (dt2 - dt1).total_seconds() // 60
-        if diff < 0:
-            # cruzó medianoche: sumar 24h
-            diff = (dt2 + timedelta(days=1) - dt1).total_seconds() // 60
-        return int(diff)
-    except Exception:
-        return 0
-
-
-def minutos_a_horas_minutos_str(minutos):
-    h = minutos // 60
-    m = minutos % 60
-    if m == 0:
-        return f"{h}H"
-    else:
-        return f"{h}H {m}M"
+    if isinstance(tareas, str):
+        tareas = tareas.splitlines()
+    tareas = [t.strip() for t in (tareas or []) if t and t.strip()]
+
+    # Día vacío → no laborable
+    if not fecha and not tema and not tareas:
+        return {
+            "dia": dia,
+            "fecha": "",
+            "laborable": False,
+            "razon_no_lab": "Día sin actividades",
+            "temas": [],
+            "horas": "",
+        }
+
+    if es_si(laborable):
+        if horas is None:
+            horas = f"{hora_inicio}–{hora_fin}" if hora_inicio and hora_fin else ""
+        else:
+            horas = texto_horas(horas)
+        # Las descripciones se generan después, en lote (generar_descripciones_semana)
+        temas = [{"tema": tema or "Sin tema", "tareas": [{"nombre": t} for t in tareas]}] if tareas else []
+        return {
+            "dia": dia,
+            "fecha": fecha or "",
+            "laborable": True,
+            "temas": temas,
+            "horas": horas,
+        }
+
+    return {
+        "dia": dia,
+        "fecha": fecha or "",
+        "laborable": False,
+        "razon_no_lab": "Día no laborable",
+        "temas": [],
+        "horas": "",
+    }
 
 
 # --- Generador de descripciones con Mistral (ollama) ---
-def generar_descripcion_tarea_mistral(tema, tarea):
+def generar_descripcion_tarea_mistral(tema, tarea, forzar=False):
     """
     Llama a Mistral vía ollama y garantiza:
       - respuesta en español
@@ -139,7 +110,7 @@ Instrucciones estrictas:
 Ejemplo: "Realicé ejercicios de álgebra lineal usando matrices"
 """
     try:
-        resp = ollama.chat(model="mistral", messages=[{"role": "user", "content": prompt}])
+        resp = ClienteMistral.chat(prompt, forzar=forzar, tipo="descripcion")
         text = resp.get("message", {}).get("content", "").strip()
         # limpiar saltos y puntos sobrantes
         text = text.replace("\n", " ").replace("..", " ").replace(".", "").strip()
@@ -154,6 +125,7 @@ Ejemplo: "Realicé ejercicios de álgebra lineal usando matrices"
         return text
     except Exception:
         # Fallback seguro y corto (no depende de la IA)
+        Metricas.contar_fallback("descripcion_tarea")
         t_short = tarea.strip()
         if len(t_short) > 60:
             t_short = t_short[:57].rsplit(" ", 1)[0] + "..."
@@ -161,201 +133,296 @@ Ejemplo: "Realicé ejercicios de álgebra lineal usando matrices"
         return fallback
 
 
-def generar_descripciones_mistral(tema, tareas):
+# --- Descripciones por lotes (una llamada estructurada por día) ---
+ESQUEMA_DESCRIPCIONES = {
+    "type": "object",
+    "properties": {
+        "descripciones": {"type": "array", "items": {"type": "string"}},
+    },
+    "required": ["descripciones"],
+}
+
+
+def prompt_descripciones_dia(tema, tareas):
+    lista = "\n".join(f"{i}. {t}" for i, t in enumerate(tareas, start=1))
+    return f"""
+Eres un estudiante redactando un informe semanal en español.
+
+Tema: {tema}
+Tareas:
+{lista}
+
+Instrucciones estrictas:
+- Responde SOLO en español y SOLO con JSON: {{"descripciones": ["...", "..."]}}
+- Devuelve exactamente {len(tareas)} oraciones, una por tarea y en el mismo orden
+- Cada oración en primera persona y en pasado
+- Cada oración DEBE comenzar con "Realicé"
+- Usa máximo 15 palabras por oración
+- NO uses saltos de línea, viñetas ni numeración dentro de las oraciones
+- NO uses signos de puntuación excepto comas
+
+Ejemplo: {{"descripciones": ["Realicé ejercicios de álgebra lineal usando matrices"]}}
+"""
+
+
+def _descripcion_valida(texto):
+    """Normaliza una oración del lote; retorna None si no cumple el formato."""
+    if not isinstance(texto, str):
+        return None
+    text = texto.replace("\n", " ").replace("..", " ").replace(".", "").strip()
+    if not text.lower().startswith("realicé"):
+        return None
+    palabras = text.split()
+    if len(palabras) > 20:
+        text = " ".join(palabras[:20])
+    return text
+
+
+def generar_descripciones_dia(tema, tareas, forzar=False):
     """
-    Genera lista de dicts {'nombre': tarea, 'descripcion': desc}
-    Si una tarea falla individualmente, se aplica fallback para esa tarea.
+    Pide todas las descripciones de un día en una sola llamada con salida JSON.
+    Las oraciones que falten o no pasen la validación se regeneran una a una
+    con generar_descripcion_tarea_mistral (que mantiene su propio fallback).
     """
+    propuestas = []
+    try:
+        resp = ClienteMistral.chat(
+            prompt_descripciones_dia(tema, tareas),
+            format=ESQUEMA_DESCRIPCIONES,
+            forzar=forzar,
+            tipo="descripciones_dia",
+            options={"num_predict": 48 * len(tareas) + 32},
+        )
+        data = json.loads(resp.get("message", {}).get("content", ""))
+        if isinstance(data, dict):
+            propuestas = data.get("descripciones") or []
+        elif isinstance(data, list):
+            propuestas = data
+    except Exception:
+        propuestas = []
+
     resultados = []
-    for t in tareas:
-        try:
-            desc = generar_descripcion_tarea_mistral(tema, t) if t else ""
-        except Exception:
-            desc = f"Realicé {t[:60]}" if t else "Realicé una tarea sin descripción"
+    for i, t in enumerate(tareas):
+        desc = _descripcion_valida(propuestas[i]) if i < len(propuestas) else None
+        if desc is None:
+            Metricas.contar_reintento("descripciones_dia")
+            try:
+                desc = generar_descripcion_tarea_mistral(tema, t, forzar=forzar) if t else ""
+            except Exception:
+                desc = f"Realicé {t[:60]}" if t else "Realicé una tarea sin descripción"
         resultados.append({"nombre": t, "descripcion": desc})
     return resultados
 
 
-# --- Construcción de la tabla en el documento ---
-def build_table_in_doc(doc, dias_semana, table_style="Table Grid", day_w=1.10, hours_w=1.10, data_row_height_cm=2.8):
+def generar_descripciones_semana(dias_semana, max_concurrencia=None, forzar=False, progreso=None):
+    """
+    Reúne todos los pares (tema, tareas) de la semana y los genera en paralelo,
+    un lote por tema. Rellena in situ la clave 'descripcion' de cada tarea
+    (dicts {'nombre': ...}) y elimina los temas que quedan sin tareas.
+    forzar=True regenera sin usar la caché de respuestas.
+    progreso(hechos, total) se invoca al completar cada lote.
+    """
+    lotes = []
+    for dia in dias_semana:
+        if not dia.get("laborable", False):
+            continue
+        for tema_info in dia.get("temas", []):
+            tareas = tema_info.get("tareas", [])
+            pendientes = [t for t in tareas if "descripcion" not in t]
+            if pendientes:
+                lotes.append((tema_info.get("tema", "Sin tema"), pendientes))
+
+    if lotes:
+        max_concurrencia = max(1, max_concurrencia or MAX_CONCURRENCIA)
+        with ThreadPoolExecutor(max_workers=max_concurrencia) as pool:
+            futuros = [
+                pool.submit(Metricas.en_contexto(generar_descripciones_dia), tema, [t["nombre"] for t in pendientes], forzar=forzar)
+                for tema, pendientes in lotes
+            ]
+            for hechos, ((tema, pendientes), futuro) in enumerate(zip(lotes, futuros), start=1):
+                try:
+                    generadas = futuro.result()
+                except Exception:
+                    generadas = [{"descripcion": "Realicé una tarea sin descripción"} for _ in pendientes]
+                for tarea, gen in zip(pendientes, generadas):
+                    tarea["descripcion"] = gen["descripcion"]
+                if progreso:
+                    progreso(hechos, len(lotes))
+
+    for dia in dias_semana:
+        dia["temas"] = [t for t in dia.get("temas", []) if t.get("tareas")]
+    return dias_semana
+
+
+# --- Construcción directa del w:tbl (una sola pasada, sin proxies de python-docx) ---
+def _xml_run(texto, bold, tam, con_formato=True):
+    """
+    w:r con el mismo rPr y contenido que deja python-docx (\n, \r -> w:br; \t -> w:tab).
+    con_formato=False omite el rPr (el formato viene del estilo del párrafo).
+    """
+    b = "<w:b/>" if bold else '<w:b w:val="0"/>'
+    partes = [f'<w:r><w:rPr>{b}<w:sz w:val="{int(tam * 2)}"/></w:rPr>' if con_formato else "<w:r>"]
+    trozo = []
+
+    def volcar():
+        if trozo:
+            t = "".join(trozo)
+            espacio = ' xml:space="preserve"' if t != t.strip() else ""
+            partes.append(f"<w:t{espacio}>{escape(t)}</w:t>")
+            trozo.clear()
+
+    for ch in texto:
+        if ch in "\r\n":
+            volcar()
+            partes.append("<w:br/>")
+        elif ch == "\t":
+            volcar()
+            partes.append("<w:tab/>")
+        else:
+            trozo.append(ch)
+    volcar()
+    partes.append("</w:r>")
+    return "".join(partes)
+
+
+def _xml_parrafo(texto, bold, tam, jc="center", run_vacio=False, estilos=False):
+    """
+    Párrafo alineado con un run formateado. Sin texto, igual que python-docx:
+    add_paragraph('') no crea run; Paragraph.text = '' sí (run_vacio=True).
+    Con estilos=True el párrafo referencia el estilo de EstilosDocx con ese formato.
+    """
+    style_id = EstilosDocx.estilo_para(tam, bold, jc) if estilos else None
+    run = _xml_run(texto, bold, tam, con_formato=not style_id) if texto or run_vacio else ""
+    if style_id:
+        return f'<w:p><w:pPr><w:pStyle w:val="{style_id}"/></w:pPr>{run}</w:p>'
+    return f'<w:p><w:pPr><w:jc w:val="{jc}"/></w:pPr>{run}</w:p>'
+
+
+def construir_tabla_xml(doc, dias_semana, table_style="Table Grid", day_w=1.10, hours_w=1.10, data_row_height_cm=2.8):
+    """
+    Arma el XML de la tabla completo (grilla, anchos, márgenes, altos y formato de runs)
+    y lo parsea una sola vez. Retorna el elemento w:tbl sin insertar en el documento.
+    Una celda de actividades sin contenido lleva un <w:p/> (Word no acepta celdas vacías).
+    Con EstilosDocx.HABILITADOS los párrafos referencian estilos registrados en doc
+    en lugar de llevar el formato en cada run.
+    """
+    estilos = EstilosDocx.HABILITADOS
+    if estilos:
+        EstilosDocx.registrar(doc)
+
+    def parrafo(texto, bold, tam, jc="center", run_vacio=False):
+        return _xml_parrafo(texto, bold, tam, jc=jc, run_vacio=run_vacio, estilos=estilos)
+
     sec = doc.sections[0]
     usable_in = (sec.page_width - sec.left_margin - sec.right_margin) / EMU_PER_INCH
     acts_w = usable_in - day_w - hours_w
-
-    filas = len(dias_semana) + 2  # header + total
-    tabla = doc.add_table(rows=filas, cols=3)
-    tabla.style = table_style
-    tabla.autofit = False
-    set_col_widths(tabla, [day_w, acts_w, hours_w])
-
-    # Márgenes internos
-    for row in tabla.rows:
-        for cell in row.cells:
-            set_cell_margins(cell, top=100, start=100, bottom=100, end=100)
+    ancho_grilla = Emu(doc._block_width // 3).twips
+    anchos = [Inches(w).twips for w in (day_w, acts_w, hours_w)]
+    alto_datos = int(data_row_height_cm * TWIPS_PER_CM)
+    alto_fijo = int(1.0 * TWIPS_PER_CM)
+
+    mar = (
+        "<w:tcMar>"
+        '<w:top w:w="100" w:type="dxa"/><w:start w:w="100" w:type="dxa"/>'
+        '<w:bottom w:w="100" w:type="dxa"/><w:end w:w="100" w:type="dxa"/>'
+        "</w:tcMar>"
+    )
+    centro = '<w:vAlign w:val="center"/>'
+
+    def tc(col, contenido, v_centro):
+        return (
+            f'<w:tc><w:tcPr><w:tcW w:type="dxa" w:w="{anchos[col]}"/>{mar}'
+            f'{centro if v_centro else ""}</w:tcPr>{contenido}</w:tc>'
+        )
+
+    def tr(alto, celdas):
+        return f'<w:tr><w:trPr><w:trHeight w:val="{alto}" w:hRule="atLeast"/></w:trPr>{celdas}</w:tr>'
+
+    style_id = doc.styles.get_style_id(table_style, WD_STYLE_TYPE.TABLE) if table_style else None
+    estilo = f'<w:tblStyle w:val="{escape(style_id)}"/>' if style_id else ""
+    filas = [
+        f"<w:tbl {nsdecls('w')}><w:tblPr>{estilo}"
+        '<w:tblW w:type="auto" w:w="0"/><w:tblLayout w:type="fixed"/>'
+        '<w:tblLook w:firstColumn="1" w:firstRow="1" w:lastColumn="0" w:lastRow="0" w:noHBand="0" '
+        'w:noVBand="1" w:val="04A0"/></w:tblPr>'
+        "<w:tblGrid>" + f'<w:gridCol w:w="{ancho_grilla}"/>' * 3 + "</w:tblGrid>"
+    ]
 
     # Header
-    hdr = tabla.rows[0].cells
-    hdr[0].text = "DÍA"
-    hdr[1].text = "ACTIVIDADES/TRABAJOS EFECTUADOS"
-    hdr[2].text = "HORAS"
-    for c in hdr:
-        p = c.paragraphs[0]
-        p.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        if p.runs:
-            p.runs[0].bold = True
-            p.runs[0].font.size = Pt(9)
-        c.vertical_alignment = WD_ALIGN_VERTICAL.CENTER
-    set_row_height(tabla.rows[0], height_cm=1.0, rule="atLeast")
+    filas.append(tr(alto_fijo, "".join(
+        tc(col, parrafo(texto, True, 9), True)
+        for col, texto in enumerate(("DÍA", "ACTIVIDADES/TRABAJOS EFECTUADOS", "HORAS"))
+    )))
 
     total_minutos = 0
-    for i, dia_info in enumerate(dias_semana, start=1):
-        c_dia, c_act, c_horas = tabla.rows[i].cells
-
-        # Día y fecha
-        p_dia = c_dia.paragraphs[0]
-        fecha_text = dia_info.get("fecha", "")
-        p_dia.text = f"{dia_info.get('dia', '')} {fecha_text}".strip()
-        p_dia.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        for run in p_dia.runs:
-            run.font.size = Pt(9)
-            run.bold = False
-        c_dia.vertical_alignment = WD_ALIGN_VERTICAL.CENTER
-
-        # Limpiar contenido previo en actividades (manteniendo estructura)
-        try:
-            for para in list(c_act.paragraphs):
-                p_element = para._element
-                p_element.getparent().remove(p_element)
-            # Asegurar limpieza completa como en código antiguo
-            try:
-                c_act._element.clear_content()
-            except Exception:
-                # si no existe clear_content, ignorar (ya removimos párrafos)
-                pass
-        except Exception:
-            pass
+    for dia_info in dias_semana:
+        texto_dia = f"{dia_info.get('dia', '')} {dia_info.get('fecha', '')}".strip()
 
         if not dia_info.get("laborable", False):
-            p = c_act.add_paragraph(dia_info.get("razon_no_lab", "Día no laborable"))
-            p.alignment = WD_ALIGN_PARAGRAPH.LEFT
-            for run in p.runs:
-                run.font.size = Pt(7)
-                run.bold = False
+            actividades = [parrafo(dia_info.get("razon_no_lab", "Día no laborable"), False, 7, jc="left")]
         else:
+            actividades = []
             for tema_info in dia_info.get("temas", []):
-                tema_text = tema_info.get("tema", "Sin tema")
-                p_tema = c_act.add_paragraph(tema_text)
-                p_tema.alignment = WD_ALIGN_PARAGRAPH.CENTER
-                for run in p_tema.runs:
-                    run.font.size = Pt(9)
-                    run.bold = True
-
+                actividades.append(parrafo(tema_info.get("tema", "Sin tema"), True, 9))
                 for tarea in tema_info.get("tareas", []):
-                    nombre = tarea.get("nombre", "")
-                    descripcion = tarea.get("descripcion", "")
-
-                    p_nom = c_act.add_paragraph(nombre)
-                    p_nom.alignment = WD_ALIGN_PARAGRAPH.CENTER
-                    for run in p_nom.runs:
-                        run.font.size = Pt(7)
-                        run.bold = True
-
-                    p_desc = c_act.add_paragraph(descripcion)
-                    p_desc.alignment = WD_ALIGN_PARAGRAPH.CENTER
-                    for run in p_desc.runs:
-                        run.font.size = Pt(7)
-                        run.bold = False
-
+                    actividades.append(parrafo(tarea.get("nombre", ""), True, 7))
+                    actividades.append(parrafo(tarea.get("descripcion", ""), False, 7))
                     # salto de línea extra para separar tareas
-                    c_act.add_paragraph("")
-
-        # Horas (mostrar tal cual el texto ingresado)
-        horas_text = dia_info.get("horas", "")
-        p_horas = c_horas.paragraphs[0]
-        p_horas.text = horas_text
-        p_horas.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        for run in p_horas.runs:
-            run.font.size = Pt(9)
-            run.bold = False
-        c_horas.vertical_alignment = WD_ALIGN_VERTICAL.CENTER
-
-        # Acumular minutos
-        if dia_info.get("laborable", False) and horas_text:
-            h_text = _normalize_dash(horas_text)
-            if "–" in h_text:
-                total_minutos += parse_hora_rango_a_minutos(h_text)
-            else:
-                # formato '7H 30M' o '7H' o '90M'
-                try:
-                    h = 0
-                    m = 0
-                    for part in h_text.upper().split():
-                        part = part.strip()
-                        if part.endswith("H"):
-                            h = int(part.replace("H", "").strip())
-                        elif part.endswith("M"):
-                            m = int(part.replace("M", "").strip())
-                        elif ":" in part:
-                            # posiblemente sola hora '07:30' -> ignoramos (no tiene rango)
-                            pass
-                    total_minutos += h * 60 + m
-                except Exception:
-                    pass
+                    actividades.append("<w:p/>")
+        if not actividades:
+            actividades.append("<w:p/>")
 
-        set_row_height(tabla.rows[i], height_cm=data_row_height_cm, rule="atLeast")
+        total_minutos += minutos_de_dia(dia_info)
+        filas.append(tr(alto_datos, (
+            tc(0, parrafo(texto_dia, False, 9, run_vacio=True), True)
+            + tc(1, "".join(actividades), False)
+            + tc(2, parrafo(dia_info.get("horas", ""), False, 9, run_vacio=True), True)
+        )))
 
     # Fila total
-    fila_total = tabla.rows[-1].cells
-    fila_total[0].text = ""
-    fila_total[1].text = "TOTAL"
-    p_total_label = fila_total[1].paragraphs[0]
-    p_total_label.alignment = WD_ALIGN_PARAGRAPH.LEFT
-    for run in p_total_label.runs:
-        run.font.size = Pt(9)
-        run.bold = True
-
-    total_str = minutos_a_horas_minutos_str(total_minutos)
-    p_total = fila_total[2].paragraphs[0]
-    p_total.text = total_str
-    p_total.alignment = WD_ALIGN_PARAGRAPH.CENTER
-    for run in p_total.runs:
-        run.font.size = Pt(9)
-        run.bold = True
-    fila_total[2].vertical_alignment = WD_ALIGN_VERTICAL.CENTER
-    set_row_height(tabla.rows[-1], height_cm=1.0, rule="atLeast")
-
-    return tabla
-
-
-# --- Buscar e insertar en ancla ---
-def find_paragraph_index_with_anchor(doc, anchor):
-    for idx, para in enumerate(doc.paragraphs):
-        if anchor in para.text:
-            return idx
-    return None
-
-
-def insert_table_after_paragraph(doc, paragraph_index, dias_semana, **table_kwargs):
-    tabla = build_table_in_doc(doc, dias_semana, **table_kwargs)
-    if paragraph_index is None:
-        return tabla
-    tbl_elm = tabla._tbl
-    target_para = doc.paragraphs[paragraph_index]
-    target_para._p.addnext(tbl_elm)
-    return tabla
+    filas.append(tr(alto_fijo, (
+        tc(0, "<w:p><w:r/></w:p>", False)
+        + tc(1, parrafo("TOTAL", True, 9, jc="left"), False)
+        + tc(2, parrafo(minutos_a_horas_minutos_str(total_minutos), True, 9), True)
+    )))
+    filas.append("</w:tbl>")
+    return parse_xml("".join(filas))
 
 
 # --- Función principal para Flask ---
-def generar_cuadro(archivo_base, archivo_salida, dias_semana, ancla="[[AQUI_TABLA]]"):
+def elemento_ancla_cuadro(doc, ancla="[[AQUI_TABLA]]", posicion_ancla=None):
+    """Elemento tras el que va la tabla (el del ancla o su posición precalculada), o None si no está."""
+    if posicion_ancla is None:
+        posicion_ancla = IndiceAnclas.primera_posicion(doc, ancla)
+    return IndiceAnclas.resolver(doc, posicion_ancla) if posicion_ancla is not None else None
+
+
+def insertar_cuadro(doc, dias_semana, elemento_ancla=None):
+    """Inserta la tabla de la semana tras elemento_ancla (o al final del cuerpo), sin guardar."""
+    with Metricas.etapa("armado"):
+        tbl = construir_tabla_xml(doc, dias_semana, day_w=1.10, hours_w=1.10, data_row_height_cm=2.8)
+        if elemento_ancla is not None:
+            IndiceAnclas.insertar_despues(elemento_ancla, tbl)
+        else:
+            doc.element.body._insert_tbl(tbl)
+    return tbl
+
+
+def generar_cuadro(archivo_base, archivo_salida, dias_semana, ancla="[[AQUI_TABLA]]", posicion_ancla=None):
     """
-    - archivo_base: ruta a .docx base
-    - archivo_salida: ruta de salida (puede ser un path temporal)
+    - archivo_base: ruta a .docx base o Document ya cargado (registro de plantillas)
+    - archivo_salida: ruta de salida o buffer (BytesIO / SpooledTemporaryFile)
     - dias_semana: lista con diccionarios como en tu ejemplo
     - ancla: texto donde insertar la tabla
-    Devuelve Path(archivo_salida)
+    - posicion_ancla: PosicionAncla precalculada (IndiceAnclas) del párrafo ancla
+    Devuelve Path(archivo_salida), o el mismo buffer si se pasó uno
     """
-    doc = Document(archivo_base)
-    idx = find_paragraph_index_with_anchor(doc, ancla)
-    insert_table_after_paragraph(doc, idx, dias_semana, day_w=1.10, hours_w=1.10, data_row_height_cm=2.8)
-    doc.save(archivo_salida)
-    return Path(archivo_salida)
+    if isinstance(archivo_base, DocumentoDocx):
+        doc = archivo_base
+    else:
+        with Metricas.etapa("parseo_docx"):
+            doc = Document(archivo_base)
+    insertar_cuadro(doc, dias_semana, elemento_ancla_cuadro(doc, ancla, posicion_ancla))
+    with Metricas.etapa("guardado"):
+        doc.save(archivo_salida)
+    return archivo_salida if hasattr(archivo_salida, "write") else Path(archivo_salida)
@@ -0,0 +1,149 @@
+# ModeloCuadroMensual.py
+# Cuadros de varias semanas (mes, semestre) en una sola solicitud: un documento con
+# una tabla por semana y total general, o un .zip con un documento por semana.
+import copy
+import csv
+import io
+import json
+import zipfile
+
+from docx import Document
+from docx.document import Document as DocumentoDocx
+
+import IndiceAnclas
+import Metricas
+from FragmentoDocx import FragmentoDocx
+from HorasTrabajo import total_semanas
+from ModeloCuadro import (
+    construir_tabla_xml,
+    dia_desde_campos,
+    generar_descripciones_semana,
+    minutos_a_horas_minutos_str,
+)
+
+COLUMNAS_CSV = ("semana", "dia", "fecha", "laborable", "hora_inicio", "hora_fin", "horas", "tema", "tareas")
+
+
+# --- Lectura de semanas ---
+def _dia_desde_registro(reg):
+    tareas = reg.get("tareas", "")
+    if isinstance(tareas, str) and "|" in tareas:
+        tareas = tareas.split("|")
+    return dia_desde_campos(
+        reg.get("dia", ""),
+        fecha=reg.get("fecha", ""),
+        laborable=reg.get("laborable", "si"),
+        hora_inicio=reg.get("hora_inicio", ""),
+        hora_fin=reg.get("hora_fin", ""),
+        tema=reg.get("tema", ""),
+        tareas=tareas,
+        horas=reg.get("horas") or None,
+    )
+
+
+def leer_semanas_json(texto):
+    """
+    Acepta {"semanas": [...]} o directamente la lista de semanas. Cada semana es
+    {"titulo": "...", "dias": [{"dia", "fecha", "laborable", "hora_inicio", "hora_fin",
+    "horas", "tema", "tareas"}, ...]} o solo la lista de días.
+    """
+    data = json.loads(texto)
+    if isinstance(data, dict):
+        data = data.get("semanas", [])
+    semanas = []
+    for n, semana in enumerate(data, start=1):
+        if isinstance(semana, list):
+            semana = {"dias": semana}
+        semanas.append({
+            "titulo": semana.get("titulo") or f"Semana {n}",
+            "dias": [_dia_desde_registro(reg) for reg in semana.get("dias", [])],
+        })
+    return semanas
+
+
+def leer_semanas_csv(texto):
+    """
+    Una fila por día con columnas COLUMNAS_CSV (solo 'semana' y 'dia' son obligatorias);
+    las tareas van separadas por '|'. Las semanas se agrupan por la columna 'semana'
+    en el orden en que aparecen.
+    """
+    semanas = {}
+    for reg in csv.DictReader(io.StringIO(texto)):
+        reg = {k.strip().lower(): (v or "").strip() for k, v in reg.items() if k}
+        clave = reg.get("semana") or "1"
+        semanas.setdefault(clave, []).append(_dia_desde_registro(reg))
+    return [
+        {"titulo": clave if not clave.isdigit() else f"Semana {clave}", "dias": dias}
+        for clave, dias in semanas.items()
+    ]
+
+
+def leer_semanas(nombre_archivo, datos):
+    """Decide el formato por la extensión (.csv o .json) del archivo subido."""
+    texto = datos.decode("utf-8-sig") if isinstance(datos, bytes) else datos
+    if str(nombre_archivo).lower().endswith(".csv"):
+        return leer_semanas_csv(texto)
+    return leer_semanas_json(texto)
+
+
+# --- Generación ---
+def generar_descripciones_semanas(semanas, max_concurrencia=None, forzar=False, progreso=None):
+    """Descripciones de todas las semanas en un solo lote paralelo (no semana por semana)."""
+    todos = [dia for semana in semanas for dia in semana["dias"]]
+    generar_descripciones_semana(todos, max_concurrencia=max_concurrencia, forzar=forzar, progreso=progreso)
+    return semanas
+
+
+def _cargar(archivo_base):
+    return archivo_base if isinstance(archivo_base, DocumentoDocx) else Document(archivo_base)
+
+
+def generar_cuadro_semanas(archivo_base, archivo_salida, semanas, ancla="[[AQUI_TABLA]]", posicion_ancla=None):
+    """
+    Un solo documento: por cada semana su título y su tabla (con total semanal),
+    y al final el total general (ver HorasTrabajo.total_semanas). Las descripciones
+    deben estar ya generadas. Devuelve archivo_salida.
+    """
+    doc = _cargar(archivo_base)
+    if posicion_ancla is None:
+        posicion_ancla = IndiceAnclas.primera_posicion(doc, ancla)
+
+    frag = FragmentoDocx(doc=doc)
+    total_minutos = total_semanas(semanas)
+    for semana in semanas:
+        frag.agregar_parrafo(semana["titulo"], bold=True, tam=11)
+        frag.agregar_elemento(construir_tabla_xml(doc, semana["dias"], day_w=1.10, hours_w=1.10, data_row_height_cm=2.8))
+        frag.agregar_parrafo("", tam=11)
+    frag.agregar_parrafo(f"TOTAL GENERAL: {minutos_a_horas_minutos_str(total_minutos)}", bold=True, tam=11)
+
+    if posicion_ancla is not None:
+        frag.insertar_despues(IndiceAnclas.resolver(doc, posicion_ancla))
+    else:
+        frag.insertar_al_final(doc.element.body)
+    with Metricas.etapa("guardado"):
+        doc.save(archivo_salida)
+    return archivo_salida
+
+
+def generar_cuadros_zip(archivo_base, archivo_salida, semanas, ancla="[[AQUI_TABLA]]", posicion_ancla=None):
+    """
+    Un .zip con un documento por semana. La plantilla se parsea una vez y se clona por semana.
+    Devuelve archivo_salida.
+    """
+    base = _cargar(archivo_base)
+    if posicion_ancla is None:
+        posicion_ancla = IndiceAnclas.primera_posicion(base, ancla)
+
+    with zipfile.ZipFile(archivo_salida, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for n, semana in enumerate(semanas, start=1):
+            doc = copy.deepcopy(base)
+            tbl = construir_tabla_xml(doc, semana["dias"], day_w=1.10, hours_w=1.10, data_row_height_cm=2.8)
+            if posicion_ancla is not None:
+                IndiceAnclas.insertar_despues(IndiceAnclas.resolver(doc, posicion_ancla), tbl)
+            else:
+                doc.element.body._insert_tbl(tbl)
+            buffer = io.BytesIO()
+            doc.save(buffer)
+            nombre = "".join(c if c.isalnum() or c in " -_" else "_" for c in semana["titulo"]).strip()
+            zf.writestr(f"{n:02d}_{nombre or 'semana'}.docx", buffer.getvalue())
+    return archivo_salida
@@ -0,0 +1,73 @@
+# ModeloEntrega.py
+# Entrega semanal: informe y cuadro en la misma plantilla ([[INICIO_INFORME]] y [[AQUI_TABLA]]).
+# La plantilla se carga una vez, los textos del informe y las descripciones del cuadro se piden
+# a Mistral a la vez, y el documento se arma y se guarda una sola vez.
+from concurrent.futures import ThreadPoolExecutor
+
+from docx import Document
+from docx.document import Document as DocumentoDocx
+
+import Metricas
+from ModeloCuadro import elemento_ancla_cuadro, generar_descripciones_semana, insertar_cuadro
+from ModeloInforme import generar_textos_informe, insertar_informe, parrafo_ancla_informe
+
+ANCLA_INFORME = "[[INICIO_INFORME]]"
+ANCLA_CUADRO = "[[AQUI_TABLA]]"
+
+
+def generar_textos_entrega(puntos, dias_semana, max_concurrencia=None, forzar=False, progreso=None):
+    """
+    Textos del informe y descripciones del cuadro en paralelo (cada parte con su propio lote
+    de llamadas; el planificador de Mistral reparte los turnos entre ambas).
+    progreso(hechos, total) suma las llamadas de las dos partes.
+    Retorna (intro, contenidos); las descripciones quedan en dias_semana.
+    """
+    totales = {}
+
+    def avisar(parte):
+        if progreso is None:
+            return None
+
+        def _avisar(hechos, total):
+            totales[parte] = (hechos, total)
+            progreso(sum(h for h, _ in totales.values()), sum(t for _, t in totales.values()))
+        return _avisar
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        f_informe = pool.submit(Metricas.en_contexto(generar_textos_informe), puntos,
+                                max_concurrencia=max_concurrencia, forzar=forzar, progreso=avisar("informe"))
+        f_cuadro = pool.submit(Metricas.en_contexto(generar_descripciones_semana), dias_semana,
+                               max_concurrencia=max_concurrencia, forzar=forzar, progreso=avisar("cuadro"))
+        f_cuadro.result()
+        return f_informe.result()
+
+
+def generar_entrega(doc_base, salida, puntos, tarea, dias_semana, ancla_informe=ANCLA_INFORME,
+                    ancla_cuadro=ANCLA_CUADRO, posicion_informe=None, posicion_cuadro=None, max_concurrencia=None,
+                    forzar=False, progreso=None, manifiesto=None):
+    """
+    Un solo documento con el informe tras ancla_informe y la tabla de la semana tras ancla_cuadro.
+      - doc_base: ruta o Document ya cargado (p. ej. clonado del registro de plantillas)
+      - posicion_informe / posicion_cuadro: PosicionAncla precalculadas (IndiceAnclas)
+      - manifiesto: recibe los textos y marcadores del informe (ver ManifiestoInforme)
+    Sin ancla de informe va tras el último párrafo; sin ancla de cuadro, al final del cuerpo.
+    Retorna salida.
+    """
+    doc = doc_base
+    if not isinstance(doc, DocumentoDocx):
+        with Metricas.etapa("parseo_docx"):
+            doc = Document(str(doc))
+
+    intro, contenidos = generar_textos_entrega(puntos, dias_semana, max_concurrencia=max_concurrencia, forzar=forzar,
+                                               progreso=progreso)
+
+    # Las dos anclas se ubican antes de insertar nada: las posiciones precalculadas son rutas
+    # de índices que dejarían de valer después de la primera inserción.
+    par_informe = parrafo_ancla_informe(doc, ancla_informe, posicion_informe)
+    elemento_cuadro = elemento_ancla_cuadro(doc, ancla_cuadro, posicion_cuadro)
+    insertar_cuadro(doc, dias_semana, elemento_cuadro)
+    insertar_informe(doc, par_informe, puntos, tarea, intro, contenidos, manifiesto=manifiesto)
+
+    with Metricas.etapa("guardado"):
+        doc.save(salida if hasattr(salida, "write") else str(salida))
+    return salida
@@ -1,37 +1,22 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 from pathlib import Path
-import re, ollama
+from concurrent.futures import ThreadPoolExecutor
+import json, os, re, threading
+import ClienteMistral
+import IndiceAnclas
+import ManifiestoInforme
+import Metricas
+from FragmentoDocx import FragmentoDocx
 from docx import Document
-from docx.shared import Pt
-from docx.enum.text import WD_PARAGRAPH_ALIGNMENT
-from docx.oxml.ns import qn
+from docx.document import Document as DocumentoDocx
 
-# ---------------- FUNCIONES DE FORMATO ---------------- #
-
-def aplicar_fuente_run(run, fuente="Arial", tam=11, bold=False):
-    run.font.size = Pt(tam)
-    run.bold = bool(bold)
-    try:
-        run.font.name = fuente
-        rPr = run._element.get_or_add_rPr()
-        rFonts = rPr.get_or_add_rFonts()
-        rFonts.set(qn('w:ascii'), fuente)
-        rFonts.set(qn('w:hAnsi'), fuente)
-    except:
-        pass
-
-def insertar_parrafo_despues(par_ref, txt, bold=False, tam=11):
-    doc = par_ref._parent
-    nuevo = doc.add_paragraph()
-    par_ref._p.addnext(nuevo._p)
-    run = nuevo.add_run(txt)
-    aplicar_fuente_run(run, tam=tam, bold=bold)
-    nuevo.alignment = WD_PARAGRAPH_ALIGNMENT.LEFT
-    return nuevo
+# ---------------- ANCLA ---------------- #
 
 def encontrar_parrafo_con_ancla(doc, anchor):
-    return next((p for p in doc.paragraphs if anchor in p.text), None)
+    # cuerpo, tablas, cuadros de texto y encabezados; admite anclas partidas en varios runs
+    posicion = IndiceAnclas.primera_posicion(doc, anchor)
+    return IndiceAnclas.como_parrafo(doc, posicion.elemento) if posicion else None
 
 # ---------------- LIMPIEZA ---------------- #
 
@@ -101,30 +86,68 @@ def prompt_para_punto(titulo):
 
 # ---------------- GENERADORES ---------------- #
 
-def generar_intro(reintentos=2):
-    for _ in range(reintentos+1):
-        r = ollama.chat(model="mistral", messages=[{"role":"user","content":prompt_intro()}])
+def generar_intro(reintentos=2, forzar=False):
+    for intento in range(reintentos+1):
+        if intento:
+            Metricas.contar_reintento("intro")
+        # los reintentos no leen de la caché: la respuesta guardada ya no sirvió
+        try:
+            r = ClienteMistral.chat(prompt_intro(), forzar=forzar or intento > 0, tipo="intro")
+        except ClienteMistral.TiempoAgotado:
+            continue
         txt = extraer_contenido_ollama(r)
         if txt:
             t = re.sub(r'^(INTRODUCCION:?)\s*', '', txt, flags=re.I).strip()
             t = " ".join(t.split())
             return sanitize_no_periods(t)
+    Metricas.contar_fallback("intro")
     return "Introducción no disponible"
 
-def generar_contenido(titulo, reintentos=2):
-    for _ in range(reintentos+1):
-        r = ollama.chat(model="mistral", messages=[{"role":"user","content":prompt_para_punto(titulo)}])
-        txt = extraer_contenido_ollama(r)
+FALLBACK_PUNTO = {
+    "descripcion": "Descripción no disponible",
+    "ejemplo": "# Ejemplo no disponible",
+    "explicacion": "Explicación no disponible"
+}
+
+def generar_contenido(titulo, reintentos=2, forzar=False, stream=None, al_avanzar=None, estructurado=None):
+    """
+    stream=True lee la respuesta por fragmentos, corta la generación en cuanto
+    rompe el formato y avisa cada avance de sección con al_avanzar(evento).
+    Sin stream (o con estructurado) al_avanzar recibe los mismos eventos al terminar el punto.
+    estructurado=True pide JSON y repara solo el campo que falle (ver generar_contenido_json).
+    """
+    estructurado = ESTRUCTURADO if estructurado is None else estructurado
+    stream = STREAM if stream is None else stream
+    if al_avanzar and (estructurado or not stream):
+        partes = generar_contenido(titulo, reintentos=reintentos, forzar=forzar, stream=False, estructurado=estructurado)
+        _avisar_partes(al_avanzar, partes)
+        return partes
+    if estructurado:
+        return generar_contenido_json(titulo, reintentos=reintentos, forzar=forzar)
+    for intento in range(reintentos+1):
+        if intento:
+            Metricas.contar_reintento("punto")
+        if stream:
+            txt = _generar_texto_stream(titulo, forzar or intento > 0, al_avanzar)
+            if txt is None:
+                _contar("etiquetas", regeneraciones=1)
+                continue
+        else:
+            try:
+                r = ClienteMistral.chat(prompt_para_punto(titulo), forzar=forzar or intento > 0, tipo="punto")
+            except ClienteMistral.TiempoAgotado:
+                continue
+            txt = extraer_contenido_ollama(r)
         partes = parsear_partes(txt)
         partes["descripcion"] = sanitize_no_periods(partes["descripcion"])
         partes["explicacion"] = sanitize_no_periods(partes["explicacion"])
         if partes["descripcion"] and partes["ejemplo"] and partes["explicacion"]:
+            _contar("etiquetas", puntos=1, llamadas=intento + 1)
             return partes
-    return {
-        "descripcion": "Descripción no disponible",
-        "ejemplo": "# Ejemplo no disponible",
-        "explicacion": "Explicación no disponible"
-    }
+        _contar("etiquetas", regeneraciones=1, tokens_desperdiciados=estimar_tokens(txt))
+    _contar("etiquetas", puntos=1, llamadas=reintentos + 1, fallbacks=1)
+    Metricas.contar_fallback("punto")
+    return dict(FALLBACK_PUNTO)
 
 def parsear_partes(txt):
     partes = {"descripcion": "", "ejemplo": "", "explicacion": ""}
@@ -145,32 +168,432 @@ def parsear_partes(txt):
     partes["explicacion"] = " ".join(extract("Explicación:", None).split())
     return partes
 
+# ---------------- SALIDA ESTRUCTURADA (JSON) ---------------- #
+
+ESTRUCTURADO = os.environ.get("MISTRAL_JSON", "0") == "1"
+CAMPOS_PUNTO = ("descripcion", "ejemplo", "explicacion")
+ESQUEMA_PUNTO = {
+    "type": "object",
+    "properties": {campo: {"type": "string"} for campo in CAMPOS_PUNTO},
+    "required": list(CAMPOS_PUNTO),
+}
+INSTRUCCIONES_CAMPO = {
+    "descripcion": "texto corrido de 5 a 7 líneas, sin puntos '.', usa comas y punto y coma",
+    "ejemplo": "solo código Python, sin bloque ``` y sin explicación",
+    "explicacion": "texto corrido de 3 a 5 líneas sobre el ejemplo, sin puntos '.', usa comas y punto y coma",
+}
+
+def prompt_punto_json(titulo):
+    campos = "\n".join(f"- {campo}: {INSTRUCCIONES_CAMPO[campo]}" for campo in CAMPOS_PUNTO)
+    return (
+        "RESPONDE SOLO EN ESPAÑOL Y SOLO CON JSON:\n"
+        '{"descripcion": "...", "ejemplo": "...", "explicacion": "..."}\n\n'
+        f"{campos}\n\n"
+        f"Tema: {titulo}"
+    )
+
+def prompt_reparar_campo(titulo, campo, partes):
+    """Pide de nuevo solo 'campo', dando como contexto los campos que ya son válidos."""
+    contexto = "\n".join(f"{c}: {partes[c]}" for c in CAMPOS_PUNTO if c != campo and partes.get(c))
+    return (
+        "RESPONDE SOLO EN ESPAÑOL Y SOLO CON JSON: " + json.dumps({campo: "..."}) + "\n\n"
+        f"{campo}: {INSTRUCCIONES_CAMPO[campo]}\n\n"
+        f"Tema: {titulo}\n"
+        + (f"\nYa escrito:\n{contexto}\n" if contexto else "")
+    )
+
+def _leer_json(txt):
+    try:
+        data = json.loads(txt)
+    except (TypeError, ValueError):
+        return None
+    return data if isinstance(data, dict) else None
+
+def validar_campo(campo, valor):
+    """Normaliza un campo del JSON; retorna '' si no sirve."""
+    if not isinstance(valor, str):
+        return ""
+    if campo == "ejemplo":
+        m = re.search(r"```(?:python)?\n?(.*?)```", valor, flags=re.DOTALL | re.IGNORECASE)
+        return (m.group(1) if m else valor).strip()
+    texto = " ".join(valor.split())
+    return sanitize_no_periods(texto) if "." in texto else texto
+
+def estimar_tokens(texto):
+    """Aproximación (unos 4 caracteres por token), suficiente para comparar caminos."""
+    return len(texto or "") // 4
+
+def generar_contenido_json(titulo, reintentos=2, forzar=False):
+    """
+    Pide el punto como JSON {descripcion, ejemplo, explicacion} (salida estructurada de ollama).
+    Si el JSON no se puede leer (o no trae ningún campo válido) se regenera completo;
+    si falla un campo se pide únicamente ese campo con prompt_reparar_campo, hasta 'reintentos' veces.
+    Lo que siga sin servir toma el texto de FALLBACK_PUNTO campo por campo.
+    """
+    partes = None
+    llamadas = 0
+    for intento in range(reintentos + 1):
+        if intento:
+            Metricas.contar_reintento("punto_json")
+        try:
+            r = ClienteMistral.chat(prompt_punto_json(titulo), format=ESQUEMA_PUNTO,
+                                    forzar=forzar or intento > 0, tipo="punto")
+        except ClienteMistral.TiempoAgotado:
+            continue
+        llamadas += 1
+        txt = extraer_contenido_ollama(r)
+        data = _leer_json(txt) or {}
+        propuestas = {campo: validar_campo(campo, data.get(campo)) for campo in CAMPOS_PUNTO}
+        if any(propuestas.values()):  # sin ningún campo útil conviene regenerar completo
+            partes = propuestas
+            tokens_respuesta = estimar_tokens(txt)
+            break
+        _contar("json", regeneraciones=1, tokens_desperdiciados=estimar_tokens(txt))
+    if partes is None:
+        _contar("json", puntos=1, llamadas=llamadas, fallbacks=1)
+        Metricas.contar_fallback("punto_json", len(CAMPOS_PUNTO))
+        return dict(FALLBACK_PUNTO)
+
+    for ronda in range(reintentos):
+        fallidos = [campo for campo in CAMPOS_PUNTO if not partes[campo]]
+        if not fallidos:
+            break
+        tokens_reparacion = 0
+        for campo in fallidos:
+            Metricas.contar_reintento("punto_json_campo")
+            try:
+                r = ClienteMistral.chat(prompt_reparar_campo(titulo, campo, partes),
+                                        format={**ESQUEMA_PUNTO, "properties": {campo: {"type": "string"}},
+                                                "required": [campo]},
+                                        forzar=forzar or ronda > 0, tipo="punto")
+            except ClienteMistral.TiempoAgotado:
+                continue
+            llamadas += 1
+            txt = extraer_contenido_ollama(r)
+            tokens_reparacion += estimar_tokens(txt)
+            partes[campo] = validar_campo(campo, (_leer_json(txt) or {}).get(campo))
+        # por etiquetas esta ronda habría sido una regeneración completa del punto
+        _contar("json", reparaciones=len(fallidos), reintentos_evitados=1,
+                tokens_ahorrados=tokens_respuesta - tokens_reparacion)
+
+    fallbacks = [campo for campo in CAMPOS_PUNTO if not partes[campo]]
+    for campo in fallbacks:
+        partes[campo] = FALLBACK_PUNTO[campo]
+    _contar("json", puntos=1, llamadas=llamadas, fallbacks=len(fallbacks))
+    Metricas.contar_fallback("punto_json", len(fallbacks))
+    return partes
+
+# Contadores de ambos caminos, para comparar cuánto retrabajo ahorra el JSON
+_estadisticas = {"etiquetas": {}, "json": {}}
+_estadisticas_lock = threading.Lock()
+
+def _contar(camino, **incrementos):
+    with _estadisticas_lock:
+        contadores = _estadisticas[camino]
+        for clave, n in incrementos.items():
+            contadores[clave] = contadores.get(clave, 0) + n
+
+def estadisticas_secciones():
+    with _estadisticas_lock:
+        return {camino: dict(contadores) for camino, contadores in _estadisticas.items()}
+
+# ---------------- STREAMING ---------------- #
+
+STREAM = os.environ.get("MISTRAL_STREAM", "0") == "1"
+MAX_TEXTO_SIN_ETIQUETA = 300
+
+class ParserSecciones:
+    """
+    Parser incremental del formato Descripción / Ejemplo / Explicación.
+    alimentar(fragmento) devuelve eventos nuevos:
+      {'tipo': 'delta', 'seccion': ..., 'texto': ...}  texto nuevo (líneas completas)
+      {'tipo': 'completa', 'seccion': ...}              la sección ya no cambiará
+    Marca 'error' si el formato se rompe y 'completo' cuando termina la Explicación.
+    """
+    ETIQUETAS = (("descripcion", "Descripción:"), ("ejemplo", "Ejemplo:"), ("explicacion", "Explicación:"))
+
+    def __init__(self):
+        self.texto = ""
+        self.error = None
+        self.completo = False
+        self._emitido = {}
+        self._completas = set()
+
+    def _posiciones(self, s):
+        return {nombre: s.find(etiqueta) for nombre, etiqueta in self.ETIQUETAS}
+
+    def _validar(self, s, pos):
+        fence = s.find("```")
+        if pos["descripcion"] == -1:
+            if pos["ejemplo"] != -1 or pos["explicacion"] != -1:
+                return "falta 'Descripción:'"
+            if len(s) > MAX_TEXTO_SIN_ETIQUETA:
+                return "texto sin la etiqueta 'Descripción:'"
+        if fence != -1 and (pos["ejemplo"] == -1 or fence < pos["ejemplo"]):
+            return "código antes de 'Ejemplo:'"
+        if pos["explicacion"] != -1:
+            if pos["ejemplo"] == -1 or pos["explicacion"] < pos["ejemplo"]:
+                return "'Explicación:' antes de 'Ejemplo:'"
+            if s[pos["ejemplo"]:pos["explicacion"]].count("```") < 2:
+                return "falta el bloque de código del ejemplo"
+        return None
+
+    def alimentar(self, fragmento):
+        if self.error or self.completo:
+            return []
+        self.texto += (fragmento or "").replace("\r\n", "\n")
+        s = self.texto
+        pos = self._posiciones(s)
+        self.error = self._validar(s, pos)
+        if self.error:
+            return []
+
+        # Explicación terminada: hay texto y luego un párrafo en blanco
+        if pos["explicacion"] != -1:
+            inicio = pos["explicacion"] + len("Explicación:")
+            cuerpo = s[inicio:]
+            contenido = len(cuerpo) - len(cuerpo.lstrip())
+            corte = cuerpo.find("\n\n", contenido)
+            if cuerpo.strip() and corte != -1:
+                self.texto = s = s[:inicio + corte]
+                self.completo = True
+
+        estable = s if self.completo else s[:s.rfind("\n") + 1]
+        eventos = []
+        orden = [n for n, _ in self.ETIQUETAS]
+        for i, (nombre, etiqueta) in enumerate(self.ETIQUETAS):
+            ini = pos[nombre]
+            if ini == -1 or ini >= len(estable):
+                continue
+            ini += len(etiqueta)
+            siguientes = [pos[n] for n in orden[i + 1:] if pos[n] != -1 and pos[n] < len(estable)]
+            fin = min(siguientes) if siguientes else len(estable)
+            trozo = estable[ini:fin]
+            emitido = self._emitido.get(nombre, 0)
+            if len(trozo) > emitido:
+                eventos.append({"tipo": "delta", "seccion": nombre, "texto": trozo[emitido:]})
+                self._emitido[nombre] = len(trozo)
+            if (siguientes or self.completo) and nombre not in self._completas:
+                self._completas.add(nombre)
+                eventos.append({"tipo": "completa", "seccion": nombre})
+        return eventos
+
+
+def _avisar_partes(al_avanzar, partes):
+    """Eventos de ParserSecciones para un punto generado sin stream: cada sección completa de una vez."""
+    for nombre, _ in ParserSecciones.ETIQUETAS:
+        al_avanzar({"tipo": "delta", "seccion": nombre, "texto": partes[nombre]})
+        al_avanzar({"tipo": "completa", "seccion": nombre})
+
+def _generar_texto_stream(titulo, forzar=False, al_avanzar=None):
+    """Devuelve el texto ya validado por el parser, o None si hubo que abortar."""
+    parser = ParserSecciones()
+    flujo = ClienteMistral.chat_stream(prompt_para_punto(titulo), forzar=forzar, tipo="punto")
+    texto_valido = None
+    try:
+        try:
+            for fragmento in flujo:
+                for evento in parser.alimentar(fragmento):
+                    if al_avanzar:
+                        al_avanzar(evento)
+                if parser.error or parser.completo:
+                    break
+        except ClienteMistral.TiempoAgotado:
+            parser.error = "tiempo agotado"
+        if not parser.error:
+            texto_valido = clean_text(parser.texto)
+    finally:
+        flujo.cerrar(texto_valido)
+    if parser.error and al_avanzar:
+        al_avanzar({"tipo": "abortado", "motivo": parser.error})
+    return texto_valido
+
+# ---------------- GENERACION CONCURRENTE ---------------- #
+
+MAX_CONCURRENCIA = int(os.environ.get("MISTRAL_CONCURRENCIA", "4"))
+
+def generar_textos_informe(puntos, max_concurrencia=None, forzar=False, progreso=None, stream=None,
+                           al_avanzar=None, estructurado=None, con_intro=True):
+    """
+    Lanza la introducción y todos los puntos a Mistral a la vez.
+    Cada llamada conserva sus propios reintentos y fallback.
+    forzar=True regenera sin usar la caché de respuestas.
+    progreso(hechos, total) se invoca cada vez que termina una llamada.
+    al_avanzar(indice_punto, evento) recibe los eventos de sección (en modo stream a medida
+    que llegan; si no, al terminar cada punto).
+    estructurado=True pide cada punto como JSON (tiene prioridad sobre stream).
+    con_intro=False genera solo los puntos (la intro retornada es None).
+    Retorna (intro, [partes_punto_1, partes_punto_2, ...]) en el orden de 'puntos'.
+    """
+    max_concurrencia = max(1, max_concurrencia or MAX_CONCURRENCIA)
+    total = len(puntos) + (1 if con_intro else 0)
+    hechos = [0]
+    lock = threading.Lock()
+
+    def _avisar(_futuro):
+        with lock:
+            hechos[0] += 1
+            n = hechos[0]
+        if progreso:
+            progreso(n, total)
+
+    with ThreadPoolExecutor(max_workers=max_concurrencia) as pool:
+        f_intro = pool.submit(Metricas.en_contexto(generar_intro), forzar=forzar) if con_intro else None
+        f_puntos = [
+            pool.submit(Metricas.en_contexto(generar_contenido), titulo, forzar=forzar, stream=stream, estructurado=estructurado,
+                        al_avanzar=(lambda ev, i=i: al_avanzar(i, ev)) if al_avanzar else None)
+            for i, titulo in enumerate(puntos)
+        ]
+        for f in ([f_intro] if con_intro else []) + f_puntos:
+            f.add_done_callback(_avisar)
+        intro = f_intro.result() if con_intro else None
+        partes = [f.result() for f in f_puntos]
+    return intro, partes
+
 # ---------------- GENERADOR DE INFORME ---------------- #
 
-def generar_informe(doc_base, salida, puntos, tarea, ancla="[[INICIO_INFORME]]"):
-    doc = Document(str(doc_base))
-    par_ancla = encontrar_parrafo_con_ancla(doc, ancla) or doc.paragraphs[-1]
+def agregar_intro(frag, intro):
+    frag.agregar_parrafo("INTRODUCCION", bold=True, tam=18)
+    frag.agregar_parrafo(intro, bold=False, tam=11)
+
+def agregar_punto(frag, titulo, partes):
+    frag.agregar_parrafo(titulo, bold=True, tam=18)
+    frag.agregar_parrafo(partes["descripcion"], bold=False, tam=11)
+    frag.agregar_parrafo("Ejemplo:", bold=True, tam=11)
+    frag.agregar_parrafo(partes["ejemplo"], bold=False, tam=11)
+    frag.agregar_parrafo("Explicación:", bold=True, tam=11)
+    frag.agregar_parrafo(partes["explicacion"], bold=False, tam=11)
+    frag.agregar_parrafo("", bold=False, tam=11)
+
+def construir_fragmento_informe(tarea, intro, puntos, contenidos, marcadores=None, doc=None):
+    """
+    Todos los párrafos del informe, listos para insertarse de una vez tras el ancla.
+    marcadores: [(nombre, id)] para la intro y cada punto; cada sección queda dentro de su marcador.
+    doc: documento destino; con él los párrafos usan los estilos de EstilosDocx (ver FragmentoDocx).
+    """
+    frag = FragmentoDocx(doc=doc)
+    marcadores = iter(marcadores or ())
+    frag.agregar_parrafo("Tarea más significativa:", bold=True, tam=11)
+    frag.agregar_parrafo(tarea, bold=True, tam=11)
+    frag.agregar_parrafo("Descripción del proceso:", bold=True, tam=11)
+
+    secciones = [(agregar_intro, (intro,))] + [(agregar_punto, args) for args in zip(puntos, contenidos)]
+    for agregar, args in secciones:
+        desde = len(frag.elementos)
+        agregar(frag, *args)
+        marcador = next(marcadores, None)
+        if marcador:
+            frag.marcar(*marcador, desde=desde)
+    return frag
 
-    t1 = insertar_parrafo_despues(par_ancla, "Tarea más significativa:", bold=True, tam=11)
-    t2 = insertar_parrafo_despues(t1, tarea, bold=True, tam=11)
-    d1 = insertar_parrafo_despues(t2, "Descripción del proceso:", bold=True, tam=11)
-    intro_title = insertar_parrafo_despues(d1, "INTRODUCCION", bold=True, tam=18)
+def generar_informe(doc_base, salida, puntos, tarea, ancla="[[INICIO_INFORME]]", max_concurrencia=None, forzar=False,
+                    progreso=None, stream=None, al_avanzar=None, posicion_ancla=None, manifiesto=None):
+    """
+    doc_base puede ser una ruta o un Document ya cargado (p. ej. clonado del registro de plantillas);
+    posicion_ancla es la PosicionAncla precalculada (IndiceAnclas) del párrafo ancla.
+    manifiesto (ManifiestoInforme.Manifiesto) recibe los textos y marcadores de cada sección.
+    """
+    if not isinstance(doc_base, DocumentoDocx):
+        with Metricas.etapa("parseo_docx"):
+            doc_base = Document(str(doc_base))
+
+    intro, contenidos = generar_textos_informe(
+        puntos, max_concurrencia=max_concurrencia, forzar=forzar, progreso=progreso,
+        stream=stream, al_avanzar=al_avanzar
+    )
+
+    return renderizar_informe(doc_base, salida, puntos, tarea, intro, contenidos, ancla=ancla, posicion_ancla=posicion_ancla,
+                              manifiesto=manifiesto)
+
+def renderizar_informe(doc_base, salida, puntos, tarea, intro, contenidos, ancla="[[INICIO_INFORME]]",
+                       posicion_ancla=None, manifiesto=None):
+    """
+    Arma y guarda el .docx con textos ya generados (no llama a Mistral).
+    Con manifiesto, registra en él cada sección y la deja marcada en el documento.
+    """
+    doc = doc_base if isinstance(doc_base, DocumentoDocx) else Document(str(doc_base))
+    insertar_informe(doc, parrafo_ancla_informe(doc, ancla, posicion_ancla), puntos, tarea, intro, contenidos,
+                     manifiesto=manifiesto)
+
+    with Metricas.etapa("guardado"):
+        doc.save(salida if hasattr(salida, "write") else str(salida))
+    return salida
 
-    intro = generar_intro()
-    p_intro = insertar_parrafo_despues(intro_title, intro, bold=False, tam=11)
+def parrafo_ancla_informe(doc, ancla="[[INICIO_INFORME]]", posicion_ancla=None):
+    """Párrafo tras el que va el informe: el del ancla (o su posición precalculada), o el último del documento."""
+    if posicion_ancla is not None:
+        return IndiceAnclas.como_parrafo(doc, IndiceAnclas.resolver(doc, posicion_ancla))
+    return encontrar_parrafo_con_ancla(doc, ancla) or doc.paragraphs[-1]
 
-    ultimo = p_intro
-    for titulo in puntos:
-        p_t = insertar_parrafo_despues(ultimo, titulo, bold=True, tam=18)
-        partes = generar_contenido(titulo)
+def insertar_informe(doc, par_ancla, puntos, tarea, intro, contenidos, manifiesto=None):
+    """
+    Inserta el informe a continuación de par_ancla, sin guardar (ver renderizar_informe).
+    Con manifiesto, registra en él cada sección y la deja marcada en el documento.
+    """
+    with Metricas.etapa("armado"):
+        marcadores = None
+        if manifiesto is not None:
+            manifiesto.intro = intro
+            nombres = [manifiesto.marcador_intro] + [manifiesto.agregar_punto(t, p)["marcador"]
+                                                     for t, p in zip(puntos, contenidos)]
+            primero = ManifiestoInforme.siguiente_id_marcador(doc)
+            marcadores = [(nombre, primero + i) for i, nombre in enumerate(nombres)]
+            ManifiestoInforme.identificar(doc, manifiesto.id)
+        construir_fragmento_informe(tarea, intro, puntos, contenidos, marcadores, doc=doc).insertar_despues(par_ancla._p)
+    return doc
+
+# ---------------- REGENERACION INCREMENTAL ---------------- #
+
+def regenerar_seccion_informe(doc, salida, manifiesto, seccion, titulo=None, partes=None):
+    """
+    Rehace solo una sección de un informe ya generado (doc, con los marcadores del manifiesto):
+      - seccion='intro' pide una introducción nueva
+      - seccion=n (desde 1) rehace el punto n; con 'titulo' cambia el tema y con 'partes'
+        ({descripcion, ejemplo, explicacion}) usa ese texto en lugar de llamar a Mistral
+    El resto del documento no se toca. Actualiza el manifiesto (no lo guarda).
+    Lanza IndexError si el punto no existe y ManifiestoInforme.SeccionNoEncontrada si el documento no lo tiene.
+    """
+    frag = FragmentoDocx(doc=doc)
+    if seccion == "intro":
+        ManifiestoInforme.rango_seccion(doc, manifiesto.marcador_intro)  # falla antes de llamar a Mistral
+        intro = generar_intro(forzar=True)  # sin caché: la guardada es justamente la que se quiere cambiar
+        with Metricas.etapa("armado"):
+            agregar_intro(frag, intro)
+            ManifiestoInforme.reemplazar_seccion(doc, manifiesto.marcador_intro, frag)
+        manifiesto.intro = intro
+    else:
+        punto = manifiesto.punto(int(seccion))
+        ManifiestoInforme.rango_seccion(doc, punto["marcador"])
+        titulo = titulo or punto["titulo"]
+        if partes is None:
+            partes = generar_contenido(titulo, forzar=titulo == punto["titulo"])
+        with Metricas.etapa("armado"):
+            agregar_punto(frag, titulo, partes)
+            ManifiestoInforme.reemplazar_seccion(doc, punto["marcador"], frag)
+        punto.update(titulo=titulo, partes=dict(partes))
+
+    with Metricas.etapa("guardado"):
+        doc.save(salida if hasattr(salida, "write") else str(salida))
+    return salida
 
-        p_desc = insertar_parrafo_despues(p_t, partes["descripcion"], bold=False, tam=11)
-        p_ej_label = insertar_parrafo_despues(p_desc, "Ejemplo:", bold=True, tam=11)
-        p_code = insertar_parrafo_despues(p_ej_label, partes["ejemplo"], bold=False, tam=11)
-        p_ex_label = insertar_parrafo_despues(p_code, "Explicación:", bold=True, tam=11)
-        p_ex = insertar_parrafo_despues(p_ex_label, partes["explicacion"], bold=False, tam=11)
+def agregar_puntos_informe(doc, salida, manifiesto, puntos, max_concurrencia=None, forzar=False):
+    """
+    Genera 'puntos' nuevos (en paralelo, sin rehacer la intro) y los agrega tras el último
+    punto del informe, cada uno con su marcador. Actualiza el manifiesto (no lo guarda).
+    """
+    anterior = manifiesto.puntos[-1]["marcador"] if manifiesto.puntos else manifiesto.marcador_intro
+    ManifiestoInforme.rango_seccion(doc, anterior)
+    _, contenidos = generar_textos_informe(puntos, max_concurrencia=max_concurrencia, forzar=forzar, con_intro=False)
 
-        ultimo = insertar_parrafo_despues(p_ex, "", bold=False, tam=11)
+    with Metricas.etapa("armado"):
+        frag = FragmentoDocx(doc=doc)
+        primero = ManifiestoInforme.siguiente_id_marcador(doc)
+        for i, (titulo, partes) in enumerate(zip(puntos, contenidos)):
+            desde = len(frag.elementos)
+            agregar_punto(frag, titulo, partes)
+            frag.marcar(manifiesto.agregar_punto(titulo, partes)["marcador"], primero + i, desde=desde)
+        ManifiestoInforme.insertar_tras_seccion(doc, anterior, frag)
 
-    doc.save(str(salida))
+    with Metricas.etapa("guardado"):
+        doc.save(salida if hasattr(salida, "write") else str(salida))
     return salida
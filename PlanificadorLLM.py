@@ -0,0 +1,157 @@
+# PlanificadorLLM.py
+# Turnos para las llamadas a Mistral: tope global de llamadas en curso, clases de prioridad
+# (las descripciones cortas del cuadro antes que las secciones largas del informe) y reparto
+# por turnos entre usuarios dentro de cada clase. Con la cola llena, las solicitudes nuevas se rechazan.
+import contextlib
+import contextvars
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+
+import Metricas
+
+ALTA = 0
+NORMAL = 1
+
+_usuario = contextvars.ContextVar("usuario_llm", default=None)
+
+
+def usuario_actual():
+    return _usuario.get()
+
+
+def asignar_usuario(usuario):
+    """Usuario de las llamadas hechas desde el contexto actual (lo heredan los hilos de Metricas.en_contexto)."""
+    return _usuario.set(usuario)
+
+
+@contextlib.contextmanager
+def como_usuario(usuario):
+    token = _usuario.set(usuario)
+    try:
+        yield
+    finally:
+        _usuario.reset(token)
+
+
+class Saturado(Exception):
+    """La cola de llamadas a Mistral superó su límite; reintentar en 'reintentar_en' segundos."""
+
+    def __init__(self, reintentar_en):
+        super().__init__(f"Mistral está saturado; reintenta en {reintentar_en} s")
+        self.reintentar_en = reintentar_en
+
+
+class Planificador:
+    """
+    Concede turnos para llamar a Mistral.
+      - capacidad: llamadas simultáneas como máximo (None = sin tope)
+      - max_cola: llamadas en espera a partir de las cuales admitir() rechaza solicitudes nuevas
+    Al liberarse un turno pasa directamente a la siguiente espera: primero la clase de
+    prioridad más alta y, dentro de ella, el siguiente usuario en la rotación (una llamada por vez).
+    """
+
+    def __init__(self, capacidad=None, max_cola=64, clases=2):
+        self.capacidad = capacidad or None
+        self.max_cola = max_cola
+        self.en_curso = 0
+        self.en_cola = 0
+        self.rechazos = 0
+        self.media_segundos = None
+        self._colas = [OrderedDict() for _ in range(clases)]  # usuario -> deque de esperas
+        self._lock = threading.Lock()
+
+    def ajustar(self, capacidad):
+        with self._lock:
+            self.capacidad = capacidad or None
+            self._despachar()
+
+    def _libre(self):
+        return self.capacidad is None or self.en_curso < self.capacidad
+
+    def _despachar(self):
+        while self.en_cola and self._libre():
+            cola = next(c for c in self._colas if c)
+            usuario, esperas = next(iter(cola.items()))
+            evento = esperas.popleft()
+            if esperas:
+                cola.move_to_end(usuario)
+            else:
+                del cola[usuario]
+            self.en_cola -= 1
+            self.en_curso += 1
+            evento.set()
+
+    @contextlib.contextmanager
+    def turno(self, prioridad=NORMAL, usuario=None):
+        """with planificador.turno(ALTA): ...  espera (si hace falta) y ocupa un lugar durante el bloque."""
+        prioridad = min(max(prioridad, 0), len(self._colas) - 1)
+        usuario = usuario if usuario is not None else _usuario.get()
+        llegada = time.perf_counter()
+        with self._lock:
+            if self.en_cola == 0 and self._libre():
+                self.en_curso += 1
+                evento = None
+            else:
+                evento = threading.Event()
+                self._colas[prioridad].setdefault(usuario, deque()).append(evento)
+                self.en_cola += 1
+        if evento is not None:
+            evento.wait()
+        inicio = time.perf_counter()
+        Metricas.registrar_espera_llm(prioridad, inicio - llegada)
+        try:
+            yield
+        finally:
+            segundos = time.perf_counter() - inicio
+            with self._lock:
+                self.media_segundos = segundos if self.media_segundos is None else \
+                    0.9 * self.media_segundos + 0.1 * segundos
+                self.en_curso -= 1
+                self._despachar()
+
+    def intentar_turno(self):
+        """
+        Ocupa un lugar sin esperar, solo si hay uno libre y nadie en cola; True si lo tomó.
+        El lugar se devuelve con liberar() (para llamadas extra como los duplicados del balanceador).
+        """
+        with self._lock:
+            if self.en_cola or not self._libre():
+                return False
+            self.en_curso += 1
+            return True
+
+    def liberar(self):
+        with self._lock:
+            self.en_curso -= 1
+            self._despachar()
+
+    def reintentar_en(self):
+        """Segundos estimados hasta vaciar la cola actual (al menos 1)."""
+        with self._lock:
+            paralelas = self.capacidad or max(1, self.en_curso)
+            return max(1, math.ceil(self.en_cola * (self.media_segundos or 1.0) / paralelas))
+
+    def admitir(self):
+        """Lanza Saturado si la cola de espera ya llegó a max_cola (se llama antes de empezar a generar)."""
+        with self._lock:
+            lleno = bool(self.max_cola) and self.en_cola >= self.max_cola
+            if lleno:
+                self.rechazos += 1
+        if lleno:
+            Metricas.contar_rechazo()
+            raise Saturado(self.reintentar_en())
+
+    def estadisticas(self):
+        with self._lock:
+            return {
+                "capacidad": self.capacidad,
+                "en_curso": self.en_curso,
+                "en_cola": self.en_cola,
+                "max_cola": self.max_cola,
+                "rechazos": self.rechazos,
+                "media_segundos": round(self.media_segundos, 3) if self.media_segundos is not None else None,
+                "en_cola_por_prioridad": [sum(len(e) for e in cola.values()) for cola in self._colas],
+                "usuarios_en_cola": len({u for cola in self._colas for u in cola}),
+            }
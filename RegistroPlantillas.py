@@ -0,0 +1,136 @@
+# RegistroPlantillas.py
+# Registro de plantillas .docx por hash de contenido: se suben una vez y se reutilizan ya parseadas.
+import copy
+import hashlib
+import io
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+from docx import Document
+
+from IndiceAnclas import indexar_anclas
+
+ANCLAS = ("[[INICIO_INFORME]]", "[[AQUI_TABLA]]")
+
+
+class Plantilla:
+    def __init__(self, plantilla_id, nombre, datos):
+        self.id = plantilla_id
+        self.nombre = nombre
+        self.tamano = len(datos)
+        self.documento = Document(io.BytesIO(datos))
+        self.anclas = indexar_anclas(self.documento, ANCLAS)
+        self.creada = time.time()
+        self.usada = self.creada
+        self.usos = 0
+
+    def posicion(self, ancla):
+        """Primera posición precalculada del ancla (None si la plantilla no la tiene)."""
+        posiciones = self.anclas.get(ancla)
+        return posiciones[0] if posiciones else None
+
+    def clonar(self):
+        """Copia independiente del documento parseado, lista para modificar en una solicitud."""
+        self.usada = time.time()
+        self.usos += 1
+        return copy.deepcopy(self.documento)
+
+    def como_dict(self):
+        return {
+            "id": self.id,
+            "nombre": self.nombre,
+            "tamano": self.tamano,
+            "anclas": {a: [p.como_dict() for p in ps] for a, ps in self.anclas.items()},
+            "creada": self.creada,
+            "usada": self.usada,
+            "usos": self.usos,
+        }
+
+
+class RegistroPlantillas:
+    """
+    Guarda los bytes de cada plantilla en 'directorio' y mantiene en memoria
+    las más usadas ya parseadas. Cuando la suma de tamaños (.docx comprimido,
+    como aproximación de la memoria ocupada) supera max_bytes
+    se descarta de memoria la menos usada (LRU); se vuelve a parsear desde
+    disco la próxima vez que se pida.
+    """
+
+    def __init__(self, directorio, max_bytes=64 * 1024 * 1024):
+        self.directorio = Path(directorio)
+        self.directorio.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._memoria = OrderedDict()
+        self._nombres = {}
+        self._lock = threading.Lock()
+
+    def _ruta(self, plantilla_id):
+        return self.directorio / f"{plantilla_id}.docx"
+
+    def _cargar(self, plantilla_id, nombre, datos):
+        plantilla = Plantilla(plantilla_id, nombre, datos)
+        self._memoria[plantilla_id] = plantilla
+        self._memoria.move_to_end(plantilla_id)
+        en_uso = sum(p.tamano for p in self._memoria.values())
+        while en_uso > self.max_bytes and len(self._memoria) > 1:
+            _, expulsada = self._memoria.popitem(last=False)
+            en_uso -= expulsada.tamano
+        return plantilla
+
+    def registrar(self, datos, nombre="plantilla.docx"):
+        plantilla_id = hashlib.sha256(datos).hexdigest()[:32]
+        with self._lock:
+            if plantilla_id in self._memoria:
+                self._memoria.move_to_end(plantilla_id)
+                return self._memoria[plantilla_id]
+            plantilla = self._cargar(plantilla_id, nombre, datos)  # valida que sea un .docx
+            self._ruta(plantilla_id).write_bytes(datos)
+            self._nombres[plantilla_id] = nombre
+            return plantilla
+
+    def obtener(self, plantilla_id):
+        with self._lock:
+            if plantilla_id in self._memoria:
+                self._memoria.move_to_end(plantilla_id)
+                return self._memoria[plantilla_id]
+            ruta = self._ruta(plantilla_id)
+            if not plantilla_id.isalnum() or not ruta.exists():
+                return None
+            return self._cargar(plantilla_id, self._nombres.get(plantilla_id, ruta.name), ruta.read_bytes())
+
+    def eliminar(self, plantilla_id):
+        with self._lock:
+            self._memoria.pop(plantilla_id, None)
+            self._nombres.pop(plantilla_id, None)
+            ruta = self._ruta(plantilla_id)
+            if plantilla_id.isalnum() and ruta.exists():
+                ruta.unlink()
+                return True
+            return False
+
+    def listar(self):
+        with self._lock:
+            resultado = []
+            for ruta in sorted(self.directorio.glob("*.docx")):
+                plantilla_id = ruta.stem
+                if plantilla_id in self._memoria:
+                    datos = self._memoria[plantilla_id].como_dict()
+                    datos["en_memoria"] = True
+                else:
+                    datos = {
+                        "id": plantilla_id,
+                        "nombre": self._nombres.get(plantilla_id, ruta.name),
+                        "tamano": ruta.stat().st_size,
+                        "en_memoria": False,
+                    }
+                resultado.append(datos)
+            return resultado
+
+
+registro = RegistroPlantillas(
+    os.environ.get("PLANTILLAS_DIR", str(Path(__file__).parent / ".plantillas")),
+    max_bytes=int(os.environ.get("PLANTILLAS_MAX_MB", "64")) * 1024 * 1024,
+)
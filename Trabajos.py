@@ -0,0 +1,162 @@
+# Trabajos.py
+# Cola local de trabajos en segundo plano (hilos, sin broker externo) para generar documentos.
+import io
+import os
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import Metricas
+import PlanificadorLLM
+
+PENDIENTE = "pendiente"
+EN_PROCESO = "en_proceso"
+TERMINADO = "terminado"
+ERROR = "error"
+
+# Resultado de cada trabajo: en memoria salvo que supere el umbral (igual que buffer_salida del Controller)
+UMBRAL_DISCO = int(os.environ.get("UMBRAL_DISCO_MB", "16")) * 1024 * 1024
+
+
+class Trabajo:
+    def __init__(self, tipo):
+        self.id = uuid.uuid4().hex
+        self.tipo = tipo
+        self.estado = PENDIENTE
+        self.progreso = 0.0
+        self.mensaje = "En cola"
+        self.error = None
+        self.resultado = {}
+        self.salida = tempfile.SpooledTemporaryFile(max_size=UMBRAL_DISCO)
+        self.creado = time.time()
+        self.terminado = None
+        self.eventos = []
+        self._cond = threading.Condition()
+
+    def publicar(self, evento):
+        """Agrega un evento para los clientes suscritos (Server-Sent Events)."""
+        with self._cond:
+            self.eventos.append(evento)
+            self._cond.notify_all()
+
+    def esperar_eventos(self, desde, timeout=15):
+        """Eventos con índice >= desde; bloquea hasta timeout si aún no hay ninguno."""
+        with self._cond:
+            if len(self.eventos) <= desde and self.estado in (PENDIENTE, EN_PROCESO):
+                self._cond.wait(timeout)
+            return self.eventos[desde:]
+
+    def finalizar(self, estado, error=None):
+        """Estado final y evento 'fin' juntos, para que un suscriptor nunca vea uno sin el otro."""
+        with self._cond:
+            self.error = error
+            self.mensaje = "Listo" if estado == TERMINADO else "Error"
+            if estado == TERMINADO:
+                self.progreso = 1.0
+            self.terminado = time.time()
+            self.estado = estado
+            self.eventos.append({"tipo": "fin", "estado": estado, "error": error})
+            self._cond.notify_all()
+
+    def copia_salida(self):
+        """Copia del documento generado; trabajo.salida queda abierto para otras descargas."""
+        with self._cond:
+            self.salida.seek(0)
+            return io.BytesIO(self.salida.read())
+
+    def actualizar(self, hechos, total, mensaje=None):
+        self.progreso = round(hechos / total, 3) if total else 0.0
+        if mensaje:
+            self.mensaje = mensaje
+        self.publicar({"tipo": "progreso", "progreso": self.progreso, "mensaje": self.mensaje})
+
+    def como_dict(self):
+        return {
+            "id": self.id,
+            "tipo": self.tipo,
+            "estado": self.estado,
+            "progreso": self.progreso,
+            "mensaje": self.mensaje,
+            "error": self.error,
+            "resultado": self.resultado,
+            "creado": self.creado,
+            "terminado": self.terminado,
+        }
+
+
+class ColaTrabajos:
+    """
+    Ejecuta funciones de generación en un pool de hilos y guarda su estado.
+      - workers: trabajos simultáneos
+      - retencion: segundos que se conserva un resultado terminado antes de borrarlo
+    """
+
+    def __init__(self, workers=2, retencion=3600, intervalo_limpieza=60):
+        self.retencion = retencion
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="trabajo")
+        self._trabajos = {}
+        self._lock = threading.Lock()
+        hilo = threading.Thread(target=self._limpiar_periodicamente, args=(intervalo_limpieza,), daemon=True)
+        hilo.start()
+
+    def crear(self, tipo):
+        """Reserva un trabajo para que el llamador lo configure antes de enviarlo."""
+        trabajo = Trabajo(tipo)
+        with self._lock:
+            self._trabajos[trabajo.id] = trabajo
+        return trabajo
+
+    def enviar(self, trabajo, funcion):
+        """
+        Encola funcion(trabajo); la función escribe trabajo.salida y puede
+        informar avance con trabajo.actualizar(hechos, total).
+        Las llamadas a Mistral del trabajo cuentan para el usuario que lo envió.
+        """
+        self._pool.submit(self._ejecutar, trabajo, funcion, PlanificadorLLM.usuario_actual())
+        return trabajo
+
+    def obtener(self, trabajo_id):
+        with self._lock:
+            return self._trabajos.get(trabajo_id)
+
+    def _ejecutar(self, trabajo, funcion, usuario=None):
+        trabajo.estado = EN_PROCESO
+        trabajo.mensaje = "Generando"
+        medicion = Metricas.iniciar(f"trabajo/{trabajo.tipo}", trabajo.id)
+        estado, error = ERROR, None
+        try:
+            with PlanificadorLLM.como_usuario(usuario):
+                funcion(trabajo)
+            estado = TERMINADO
+        except Exception as e:
+            error = str(e)
+        finally:
+            Metricas.terminar(medicion, estado)
+            trabajo.finalizar(estado, error)
+
+    def purgar(self):
+        """Elimina los trabajos terminados (o con error) más antiguos que la retención y libera su salida."""
+        limite = time.time() - self.retencion
+        with self._lock:
+            vencidos = [t for t in self._trabajos.values() if t.terminado and t.terminado < limite]
+            for t in vencidos:
+                del self._trabajos[t.id]
+        for t in vencidos:
+            t.salida.close()
+        return len(vencidos)
+
+    def _limpiar_periodicamente(self, intervalo):
+        while True:
+            time.sleep(intervalo)
+            try:
+                self.purgar()
+            except Exception:
+                pass
+
+
+cola = ColaTrabajos(
+    workers=int(os.environ.get("TRABAJOS_WORKERS", "2")),
+    retencion=int(os.environ.get("TRABAJOS_RETENCION", "3600")),
+)
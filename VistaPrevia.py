@@ -0,0 +1,85 @@
+# VistaPrevia.py
+# Contenido generado (textos del informe, descripciones del cuadro y totales de horas) guardado
+# sin armar ningún .docx, para mostrarlo como vista previa y armar el documento después sin
+# volver a llamar a Mistral.
+import json
+import os
+import threading
+import time
+import uuid
+from pathlib import Path
+
+INFORME = "informe"
+CUADRO = "cuadro"
+
+
+class VistaPrevia:
+    """
+    Entradas y contenido ya generado de un documento.
+      - informe: contenido = {'tarea', 'puntos', 'intro', 'contenidos': [partes de cada punto]}
+      - cuadro:  contenido = {'semanas': [{'titulo', 'dias'}], 'lote': bool, 'resumen': HorasTrabajo.resumen()}
+    """
+
+    def __init__(self, tipo, contenido, vista_id=None, creado=None):
+        self.id = vista_id or uuid.uuid4().hex
+        self.tipo = tipo
+        self.contenido = contenido
+        self.creado = creado or time.time()
+
+    def como_dict(self):
+        return {"id": self.id, "tipo": self.tipo, "creado": self.creado, **self.contenido}
+
+    @classmethod
+    def desde_dict(cls, datos):
+        datos = dict(datos)
+        return cls(datos.pop("tipo"), datos, vista_id=datos.pop("id"), creado=datos.pop("creado", None))
+
+
+class AlmacenVistas:
+    """Un archivo <id>.json por vista previa (escritura atómica); las de más de 'horas' se borran al guardar."""
+
+    def __init__(self, directorio, horas=24):
+        self.directorio = Path(directorio)
+        self.directorio.mkdir(parents=True, exist_ok=True)
+        self.segundos = horas * 3600
+        self._lock = threading.Lock()
+
+    def _ruta(self, vista_id):
+        return self.directorio / f"{vista_id}.json"
+
+    def guardar(self, vista):
+        texto = json.dumps(vista.como_dict(), ensure_ascii=False)
+        ruta = self._ruta(vista.id)
+        with self._lock:
+            self._purgar()
+            temporal = ruta.with_suffix(f".{threading.get_ident()}.tmp")
+            temporal.write_text(texto, encoding="utf-8")
+            os.replace(temporal, ruta)
+        return vista
+
+    def obtener(self, vista_id):
+        """Vista previa guardada, o None si no existe o ya venció."""
+        if not vista_id or not vista_id.isalnum():
+            return None
+        ruta = self._ruta(vista_id)
+        with self._lock:
+            try:
+                if time.time() - ruta.stat().st_mtime > self.segundos:
+                    return None
+                datos = json.loads(ruta.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                return None
+        return VistaPrevia.desde_dict(datos)
+
+    def _purgar(self):
+        limite = time.time() - self.segundos
+        for ruta in self.directorio.glob("*.json"):
+            try:
+                if ruta.stat().st_mtime < limite:
+                    ruta.unlink()
+            except FileNotFoundError:
+                pass
+
+
+almacen = AlmacenVistas(os.environ.get("VISTAS_DIR", str(Path(__file__).parent / ".vistas")),
+                        horas=float(os.environ.get("VISTAS_HORAS", "24")))
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Balanceo entre instancias de ollama contra servidores falsos locales: dos sanas con cola
+de latencia (una fracción de respuestas lentas) y una caída. Compara sin y con hedging.
+
+    python benchmarks/bench_balanceo.py --llamadas 400 --hilos 8 --percentil 90
+"""
+import argparse
+import socket
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from BalanceadorOllama import Balanceador  # noqa: E402
+from servidor_ollama_falso import iniciar  # noqa: E402
+
+
+def puerto_libre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def percentil(valores, p):
+    orden = sorted(valores)
+    return orden[min(len(orden) - 1, int(len(orden) * p / 100))]
+
+
+def correr(balanceador, llamadas, hilos):
+    def una(_):
+        inicio = time.perf_counter()
+        balanceador.chat(30, grupo="descripcion", model="mistral",
+                         messages=[{"role": "user", "content": "Tarea: prueba"}])
+        return time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=hilos) as pool:
+        tiempos = list(pool.map(una, range(llamadas)))
+    return tiempos, time.perf_counter() - inicio
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--llamadas", type=int, default=400)
+    parser.add_argument("--hilos", type=int, default=8)
+    parser.add_argument("--latencia", type=float, default=0.02)
+    parser.add_argument("--prob-lenta", type=float, default=0.05)
+    parser.add_argument("--percentil", type=float, default=90)
+    args = parser.parse_args()
+
+    servidores = [iniciar(latencia=args.latencia, prob_lenta=args.prob_lenta, factor_lenta=20) for _ in range(2)]
+    hosts = [s.url for s in servidores] + [f"http://127.0.0.1:{puerto_libre()}"]  # la última no existe
+
+    for nombre, percentil_hedge in (("sin hedging", 0), (f"hedging p{args.percentil:g}", args.percentil)):
+        balanceador = Balanceador(hosts, hedge_percentil=percentil_hedge, intervalo_salud=0)
+        tiempos, total = correr(balanceador, args.llamadas, args.hilos)
+        reparto = ", ".join(f"{i['host'].rsplit(':', 1)[-1]}={i['llamadas']}"
+                            f"{'' if i['sana'] else ' (expulsada)'}"
+                            for i in balanceador.estadisticas()["instancias"])
+        duplicadas = sum(i["duplicadas"] for i in balanceador.estadisticas()["instancias"])
+        print(f"{nombre:14s} p50 {percentil(tiempos, 50) * 1000:6.1f} ms  p95 {percentil(tiempos, 95) * 1000:6.1f} ms  "
+              f"p99 {percentil(tiempos, 99) * 1000:6.1f} ms  {args.llamadas / total:6.1f} llamadas/s  "
+              f"duplicadas={duplicadas}  [{reparto}]")
+
+    for s in servidores:
+        s.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark de formato: párrafos con estilos con nombre (EstilosDocx) frente a formato
+directo run por run (DOCX_ESTILOS=0). Arma un informe largo y un cuadro mensual/semestral
+con ambos modos, verifica que el texto sea el mismo y compara el tamaño de word/document.xml,
+el del .docx y el tiempo de doc.save. No llama a Mistral.
+
+    python benchmarks/bench_estilos.py --puntos 100 --semanas 26 --repeticiones 3
+"""
+import argparse
+import io
+import sys
+import time
+import zipfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from docx import Document  # noqa: E402
+
+import EstilosDocx  # noqa: E402
+from ModeloCuadroMensual import generar_cuadro_semanas  # noqa: E402
+from ModeloInforme import construir_fragmento_informe  # noqa: E402
+from bench_fragmentos import PARTES  # noqa: E402
+from bench_tabla_cuadro import dias_de_prueba  # noqa: E402
+
+
+def armar_informe(puntos):
+    doc = Document()
+    doc.add_paragraph("Encabezado")
+    ancla = doc.add_paragraph("[[INICIO_INFORME]]")
+    titulos = [f"Punto {i}" for i in range(1, puntos + 1)]
+    construir_fragmento_informe("Tarea de prueba", "Introducción de prueba, con comas", titulos,
+                                [PARTES] * puntos, doc=doc).insertar_despues(ancla._p)
+    return doc
+
+
+def armar_cuadro(semanas):
+    doc = Document()
+    doc.add_paragraph("[[AQUI_TABLA]]")
+    lista = [{"titulo": f"Semana {i}", "dias": dias_de_prueba(6)} for i in range(1, semanas + 1)]
+    generar_cuadro_semanas(doc, io.BytesIO(), lista)
+    return doc
+
+
+def texto(doc):
+    partes = [p.text for p in doc.paragraphs]
+    for tabla in doc.tables:
+        partes.extend(c.text for fila in tabla.rows for c in fila.cells)
+    return partes
+
+
+def medir(armar, cantidad, estilos, repeticiones):
+    """(document.xml en bytes, .docx en bytes, mejor tiempo de save, texto)"""
+    EstilosDocx.HABILITADOS = estilos
+    doc = armar(cantidad)
+    tiempos = []
+    for _ in range(repeticiones):
+        salida = io.BytesIO()
+        inicio = time.perf_counter()
+        doc.save(salida)
+        tiempos.append(time.perf_counter() - inicio)
+    with zipfile.ZipFile(salida) as z:
+        xml = z.getinfo("word/document.xml").file_size
+    return xml, len(salida.getvalue()), min(tiempos), texto(Document(salida))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--puntos", type=int, default=100)
+    parser.add_argument("--semanas", type=int, default=26)
+    parser.add_argument("--repeticiones", type=int, default=3)
+    args = parser.parse_args()
+
+    for nombre, armar, cantidad in (("informe", armar_informe, args.puntos), ("cuadro", armar_cuadro, args.semanas)):
+        xml_d, docx_d, t_d, texto_d = medir(armar, cantidad, False, args.repeticiones)
+        xml_e, docx_e, t_e, texto_e = medir(armar, cantidad, True, args.repeticiones)
+        print(f"{nombre} ({cantidad}), texto igual: {'sí' if texto_d == texto_e else 'NO'}")
+        print(f"  document.xml  directo {xml_d / 1024:9.1f} KiB  estilos {xml_e / 1024:9.1f} KiB"
+              f"  ({(1 - xml_e / xml_d) * 100:5.1f}% menos)")
+        print(f"  .docx         directo {docx_d / 1024:9.1f} KiB  estilos {docx_e / 1024:9.1f} KiB"
+              f"  ({(1 - docx_e / docx_d) * 100:5.1f}% menos)")
+        print(f"  doc.save      directo {t_d * 1000:9.1f} ms   estilos {t_e * 1000:9.1f} ms   (x{t_d / t_e:.2f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Micro-benchmark: inserción del informe con insertar_parrafo_despues (el armado
+anterior, párrafo a párrafo con add + mover, conservado aquí como referencia) frente a FragmentoDocx (w:p armados en lxml e insertados de una vez).
+No llama a Mistral: usa contenido fijo.
+
+    python benchmarks/bench_fragmentos.py --puntos 100 --repeticiones 5
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from docx import Document  # noqa: E402
+from docx.enum.text import WD_PARAGRAPH_ALIGNMENT  # noqa: E402
+from docx.oxml.ns import qn  # noqa: E402
+from docx.shared import Pt  # noqa: E402
+
+from ModeloInforme import construir_fragmento_informe  # noqa: E402
+
+PARTES = {
+    "descripcion": "Texto corrido de prueba, con comas; " * 8,
+    "ejemplo": "def suma(a, b):\n\treturn a + b\n\nprint(suma(1, 2))",
+    "explicacion": "Explicación de prueba, con comas; " * 5,
+}
+
+
+# --- Armado anterior (referencia) ---
+def aplicar_fuente_run(run, fuente="Arial", tam=11, bold=False):
+    run.font.size = Pt(tam)
+    run.bold = bool(bold)
+    try:
+        run.font.name = fuente
+        rPr = run._element.get_or_add_rPr()
+        rFonts = rPr.get_or_add_rFonts()
+        rFonts.set(qn('w:ascii'), fuente)
+        rFonts.set(qn('w:hAnsi'), fuente)
+    except Exception:
+        pass
+
+
+def insertar_parrafo_despues(par_ref, txt, bold=False, tam=11):
+    doc = par_ref._parent
+    nuevo = doc.add_paragraph()
+    par_ref._p.addnext(nuevo._p)
+    run = nuevo.add_run(txt)
+    aplicar_fuente_run(run, tam=tam, bold=bold)
+    nuevo.alignment = WD_PARAGRAPH_ALIGNMENT.LEFT
+    return nuevo
+
+
+def _documento():
+    doc = Document()
+    doc.add_paragraph("Encabezado")
+    ancla = doc.add_paragraph("[[INICIO_INFORME]]")
+    doc.add_paragraph("Fin")
+    return doc, ancla
+
+
+def insertar_por_parrafo(tarea, intro, puntos, contenidos):
+    """Ruta anterior de generar_informe: un add_paragraph + addnext + formato por párrafo."""
+    doc, par_ancla = _documento()
+    t1 = insertar_parrafo_despues(par_ancla, "Tarea más significativa:", bold=True, tam=11)
+    t2 = insertar_parrafo_despues(t1, tarea, bold=True, tam=11)
+    d1 = insertar_parrafo_despues(t2, "Descripción del proceso:", bold=True, tam=11)
+    intro_title = insertar_parrafo_despues(d1, "INTRODUCCION", bold=True, tam=18)
+    ultimo = insertar_parrafo_despues(intro_title, intro, bold=False, tam=11)
+    for titulo, partes in zip(puntos, contenidos):
+        p_t = insertar_parrafo_despues(ultimo, titulo, bold=True, tam=18)
+        p_desc = insertar_parrafo_despues(p_t, partes["descripcion"], bold=False, tam=11)
+        p_ej_label = insertar_parrafo_despues(p_desc, "Ejemplo:", bold=True, tam=11)
+        p_code = insertar_parrafo_despues(p_ej_label, partes["ejemplo"], bold=False, tam=11)
+        p_ex_label = insertar_parrafo_despues(p_code, "Explicación:", bold=True, tam=11)
+        p_ex = insertar_parrafo_despues(p_ex_label, partes["explicacion"], bold=False, tam=11)
+        ultimo = insertar_parrafo_despues(p_ex, "", bold=False, tam=11)
+    return doc
+
+
+def insertar_con_fragmento(tarea, intro, puntos, contenidos):
+    doc, par_ancla = _documento()
+    construir_fragmento_informe(tarea, intro, puntos, contenidos).insertar_despues(par_ancla._p)
+    return doc
+
+
+def medir(funcion, repeticiones, *args):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion(*args)
+        tiempos.append(time.perf_counter() - inicio)
+    return min(tiempos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--puntos", type=int, default=100)
+    parser.add_argument("--repeticiones", type=int, default=5)
+    args = parser.parse_args()
+
+    puntos = [f"Punto {i}" for i in range(1, args.puntos + 1)]
+    contenidos = [PARTES] * len(puntos)
+    entrada = ("Tarea de prueba", "Introducción de prueba, con comas", puntos, contenidos)
+
+    antes = insertar_por_parrafo(*entrada).element.body.xml
+    despues = insertar_con_fragmento(*entrada).element.body.xml
+    print(f"XML idéntico: {'sí' if antes == despues else 'NO'}")
+
+    t_antes = medir(insertar_por_parrafo, args.repeticiones, *entrada)
+    t_despues = medir(insertar_con_fragmento, args.repeticiones, *entrada)
+    print(f"{args.puntos} puntos ({len(puntos) * 7 + 5} párrafos), mejor de {args.repeticiones}:")
+    print(f"  insertar_parrafo_despues : {t_antes * 1000:8.1f} ms")
+    print(f"  FragmentoDocx            : {t_despues * 1000:8.1f} ms  (x{t_antes / t_despues:.1f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark de punta a punta contra un ollama falso local (servidor_ollama_falso):
+generar_informe / generar_cuadro / generar_entrega directamente (la entrega también en dos
+pasadas, informe y luego cuadro sobre su salida) y los endpoints /generar_informe, /generar_cuadro
+y /generar_entrega (cliente de pruebas de Flask) con varios tamaños y clientes concurrentes.
+
+Por escenario reporta p50/p95 de latencia, documentos por segundo, llamadas al LLM
+por documento, respuestas malformadas y memoria pico (tracemalloc, en una corrida aparte).
+La salida es JSON (--salida) y --comparar marca regresiones frente a una corrida anterior.
+
+    python benchmarks/bench_generacion.py --puntos 2 10 --tareas 1 4 --clientes 1 4 --salida actual.json
+    python benchmarks/bench_generacion.py --latencia 0.05 --tokens-por-seg 200 --malformadas 0.1
+    python benchmarks/bench_generacion.py --comparar base.json --tolerancia 0.2
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from servidor_ollama_falso import iniciar  # noqa: E402
+
+DIAS = ["Lunes", "Martes", "Miércoles", "Jueves", "Viernes", "Sábado"]
+
+
+def percentil(valores, p):
+    orden = sorted(valores)
+    return orden[min(len(orden) - 1, int(len(orden) * p / 100))]
+
+
+def plantilla(parrafos):
+    """Plantilla .docx con ambas anclas y 'parrafos' párrafos de relleno."""
+    from docx import Document
+    doc = Document()
+    doc.add_paragraph("Informe semanal")
+    for i in range(parrafos):
+        doc.add_paragraph(f"Párrafo de relleno {i}, con texto suficiente para ocupar una línea completa")
+    doc.add_paragraph("[[INICIO_INFORME]]")
+    doc.add_paragraph("[[AQUI_TABLA]]")
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    return buffer.getvalue()
+
+
+def campos_cuadro(tareas):
+    """Formulario de /generar_cuadro: 5 días laborables con 'tareas' tareas cada uno y el sábado libre."""
+    campos = {}
+    for i, dia in enumerate(DIAS, start=1):
+        laborable = i < 6
+        campos.update({
+            f"dia_{i}": dia,
+            f"fecha_{i}": f"2024-01-{i:02d}" if laborable else "",
+            f"laborable_{i}": "si" if laborable else "no",
+            f"hora_inicio_{i}": "08:00",
+            f"hora_fin_{i}": "12:30",
+            f"tema_{i}": "Programación en Python" if laborable else "",
+            f"tareas_{i}": "\n".join(f"Tarea {j} del día {i}" for j in range(1, tareas + 1)) if laborable else "",
+        })
+    return campos
+
+
+# --- Escenarios ---
+def escenario_informe_funcion(tpl, puntos):
+    from docx import Document
+    from ModeloInforme import generar_informe
+    lista = [f"Punto {i}: estructuras de datos" for i in range(1, puntos + 1)]
+
+    def correr():
+        generar_informe(Document(io.BytesIO(tpl)), io.BytesIO(), lista, "Tarea de prueba")
+    return correr
+
+
+def escenario_cuadro_funcion(tpl, tareas):
+    from docx import Document
+    from ModeloCuadro import generar_cuadro, generar_descripciones_semana
+    campos = campos_cuadro(tareas)
+
+    def correr():
+        dias = _dias(campos)
+        generar_descripciones_semana(dias)
+        generar_cuadro(Document(io.BytesIO(tpl)), io.BytesIO(), dias)
+    return correr
+
+
+def _dias(campos):
+    from ModeloCuadro import dia_desde_campos
+    return [dia_desde_campos(campos[f"dia_{i}"], fecha=campos[f"fecha_{i}"], laborable=campos[f"laborable_{i}"],
+                             hora_inicio=campos[f"hora_inicio_{i}"], hora_fin=campos[f"hora_fin_{i}"],
+                             tema=campos[f"tema_{i}"], tareas=campos[f"tareas_{i}"])
+            for i in range(1, 7)]
+
+
+def escenario_entrega_dos_pasadas(tpl, puntos, tareas):
+    """Lo que había que hacer antes: informe sobre la plantilla y luego cuadro sobre ese resultado."""
+    from docx import Document
+    from ModeloCuadro import generar_cuadro, generar_descripciones_semana
+    from ModeloInforme import generar_informe
+    lista = [f"Punto {i}: estructuras de datos" for i in range(1, puntos + 1)]
+    campos = campos_cuadro(tareas)
+
+    def correr():
+        intermedio = io.BytesIO()
+        generar_informe(Document(io.BytesIO(tpl)), intermedio, lista, "Tarea de prueba")
+        dias = _dias(campos)
+        generar_descripciones_semana(dias)
+        intermedio.seek(0)
+        generar_cuadro(Document(intermedio), io.BytesIO(), dias)
+    return correr
+
+
+def escenario_entrega_funcion(tpl, puntos, tareas):
+    from docx import Document
+    from ModeloEntrega import generar_entrega
+    lista = [f"Punto {i}: estructuras de datos" for i in range(1, puntos + 1)]
+    campos = campos_cuadro(tareas)
+
+    def correr():
+        generar_entrega(Document(io.BytesIO(tpl)), io.BytesIO(), lista, "Tarea de prueba", _dias(campos))
+    return correr
+
+
+def escenario_endpoint(app, ruta, campo_archivo, tpl, campos):
+    def correr():
+        data = dict(campos)
+        data[campo_archivo] = (io.BytesIO(tpl), "plantilla.docx")
+        resp = app.test_client().post(ruta, data=data, content_type="multipart/form-data")
+        if resp.status_code != 200:
+            raise RuntimeError(f"{ruta} respondió {resp.status_code}")
+    return correr
+
+
+def medir(nombre, params, correr, servidor, repeticiones, clientes):
+    antes = servidor.contadores()
+    tiempos = []
+
+    def una(_):
+        inicio = time.perf_counter()
+        correr()
+        return time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clientes) as pool:
+        tiempos = list(pool.map(una, range(repeticiones * clientes)))
+    total = time.perf_counter() - inicio
+    despues = servidor.contadores()
+    documentos = len(tiempos)
+
+    tracemalloc.start()
+    correr()
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    def delta(clave):
+        return despues.get(clave, 0) - antes.get(clave, 0)
+
+    return {
+        "escenario": nombre,
+        **params,
+        "clientes": clientes,
+        "documentos": documentos,
+        "p50_ms": round(percentil(tiempos, 50) * 1000, 2),
+        "p95_ms": round(percentil(tiempos, 95) * 1000, 2),
+        "docs_por_seg": round(documentos / total, 3),
+        "llamadas_llm_por_doc": round(delta("/api/chat") / documentos, 2),
+        "malformadas_por_doc": round(delta("malformadas") / documentos, 2),
+        "tokens_por_doc": round(delta("tokens") / documentos, 1),
+        "memoria_pico_mb": round(pico / 1024 / 1024, 2),
+    }
+
+
+def comparar(actual, anterior, tolerancia):
+    """Escenarios cuyo p50/p95 empeoró o cuyo rendimiento bajó más que 'tolerancia' (fracción)."""
+    clave = lambda r: json.dumps({k: v for k, v in r.items() if k in CLAVES_ESCENARIO}, sort_keys=True)  # noqa: E731
+    previos = {clave(r): r for r in anterior["resultados"]}
+    regresiones = []
+    for r in actual["resultados"]:
+        p = previos.get(clave(r))
+        if not p:
+            continue
+        for metrica, peor_si_sube in (("p50_ms", True), ("p95_ms", True), ("docs_por_seg", False),
+                                      ("llamadas_llm_por_doc", True), ("memoria_pico_mb", True)):
+            a, b = r[metrica], p[metrica]
+            if not b:
+                continue
+            cambio = (a - b) / b if peor_si_sube else (b - a) / b
+            if cambio > tolerancia:
+                regresiones.append({"escenario": clave(r), "metrica": metrica, "antes": b, "ahora": a,
+                                    "cambio": round(cambio, 3)})
+    return regresiones
+
+
+CLAVES_ESCENARIO = ("escenario", "puntos", "tareas", "plantilla_parrafos", "clientes")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--puntos", type=int, nargs="+", default=[2, 10])
+    parser.add_argument("--tareas", type=int, nargs="+", default=[1, 4], help="tareas por día laborable")
+    parser.add_argument("--plantilla-parrafos", type=int, nargs="+", default=[10, 2000])
+    parser.add_argument("--clientes", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--repeticiones", type=int, default=3, help="documentos por cliente")
+    parser.add_argument("--latencia", type=float, default=0.02)
+    parser.add_argument("--tokens-por-seg", type=float, default=0.0)
+    parser.add_argument("--malformadas", type=float, default=0.0)
+    parser.add_argument("--solo", choices=["funciones", "endpoints"], default=None)
+    parser.add_argument("--salida", default=None, help="archivo JSON con los resultados (default: stdout)")
+    parser.add_argument("--comparar", default=None, help="JSON de una corrida anterior")
+    parser.add_argument("--tolerancia", type=float, default=0.2)
+    args = parser.parse_args()
+
+    servidor = iniciar(latencia=args.latencia, tokens_por_seg=args.tokens_por_seg,
+                       prob_malformada=args.malformadas)
+    # Se configura antes de importar: ClienteMistral y CacheLLM leen el entorno al cargarse
+    os.environ["OLLAMA_HOSTS"] = servidor.url
+    os.environ["MISTRAL_CACHE"] = "0"
+    os.environ["DOCUMENTOS_CACHE"] = "0"
+    os.environ["MISTRAL_PRECARGAR"] = "0"
+    from Controller import app
+
+    resultados = []
+    for parrafos in args.plantilla_parrafos:
+        tpl = plantilla(parrafos)
+        for clientes in args.clientes:
+            desde = len(resultados)
+            for puntos in args.puntos:
+                params = {"puntos": puntos, "plantilla_parrafos": parrafos}
+                if args.solo != "endpoints":
+                    resultados.append(medir("informe_funcion", params, escenario_informe_funcion(tpl, puntos),
+                                            servidor, args.repeticiones, clientes))
+                if args.solo != "funciones":
+                    campos = {"tarea": "Tarea de prueba",
+                              "puntos": "\n".join(f"Punto {i}" for i in range(1, puntos + 1))}
+                    resultados.append(medir("informe_endpoint", params,
+                                            escenario_endpoint(app, "/generar_informe", "archivo_base", tpl, campos),
+                                            servidor, args.repeticiones, clientes))
+            for tareas in args.tareas:
+                params = {"tareas": tareas, "plantilla_parrafos": parrafos}
+                if args.solo != "endpoints":
+                    resultados.append(medir("cuadro_funcion", params, escenario_cuadro_funcion(tpl, tareas),
+                                            servidor, args.repeticiones, clientes))
+                if args.solo != "funciones":
+                    resultados.append(medir("cuadro_endpoint", params,
+                                            escenario_endpoint(app, "/generar_cuadro", "archivo_base_cuadro", tpl,
+                                                               campos_cuadro(tareas)),
+                                            servidor, args.repeticiones, clientes))
+            tareas = max(args.tareas)
+            for puntos in args.puntos:
+                params = {"puntos": puntos, "tareas": tareas, "plantilla_parrafos": parrafos}
+                if args.solo != "endpoints":
+                    resultados.append(medir("entrega_2_pasadas", params,
+                                            escenario_entrega_dos_pasadas(tpl, puntos, tareas),
+                                            servidor, args.repeticiones, clientes))
+                    resultados.append(medir("entrega_funcion", params, escenario_entrega_funcion(tpl, puntos, tareas),
+                                            servidor, args.repeticiones, clientes))
+                if args.solo != "funciones":
+                    campos = dict(campos_cuadro(tareas), tarea="Tarea de prueba",
+                                  puntos="\n".join(f"Punto {i}" for i in range(1, puntos + 1)))
+                    resultados.append(medir("entrega_endpoint", params,
+                                            escenario_endpoint(app, "/generar_entrega", "archivo_base", tpl, campos),
+                                            servidor, args.repeticiones, clientes))
+            for r in resultados[desde:]:
+                print(f"{r['escenario']:17s} p={r.get('puntos', r.get('tareas')):3d} plantilla={parrafos:5d} "
+                      f"c={clientes}  p50 {r['p50_ms']:8.1f} ms  p95 {r['p95_ms']:8.1f} ms  "
+                      f"{r['docs_por_seg']:6.2f} docs/s  {r['llamadas_llm_por_doc']:5.1f} llamadas/doc  "
+                      f"{r['memoria_pico_mb']:6.1f} MB", file=sys.stderr)
+    servidor.shutdown()
+
+    informe = {
+        "fecha": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "servidor": servidor.config,
+        "resultados": resultados,
+    }
+    if args.comparar:
+        informe["regresiones"] = comparar(informe, json.loads(Path(args.comparar).read_text(encoding="utf-8")),
+                                          args.tolerancia)
+        for reg in informe["regresiones"]:
+            print(f"REGRESIÓN {reg['metrica']}: {reg['antes']} -> {reg['ahora']} ({reg['escenario']})",
+                  file=sys.stderr)
+
+    texto = json.dumps(informe, ensure_ascii=False, indent=2)
+    if args.salida:
+        Path(args.salida).write_text(texto, encoding="utf-8")
+    else:
+        print(texto)
+    return 1 if informe.get("regresiones") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
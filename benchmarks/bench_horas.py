@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark de horas: el parser anterior (datetime.strptime con hasta cuatro formatos por
+extremo y el split ad hoc de '7H 30M') frente a HorasTrabajo (expresiones precompiladas).
+Verifica que ambos den los mismos minutos en los formatos que aceptaba el anterior, y mide
+el resumen por semana/mes/semestre de un año de días. No llama a Mistral.
+
+    python benchmarks/bench_horas.py --semanas 52 --repeticiones 5
+"""
+import argparse
+import sys
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from HorasTrabajo import TablaHoras, minutos_de_dia  # noqa: E402
+
+TEXTOS = ["08:00–12:30", "7H 30M", "10:00 AM – 12:15 PM", "07:30 - 17:00", "22:00–06:00", "10:00AM–12:15PM",
+          "08:00:00–12:00:30", "8H", "90M", "", "07:30"]
+
+
+# --- Implementación anterior (ModeloCuadro.parse_hora_rango_a_minutos / minutos_de_dia) ---
+def _normalize_dash(text):
+    if not text:
+        return text
+    return text.replace("—", "–").replace("-", "–").replace("– ", "–").replace(" –", "–").strip()
+
+
+def _rango_anterior(rango):
+    try:
+        if not rango or "–" not in rango:
+            return 0
+        start, end = (t.strip() for t in _normalize_dash(rango).split("–", 1))
+        fmts = ("%I:%M %p", "%I:%M%p", "%H:%M", "%H:%M:%S")
+        h1 = h2 = None
+        for fmt in fmts:
+            try:
+                h1 = datetime.strptime(start, fmt)
+                break
+            except Exception:
+                continue
+        for fmt in fmts:
+            try:
+                h2 = datetime.strptime(end, fmt)
+                break
+            except Exception:
+                continue
+        if h1 is None or h2 is None:
+            return 0
+        base = datetime(2000, 1, 1)
+        dt1 = base.replace(hour=h1.hour, minute=h1.minute, second=h1.second)
+        dt2 = base.replace(hour=h2.hour, minute=h2.minute, second=h2.second)
+        diff = (dt2 - dt1).total_seconds() // 60
+        if diff < 0:
+            diff = (dt2 + timedelta(days=1) - dt1).total_seconds() // 60
+        return int(diff)
+    except Exception:
+        return 0
+
+
+def minutos_de_dia_anterior(dia_info):
+    horas_text = dia_info.get("horas", "")
+    if not dia_info.get("laborable", False) or not horas_text:
+        return 0
+    h_text = _normalize_dash(horas_text)
+    if "–" in h_text:
+        return _rango_anterior(h_text)
+    try:
+        h = m = 0
+        for part in h_text.upper().split():
+            if part.endswith("H"):
+                h = int(part.replace("H", "").strip())
+            elif part.endswith("M"):
+                m = int(part.replace("M", "").strip())
+        return h * 60 + m
+    except Exception:
+        return 0
+
+
+def semanas_de_prueba(cantidad):
+    inicio = date(2024, 1, 1)
+    semanas = []
+    for s in range(cantidad):
+        dias = []
+        for d in range(6):
+            fecha = inicio + timedelta(days=7 * s + d)
+            texto = TEXTOS[(s * 6 + d) % len(TEXTOS)]
+            dias.append({"dia": f"Día {d + 1}", "fecha": fecha.isoformat(), "laborable": d < 5, "horas": texto})
+        semanas.append({"titulo": f"Semana {s + 1}", "dias": dias})
+    return semanas
+
+
+def resumen_anterior(semanas):
+    """Lo que había antes: un total por semana y el general, sumando día por día."""
+    por_semana = [sum(minutos_de_dia_anterior(d) for d in semana["dias"]) for semana in semanas]
+    return por_semana, sum(por_semana)
+
+
+def medir(funcion, repeticiones, *args):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion(*args)
+        tiempos.append(time.perf_counter() - inicio)
+    return min(tiempos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--semanas", type=int, default=52)
+    parser.add_argument("--repeticiones", type=int, default=5)
+    args = parser.parse_args()
+
+    dias = [{"laborable": True, "horas": t} for t in TEXTOS]
+    iguales = all(minutos_de_dia(d) == minutos_de_dia_anterior(d) for d in dias)
+    print(f"Mismos minutos en los formatos anteriores: {'sí' if iguales else 'NO'}")
+    print(f"Varios rangos '08:00–12:00, 14:00–18:00': "
+          f"anterior {minutos_de_dia_anterior({'laborable': True, 'horas': '08:00–12:00, 14:00–18:00'})} min, "
+          f"nuevo {minutos_de_dia({'laborable': True, 'horas': '08:00–12:00, 14:00–18:00'})} min")
+
+    semanas = semanas_de_prueba(args.semanas)
+    tabla = TablaHoras.desde_semanas(semanas)
+    print(f"{len(tabla.minutos)} días: total anterior {resumen_anterior(semanas)[1]} min, nuevo {tabla.total()} min,"
+          f" {len(tabla.invalidos)} inválidos marcados")
+
+    textos = [d["horas"] for semana in semanas for d in semana["dias"]]
+    t_antes = medir(lambda: [minutos_de_dia_anterior({"laborable": True, "horas": t}) for t in textos],
+                    args.repeticiones)
+    t_despues = medir(lambda: [minutos_de_dia({"laborable": True, "horas": t}) for t in textos], args.repeticiones)
+    print(f"parseo de {len(textos)} textos, mejor de {args.repeticiones}:")
+    print(f"  strptime     : {t_antes * 1000:8.2f} ms")
+    print(f"  HorasTrabajo : {t_despues * 1000:8.2f} ms  (x{t_antes / t_despues:.1f})")
+
+    t_antes = medir(resumen_anterior, args.repeticiones, semanas)
+    t_despues = medir(lambda s: TablaHoras.desde_semanas(s).resumen(), args.repeticiones, semanas)
+    print(f"resumen de {args.semanas} semanas:")
+    print(f"  por semana (anterior)          : {t_antes * 1000:8.2f} ms")
+    print(f"  semana/mes/semestre (columnas) : {t_despues * 1000:8.2f} ms  (x{t_antes / t_despues:.1f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark del cuadro: build_table_in_doc (el armado anterior, celda por celda con
+los proxies de python-docx, conservado aquí solo como referencia) frente a
+construir_tabla_xml (w:tbl armado en una pasada). Verifica que ambas tablas
+sean iguales (XML canónico) antes de medir. No llama a Mistral.
+
+    python benchmarks/bench_tabla_cuadro.py --filas 6 26 156 --repeticiones 3
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from docx import Document  # noqa: E402
+from docx.enum.table import WD_ALIGN_VERTICAL  # noqa: E402
+from docx.enum.text import WD_ALIGN_PARAGRAPH  # noqa: E402
+from docx.oxml import OxmlElement  # noqa: E402
+from docx.oxml.ns import qn  # noqa: E402
+from docx.shared import Inches, Pt  # noqa: E402
+from lxml import etree  # noqa: E402
+
+import EstilosDocx  # noqa: E402
+from HorasTrabajo import minutos_a_horas_minutos_str, minutos_de_dia  # noqa: E402
+from ModeloCuadro import EMU_PER_INCH, TWIPS_PER_CM, construir_tabla_xml  # noqa: E402
+
+DIAS = ["Lunes", "Martes", "Miércoles", "Jueves", "Viernes", "Sábado"]
+
+
+# --- Armado anterior (referencia): deja vacía la celda de actividades de un día sin temas ---
+def set_row_height(row, height_cm=None, rule="atLeast"):
+    tr = row._tr
+    trPr = tr.get_or_add_trPr()
+    trHeight = OxmlElement("w:trHeight")
+    if height_cm is not None:
+        trHeight.set(qn("w:val"), str(int(height_cm * TWIPS_PER_CM)))
+    trHeight.set(qn("w:hRule"), rule)
+    trPr.append(trHeight)
+
+
+def set_col_widths(tbl, widths_in):
+    # Intenta aplicar el ancho a cada celda por fila (compatible con python-docx)
+    for row in tbl.rows:
+        for j, w in enumerate(widths_in):
+            try:
+                row.cells[j].width = Inches(w)
+            except Exception:
+                # no detener ejecución si falla
+                pass
+
+
+def set_cell_margins(cell, top=100, start=100, bottom=100, end=100):
+    tc = cell._tc
+    tcPr = tc.get_or_add_tcPr()
+    cellMar = OxmlElement("w:tcMar")
+    for margin_name, value in [("top", top), ("start", start), ("bottom", bottom), ("end", end)]:
+        node = OxmlElement(f"w:{margin_name}")
+        node.set(qn("w:w"), str(value))
+        node.set(qn("w:type"), "dxa")
+        cellMar.append(node)
+    tcPr.append(cellMar)
+
+
+
+def build_table_in_doc(doc, dias_semana, table_style="Table Grid", day_w=1.10, hours_w=1.10, data_row_height_cm=2.8):
+    sec = doc.sections[0]
+    usable_in = (sec.page_width - sec.left_margin - sec.right_margin) / EMU_PER_INCH
+    acts_w = usable_in - day_w - hours_w
+
+    filas = len(dias_semana) + 2  # header + total
+    tabla = doc.add_table(rows=filas, cols=3)
+    tabla.style = table_style
+    tabla.autofit = False
+    set_col_widths(tabla, [day_w, acts_w, hours_w])
+
+    # Márgenes internos
+    for row in tabla.rows:
+        for cell in row.cells:
+            set_cell_margins(cell, top=100, start=100, bottom=100, end=100)
+
+    # Header
+    hdr = tabla.rows[0].cells
+    hdr[0].text = "DÍA"
+    hdr[1].text = "ACTIVIDADES/TRABAJOS EFECTUADOS"
+    hdr[2].text = "HORAS"
+    for c in hdr:
+        p = c.paragraphs[0]
+        p.alignment = WD_ALIGN_PARAGRAPH.CENTER
+        if p.runs:
+            p.runs[0].bold = True
+            p.runs[0].font.size = Pt(9)
+        c.vertical_alignment = WD_ALIGN_VERTICAL.CENTER
+    set_row_height(tabla.rows[0], height_cm=1.0, rule="atLeast")
+
+    total_minutos = 0
+    for i, dia_info in enumerate(dias_semana, start=1):
+        c_dia, c_act, c_horas = tabla.rows[i].cells
+
+        # Día y fecha
+        p_dia = c_dia.paragraphs[0]
+        fecha_text = dia_info.get("fecha", "")
+        p_dia.text = f"{dia_info.get('dia', '')} {fecha_text}".strip()
+        p_dia.alignment = WD_ALIGN_PARAGRAPH.CENTER
+        for run in p_dia.runs:
+            run.font.size = Pt(9)
+            run.bold = False
+        c_dia.vertical_alignment = WD_ALIGN_VERTICAL.CENTER
+
+        # Limpiar contenido previo en actividades (manteniendo estructura)
+        try:
+            for para in list(c_act.paragraphs):
+                p_element = para._element
+                p_element.getparent().remove(p_element)
+            # Asegurar limpieza completa como en código antiguo
+            try:
+                c_act._element.clear_content()
+            except Exception:
+                # si no existe clear_content, ignorar (ya removimos párrafos)
+                pass
+        except Exception:
+            pass
+
+        if not dia_info.get("laborable", False):
+            p = c_act.add_paragraph(dia_info.get("razon_no_lab", "Día no laborable"))
+            p.alignment = WD_ALIGN_PARAGRAPH.LEFT
+            for run in p.runs:
+                run.font.size = Pt(7)
+                run.bold = False
+        else:
+            for tema_info in dia_info.get("temas", []):
+                tema_text = tema_info.get("tema", "Sin tema")
+                p_tema = c_act.add_paragraph(tema_text)
+                p_tema.alignment = WD_ALIGN_PARAGRAPH.CENTER
+                for run in p_tema.runs:
+                    run.font.size = Pt(9)
+                    run.bold = True
+
+                for tarea in tema_info.get("tareas", []):
+                    nombre = tarea.get("nombre", "")
+                    descripcion = tarea.get("descripcion", "")
+
+                    p_nom = c_act.add_paragraph(nombre)
+                    p_nom.alignment = WD_ALIGN_PARAGRAPH.CENTER
+                    for run in p_nom.runs:
+                        run.font.size = Pt(7)
+                        run.bold = True
+
+                    p_desc = c_act.add_paragraph(descripcion)
+                    p_desc.alignment = WD_ALIGN_PARAGRAPH.CENTER
+                    for run in p_desc.runs:
+                        run.font.size = Pt(7)
+                        run.bold = False
+
+                    # salto de línea extra para separar tareas
+                    c_act.add_paragraph("")
+
+        # Horas (mostrar tal cual el texto ingresado)
+        horas_text = dia_info.get("horas", "")
+        p_horas = c_horas.paragraphs[0]
+        p_horas.text = horas_text
+        p_horas.alignment = WD_ALIGN_PARAGRAPH.CENTER
+        for run in p_horas.runs:
+            run.font.size = Pt(9)
+            run.bold = False
+        c_horas.vertical_alignment = WD_ALIGN_VERTICAL.CENTER
+
+        # Acumular minutos
+        total_minutos += minutos_de_dia(dia_info)
+
+        set_row_height(tabla.rows[i], height_cm=data_row_height_cm, rule="atLeast")
+
+    # Fila total
+    fila_total = tabla.rows[-1].cells
+    fila_total[0].text = ""
+    fila_total[1].text = "TOTAL"
+    p_total_label = fila_total[1].paragraphs[0]
+    p_total_label.alignment = WD_ALIGN_PARAGRAPH.LEFT
+    for run in p_total_label.runs:
+        run.font.size = Pt(9)
+        run.bold = True
+
+    total_str = minutos_a_horas_minutos_str(total_minutos)
+    p_total = fila_total[2].paragraphs[0]
+    p_total.text = total_str
+    p_total.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    for run in p_total.runs:
+        run.font.size = Pt(9)
+        run.bold = True
+    fila_total[2].vertical_alignment = WD_ALIGN_VERTICAL.CENTER
+    set_row_height(tabla.rows[-1], height_cm=1.0, rule="atLeast")
+
+    return tabla
+
+
+def dias_de_prueba(filas, tareas_por_dia=4):
+    dias = []
+    for i in range(filas):
+        if i % 6 == 5:
+            dias.append({"dia": DIAS[i % 6], "fecha": f"2024-01-{i % 28 + 1:02d}", "laborable": False,
+                         "razon_no_lab": "Día no laborable", "temas": [], "horas": ""})
+            continue
+        tareas = [{"nombre": f"Tarea {j}", "descripcion": f"Realicé la tarea {j} del tema, con pruebas"}
+                  for j in range(1, tareas_por_dia + 1)]
+        dias.append({"dia": DIAS[i % 6], "fecha": f"2024-01-{i % 28 + 1:02d}", "laborable": True,
+                     "temas": [{"tema": "Programación en Python", "tareas": tareas}],
+                     "horas": "08:00–12:30" if i % 2 else "7H 30M"})
+    return dias
+
+
+def con_proxies(dias):
+    return build_table_in_doc(Document(), dias)._tbl
+
+
+def con_xml(dias):
+    doc = Document()
+    tbl = construir_tabla_xml(doc, dias)
+    doc.element.body._insert_tbl(tbl)
+    return tbl
+
+
+def medir(funcion, repeticiones, dias):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion(dias)
+        tiempos.append(time.perf_counter() - inicio)
+    return min(tiempos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filas", type=int, nargs="+", default=[6, 26, 156])
+    parser.add_argument("--repeticiones", type=int, default=3)
+    args = parser.parse_args()
+    # build_table_in_doc da formato run por run: se compara con el mismo formato (ver bench_estilos.py)
+    EstilosDocx.HABILITADOS = False
+
+    for filas in args.filas:
+        dias = dias_de_prueba(filas)
+        iguales = etree.tostring(con_proxies(dias), method="c14n") == etree.tostring(con_xml(dias), method="c14n")
+        t_antes = medir(con_proxies, args.repeticiones, dias)
+        t_despues = medir(con_xml, args.repeticiones, dias)
+        print(f"{filas:4d} filas  iguales={'sí' if iguales else 'NO'}  "
+              f"build_table_in_doc {t_antes * 1000:8.1f} ms  "
+              f"construir_tabla_xml {t_despues * 1000:7.1f} ms  (x{t_antes / t_despues:.1f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Servidor local que imita la API HTTP de ollama (/api/chat, /api/generate, /api/ps, /api/tags)
+con respuestas fijas en el formato que esperan ModeloInforme y ModeloCuadro (texto o JSON).
+Sirve para probar el balanceo y medir sin un modelo real.
+  - latencia: segundos antes del primer token (carga del prompt)
+  - tokens_por_seg: velocidad de generación (0 = instantánea; ~4 caracteres por token)
+  - prob_malformada: fracción de respuestas que rompen el formato pedido
+
+    python benchmarks/servidor_ollama_falso.py --puerto 11500 --latencia 0.05 --tokens-por-seg 30
+    OLLAMA_HOSTS=http://127.0.0.1:11500,http://127.0.0.1:11501 python Controller.py
+
+Desde Python: srv = iniciar(latencia=0.05); ...; srv.shutdown()  (srv.url es la URL base)
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+INTRO = "INTRODUCCION: En este informe describo el trabajo realizado durante la semana, con sus avances y dificultades"
+PUNTO = (
+    "Descripción:\nSe trabajó el tema con ejemplos prácticos, revisando conceptos previos; "
+    "se resolvieron dudas y se documentó el avance\n\n"
+    "Ejemplo:\n```python\ndef suma(a, b):\n    return a + b\n\nprint(suma(1, 2))\n```\n\n"
+    "Explicación:\nLa función recibe dos valores y retorna su suma, lo que permite reutilizar la operación\n"
+)
+DESCRIPCION = "Realicé la tarea indicada aplicando lo aprendido en clase"
+
+
+PUNTO_JSON = {
+    "descripcion": "Se trabajó el tema con ejemplos prácticos, revisando conceptos previos; se documentó el avance",
+    "ejemplo": "def suma(a, b):\n    return a + b\n\nprint(suma(1, 2))",
+    "explicacion": "La función recibe dos valores y retorna su suma, lo que permite reutilizar la operación",
+}
+
+
+def respuesta_para(prompt, formato=None):
+    """Texto de respuesta según el tipo de prompt (intro, punto, descripciones) y el esquema pedido."""
+    if formato:
+        campos = list(formato.get("properties", {})) if isinstance(formato, dict) else []
+        if "descripciones" in campos or not campos:
+            m = re.search(r"Devuelve exactamente (\d+)", prompt)
+            n = int(m.group(1)) if m else 1
+            return json.dumps({"descripciones": [DESCRIPCION] * n}, ensure_ascii=False)
+        return json.dumps({c: PUNTO_JSON.get(c, "") for c in campos}, ensure_ascii=False)
+    if "INTRODUCCION" in prompt:
+        return INTRO
+    if "Descripción:" in prompt:
+        return PUNTO
+    return DESCRIPCION
+
+
+def respuesta_malformada(prompt, formato=None):
+    """Respuesta que no pasa la validación del llamador (fuerza reintentos y fallbacks)."""
+    if formato:
+        campos = list(formato.get("properties", {})) if isinstance(formato, dict) else []
+        if "descripciones" in campos or not campos:
+            return json.dumps({"descripciones": ["mal formada"]})
+        return '{"' + campos[0] + '": "sin cerrar'
+    if "Descripción:" in prompt:
+        return "Claro, aquí tienes el contenido sobre el tema pedido " * 8
+    return ""
+
+
+class ManejadorOllama(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def _json(self, datos, codigo=200):
+        cuerpo = json.dumps(datos, ensure_ascii=False).encode("utf-8")
+        self.send_response(codigo)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def _esperar(self):
+        cfg = self.server.config
+        espera = cfg["latencia"]
+        if cfg["prob_lenta"] and random.random() < cfg["prob_lenta"]:
+            espera *= cfg["factor_lenta"]
+        time.sleep(espera)
+
+    def _segundos_generando(self, texto):
+        tasa = self.server.config["tokens_por_seg"]
+        return (len(texto) / 4) / tasa if tasa else 0.0
+
+    def do_GET(self):
+        if self.path in ("/api/ps", "/api/tags"):
+            self._json({"models": []})
+        elif self.path == "/api/version":
+            self._json({"version": "0.0.0-falso"})
+        else:
+            self._json({"error": "no encontrado"}, 404)
+
+    def do_POST(self):
+        largo = int(self.headers.get("Content-Length") or 0)
+        pedido = json.loads(self.rfile.read(largo) or b"{}")
+        modelo = pedido.get("model", "")
+        self.server.contar(self.path)
+
+        if self.path == "/api/generate":
+            self._json({"model": modelo, "response": "", "done": True})
+            return
+        if self.path != "/api/chat":
+            self._json({"error": "no encontrado"}, 404)
+            return
+
+        self._esperar()
+        mensajes = pedido.get("messages") or [{}]
+        prompt, formato = mensajes[-1].get("content", ""), pedido.get("format")
+        if random.random() < self.server.config["prob_malformada"]:
+            self.server.contar("malformadas")
+            texto = respuesta_malformada(prompt, formato)
+        else:
+            texto = respuesta_para(prompt, formato)
+        self.server.contar("tokens", len(texto) // 4)
+        fin = {"done": True, "eval_count": len(texto) // 4,
+               "eval_duration": int(self._segundos_generando(texto) * 1e9) or 1}
+        if not pedido.get("stream", True):
+            time.sleep(self._segundos_generando(texto))
+            self._json({"model": modelo, "message": {"role": "assistant", "content": texto}, **fin})
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        trozos = [texto[i:i + 16] for i in range(0, len(texto), 16)] + [""]
+        pausa = self._segundos_generando(texto) / len(trozos)
+        for n, trozo in enumerate(trozos):
+            if pausa:
+                time.sleep(pausa)
+            ultimo = fin if n == len(trozos) - 1 else {"done": False}
+            linea = json.dumps({"model": modelo, "message": {"role": "assistant", "content": trozo}, **ultimo},
+                               ensure_ascii=False).encode("utf-8") + b"\n"
+            try:
+                self.wfile.write(f"{len(linea):x}\r\n".encode() + linea + b"\r\n")
+            except (BrokenPipeError, ConnectionResetError):
+                return  # el cliente cortó el stream
+        self.wfile.write(b"0\r\n\r\n")
+
+
+class ServidorOllamaFalso(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, direccion, latencia=0.0, prob_lenta=0.0, factor_lenta=10.0, tokens_por_seg=0.0,
+                 prob_malformada=0.0):
+        super().__init__(direccion, ManejadorOllama)
+        self.config = {"latencia": latencia, "prob_lenta": prob_lenta, "factor_lenta": factor_lenta,
+                       "tokens_por_seg": tokens_por_seg, "prob_malformada": prob_malformada}
+        self.llamadas = {}
+        self._lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def contar(self, clave, n=1):
+        """Contadores por ruta ('/api/chat', ...) y de 'malformadas' y 'tokens' generados."""
+        with self._lock:
+            self.llamadas[clave] = self.llamadas.get(clave, 0) + n
+
+    def contadores(self):
+        with self._lock:
+            return dict(self.llamadas)
+
+
+def iniciar(puerto=0, **config):
+    """Arranca el servidor en un hilo y lo retorna (puerto=0 elige uno libre)."""
+    srv = ServidorOllamaFalso(("127.0.0.1", puerto), **config)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return srv
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--puerto", type=int, default=11500)
+    parser.add_argument("--latencia", type=float, default=0.05, help="segundos por respuesta")
+    parser.add_argument("--prob-lenta", type=float, default=0.0, help="fracción de respuestas lentas")
+    parser.add_argument("--factor-lenta", type=float, default=10.0, help="multiplicador de latencia de las lentas")
+    parser.add_argument("--tokens-por-seg", type=float, default=0.0, help="velocidad de generación (0 = instantánea)")
+    parser.add_argument("--malformadas", type=float, default=0.0, help="fracción de respuestas con formato roto")
+    args = parser.parse_args()
+    srv = ServidorOllamaFalso(("127.0.0.1", args.puerto), latencia=args.latencia,
+                              prob_lenta=args.prob_lenta, factor_lenta=args.factor_lenta,
+                              tokens_por_seg=args.tokens_por_seg, prob_malformada=args.malformadas)
+    print(f"ollama falso en {srv.url}")
+    srv.serve_forever()
+
+
+if __name__ == "__main__":
+    main()